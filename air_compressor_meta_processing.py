@@ -1,9 +1,14 @@
 import os
 import pandas as pd
 import json
-from config import SOURCE_FOLDER_BASE_PATH
-from dao.air_compressor_meta_dao import read_air_compressor_meta, truncate_and_insert
-from utils.id_generator import generate_id
+from config import SOURCE_FOLDER_BASE_PATH, META_SYNC_MODE
+from dao.air_compressor_meta_dao import (
+    read_air_compressor_meta,
+    read_air_compressor_meta_ids,
+    truncate_and_insert,
+    insert_and_delete,
+)
+from utils.id_generator import generate_id, generate_row_ids
 
 
 class AirCompressorMetaProcessor:
@@ -13,6 +18,18 @@ class AirCompressorMetaProcessor:
         self.logger = logger  # Set up logger.
 
     def truncate_and_upload(self, lock):
+        # Lock is held from database check to md5 update, so only one process or shard syncs meta data.
+        # Return True if database meta data matches csv file, either unchanged or uploaded. Failures are logged.
+        lock.acquire()
+        try:
+            if META_SYNC_MODE == "diff":
+                return self.diff_and_upload_locked()
+            return self.truncate_and_upload_locked()
+
+        finally:
+            lock.release()
+
+    def truncate_and_upload_locked(self):
         air_compressor_meta_data_path = os.path.join(
             SOURCE_FOLDER_BASE_PATH, "air_compressor_meta.csv"
         )
@@ -27,7 +44,7 @@ class AirCompressorMetaProcessor:
                 len(air_compressor_meta_df) <= 0
             ):  # If air compressor meta data is empty.
                 self.logger.write("error", "Air compressor meta data empty.")
-                return
+                return False
 
             # Remove duplicates and sort by asset code.
             air_compressor_meta_df.drop_duplicates(inplace=True)
@@ -46,14 +63,9 @@ class AirCompressorMetaProcessor:
             )
 
             try:  # If last saved static data md5 exists.
-                lock.acquire()
-                try:
-                    file = open(air_compressor_meta_data_md5_path, "r")
-                    saved_md5 = json.load(file)["air_compressor_meta_data_md5"]
-                    file.close()
-
-                finally:
-                    lock.release()
+                file = open(air_compressor_meta_data_md5_path, "r")
+                saved_md5 = json.load(file)["air_compressor_meta_data_md5"]
+                file.close()
 
                 # If current md5 matches last saved md5 and database meta data is not empty, do nothing.
                 if (current_md5 == saved_md5) & (len(database_meta_data_df) > 0):
@@ -61,44 +73,85 @@ class AirCompressorMetaProcessor:
                         "info",
                         "Air compressor meta data unchanged so no updates needed.",
                     )
-                    return
+                    return True
 
                 # Insert a column called id which is generated from each air compressor's info.
                 air_compressor_meta_df.insert(
-                    0,
-                    "id",
-                    air_compressor_meta_df.apply(
-                        lambda x: ", ".join(map(str, x.tolist())), axis=1
-                    ),
-                )
-                air_compressor_meta_df["id"] = air_compressor_meta_df["id"].apply(
-                    generate_id
+                    0, "id", generate_row_ids(air_compressor_meta_df)
                 )
 
                 try:
                     truncate_and_insert(air_compressor_meta_df, self.logger)
 
-                    lock.acquire()
-                    try:
-                        file = open(air_compressor_meta_data_md5_path, "w")
-                        json.dump(
-                            {"air_compressor_meta_data_md5": current_md5}, file
-                        )  # Update new meta data md5.
-                        file.close()
-
-                    finally:
-                        lock.release()
+                    file = open(air_compressor_meta_data_md5_path, "w")
+                    json.dump(
+                        {"air_compressor_meta_data_md5": current_md5}, file
+                    )  # Update new meta data md5.
+                    file.close()
+                    return True
 
                 except Exception as e:  # If truncation and insertion fails.
                     self.logger.write(
                         "error",
                         f"Air compressor meta data table truncation and insertion failed: {e}.",
                     )
+                    return False
 
             except FileNotFoundError:  # If meta data md5 json file doesn't exist.
                 self.logger.write(
                     "error", "No air compressor meta data md5 json found."
                 )
+                return False
 
         except FileNotFoundError:  # If air compressor meta data csv file doesn't exist.
             self.logger.write("error", "No air compressor meta csv file found.")
+            return False
+
+    def diff_and_upload_locked(self):
+        # Compare row ids of csv file with ids in database, and only insert new rows and delete removed rows.
+        air_compressor_meta_data_path = os.path.join(
+            SOURCE_FOLDER_BASE_PATH, "air_compressor_meta.csv"
+        )
+
+        try:  # If air compressor meta data csv file exists.
+            air_compressor_meta_df = pd.read_csv(air_compressor_meta_data_path)
+
+        except FileNotFoundError:
+            self.logger.write("error", "No air compressor meta csv file found.")
+            return False
+
+        if len(air_compressor_meta_df) <= 0:  # If air compressor meta data is empty.
+            self.logger.write("error", "Air compressor meta data empty.")
+            return False
+
+        # Remove duplicates and sort by asset code.
+        air_compressor_meta_df.drop_duplicates(inplace=True)
+        air_compressor_meta_df.sort_values(
+            by=["asset_code"], ascending=[True], inplace=True
+        )
+        # Insert a column called id which is generated from each air compressor's info.
+        air_compressor_meta_df.insert(0, "id", generate_row_ids(air_compressor_meta_df))
+
+        database_ids_set = set(read_air_compressor_meta_ids(self.logger))
+        inserted_df = air_compressor_meta_df[
+            ~air_compressor_meta_df["id"].isin(database_ids_set)
+        ]
+        deleted_ids_list = sorted(database_ids_set - set(air_compressor_meta_df["id"]))
+        if (len(inserted_df) <= 0) & (len(deleted_ids_list) <= 0):
+            self.logger.write(
+                "info", "Air compressor meta data unchanged so no updates needed."
+            )
+            return True
+
+        try:
+            insert_and_delete(inserted_df, deleted_ids_list, self.logger)
+            return True
+
+        except (
+            Exception
+        ) as e:  # If insertion and deletion fails, transaction is rolled back.
+            self.logger.write(
+                "error",
+                f"Air compressor meta data table insertion and deletion failed: {e}.",
+            )
+            return False
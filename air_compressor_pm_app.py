@@ -1,46 +1,103 @@
 import datetime
 from zoneinfo import ZoneInfo
-from config import TIMEZONE
-from dao import air_compressor_meta_dao, runtime_dao
+from config import (
+    TIMEZONE,
+    RUN_TIMING_ENABLED,
+    RUN_TIMING_PATH,
+    RUN_PROFILE_ENABLED,
+    RUN_PROFILE_PATH,
+    DB_CONCURRENT_READS_ENABLED,
+    DB_CONCURRENT_READ_WORKERS,
+    WRITE_BEHIND_ENABLED,
+    WRITE_BEHIND_CHUNK_ROWS,
+)
+from dao import runtime_dao
+from dao.concurrent_dao import ConcurrentDao
+from dao.write_behind_queue import WriteBehindQueue
 from air_compressor_meta_processing import AirCompressorMetaProcessor
 from workflow.moving_avg_calculation_step import CalculationStep
 from workflow.dbscan_clustering_step import ClusteringStep
 from workflow.upload_result_status_step import UploadStep
+from utils.asset_registry import AssetRegistry
+from utils.run_timer import RunTimer, span
 
 
 class Application:
     """Run predictive maintenance on air compressors."""
 
-    def __init__(self, logger):
+    def __init__(self, logger, profile=RUN_PROFILE_ENABLED):
         self.logger = logger  # Set up logger.
+        self.profile = profile  # Dump one cProfile pstats file per stage.
+        self.asset_registry = (
+            AssetRegistry.get_instance()
+        )  # Asset attributes shared by steps.
+
+    def start_run_timer(self, shard=None):  # One timing record per run.
+        run_timer = RunTimer(
+            RUN_TIMING_PATH if RUN_TIMING_ENABLED else None,
+            RUN_PROFILE_PATH if self.profile else None,
+            self.logger,
+        )
+        run_timer.record["shard"] = None if shard is None else "/".join(map(str, shard))
+        return run_timer
+
+    def execute(self, lock, shard=None):
+        # Shard (i, N): only handle asset codes of shard i out of N.
+        with self.start_run_timer(shard):
+            self.execute_steps(lock, shard)
+
+    def execute_steps(self, lock, shard=None):
+        # Meta data sync and refresh don't depend on runtime query, so both chains run at once.
+        concurrent_dao = ConcurrentDao(
+            DB_CONCURRENT_READ_WORKERS if DB_CONCURRENT_READS_ENABLED else 1,
+            self.logger,
+        )
+        with span("read_inputs") as step_span:
+            inputs_dict = concurrent_dao.gather(
+                {
+                    "meta_data": lambda: self.sync_and_refresh_meta(lock),
+                    "runtime_data": lambda: runtime_dao.read_runtime_series(
+                        self.logger, shard
+                    ),
+                }
+            )
+            step_span["calls_seconds"] = concurrent_dao.seconds_dict
+            step_span["rows_out"] = len(inputs_dict["runtime_data"])
 
-    def execute(self, lock):
-        processing = AirCompressorMetaProcessor(
-            self.logger
-        )  # Air compressor meta processor.
-        processing.truncate_and_upload(lock)  # Upload data after truncation.
-
-        runtime_data = runtime_dao.read_runtime(self.logger)  # Runtime data.
+        # Runtime data as runtime series store.
+        runtime_data = inputs_dict["runtime_data"]
         if len(runtime_data) <= 0:  # If runtime data is empty.
             print("App return: unprocessed runtime data empty.")
             self.logger.write("warning", "App return: unprocessed runtime data empty.")
             return
 
-        # Air compressor meta data.
-        air_compressor_meta_data = air_compressor_meta_dao.read_air_compressor_meta(
-            self.logger
-        )
+        air_compressor_meta_data = inputs_dict["meta_data"]
         if len(air_compressor_meta_data) <= 0:  # If meta data is empty.
             self.logger.write("error", "App error: air compressor meta data empty.")
             return
 
+        self.process(runtime_data, air_compressor_meta_data)
+
+    def sync_and_refresh_meta(self, lock):
+        processing = AirCompressorMetaProcessor(
+            self.logger
+        )  # Air compressor meta processor.
+        processing.truncate_and_upload(lock)  # Upload data after truncation.
+
+        # Air compressor meta data, only read again when it changes in database.
+        return self.asset_registry.refresh_meta(self.logger)
+
+    def process(self, runtime_data, air_compressor_meta_data):
+        # Run steps 1 to 3 on runtime series store. Return ids of runtime data whose status was updated.
         self.logger.write(
             "debug", "Step 1: calculate last 7-day average runtime for all records."
         )
 
-        calculation_step = CalculationStep()
-        calculation_step.conduct(runtime_data)
-        runtime_data = calculation_step.runtime_df
+        with span("calculation_step", len(runtime_data)) as step_span:
+            calculation_step = CalculationStep()
+            calculation_step.conduct(runtime_data)
+            runtime_data = calculation_step.runtime_store
+            step_span["rows_out"] = len(runtime_data)
         if (
             len(runtime_data) <= 0
         ):  # If runtime data is empty after last 7-day average calculation.
@@ -51,20 +108,25 @@ class Application:
                 "warning",
                 "App return: runtime data empty after last-7-day average calculation.",
             )
-            return
+            return []
 
         self.logger.write(
             "debug",
             "Step 2: apply DBSCAN clustering to pick out extreme positive points.",
         )
 
-        clustering_step = ClusteringStep()
-        clustering_step.conduct(
-            air_compressor_meta_data, runtime_data
-        )  # Do DBSCAN clustering.
-        runtime_data = clustering_step.runtime_df  # Clustered runtime data.
+        # Registry lookups only hold for meta data read through registry. Otherwise, clustering hashes given one.
+        asset_registry = None
+        if air_compressor_meta_data is self.asset_registry.meta_df:
+            asset_registry = self.asset_registry
 
-        runtime_data["last_7_day_avg"] *= 60  # Turn minutes into seconds.
+        with span("clustering_step", len(runtime_data)) as step_span:
+            clustering_step = ClusteringStep()
+            clustering_step.conduct(
+                air_compressor_meta_data, runtime_data, asset_registry
+            )  # Do DBSCAN clustering.
+            runtime_data = clustering_step.runtime_store  # Clustered runtime data.
+            step_span["rows_out"] = len(runtime_data)
 
         # String of time of upload into database.
         load_date_str = (
@@ -72,11 +134,53 @@ class Application:
             .replace(tzinfo=None)
             .isoformat(sep=" ", timespec="seconds")
         )
-        runtime_dao.update_execution_status(
-            runtime_data, load_date_str
-        )  # Update runtime data status.
 
-        abnormal_cluster_data = clustering_step.abnormal_cluster_df
+        # Writes are applied in background while step 3 computes.
+        write_queue = None
+        if WRITE_BEHIND_ENABLED:
+            write_queue = WriteBehindQueue(logger=self.logger)
+
+        try:
+            self.update_status(runtime_data, load_date_str, write_queue)
+            self.upload(
+                clustering_step.abnormal_cluster_store, load_date_str, write_queue
+            )
+
+        except Exception:
+            # Queued writes still end before run returns, and step's exception is raised, not flush's.
+            if write_queue is not None:
+                write_queue.drain()
+            raise
+
+        # Queued writes are applied and their written rows verified before run returns.
+        if write_queue is not None:
+            with span("write_behind_flush") as step_span:
+                step_span.update(write_queue.flush())
+        # Rows without meta data or enough history for 7-day average keep status 0.
+        return runtime_data.ids
+
+    def update_status(self, runtime_data, load_date_str, write_queue=None):
+        if write_queue is None:
+            runtime_dao.update_execution_status(
+                runtime_data.to_frame(), load_date_str, self.logger
+            )  # Update runtime data status.
+            return
+
+        # Queue status updates in chunks of whole asset codes.
+        for start_asset, stop_asset in runtime_data.split_assets(
+            WRITE_BEHIND_CHUNK_ROWS
+        ):
+            chunk_data = runtime_data.view_assets(start_asset, stop_asset)
+            write_queue.submit(
+                "runtime_status",
+                len(chunk_data),
+                runtime_dao.update_execution_status,
+                chunk_data.to_frame(),
+                load_date_str,
+                self.logger,
+            )
+
+    def upload(self, abnormal_cluster_data, load_date_str, write_queue=None):
         if len(abnormal_cluster_data) <= 0:
             self.logger.write("info", "App return: no abnormal clusters found.")
             return
@@ -85,17 +189,21 @@ class Application:
             "debug", "Step 3: insert and update abnormal clusters from step 2."
         )
 
-        upload_step = UploadStep()
-        upload_step.conduct(abnormal_cluster_data, load_date_str)
+        with span("upload_step", len(abnormal_cluster_data)) as step_span:
+            upload_step = UploadStep()
+            upload_step.conduct(abnormal_cluster_data, load_date_str, write_queue)
+            # Inserted, changed and skipped rows.
+            step_span.update(upload_step.counts_dict)
         self.logger.write("info", "App return: all steps completed for runtime data.")
 
 
 if __name__ == "__main__":
-    import threading
+    from config import META_SYNC_LOCK_PATH
     from logger import Logger
+    from utils.file_lock import FileLock
 
     logger_main = Logger.get_instance()
-    lock_main = threading.Lock()
+    lock_main = FileLock(META_SYNC_LOCK_PATH)
 
     app = Application(logger_main)  # Air compressor predictive maintenance application.
     app.execute(lock_main)
@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import signal
+import datetime
+import threading
+import pandas as pd
+from config import (
+    SOURCE_FOLDER_BASE_PATH,
+    ADDITIONAL_RUNTIME_DAYS,
+    RUNTIME_COLUMNS_LIST,
+    DAEMON_POLL_SECONDS,
+    DAEMON_HEARTBEAT_SECONDS,
+    DAEMON_HEARTBEAT_PATH,
+    RUN_PROFILE_ENABLED,
+)
+from dao import runtime_dao
+from air_compressor_meta_processing import AirCompressorMetaProcessor
+from air_compressor_pm_app import Application
+from utils.runtime_series_store import RuntimeSeriesStore
+
+
+class Daemon:
+    """Stay resident: poll unprocessed runtime data and process each micro-batch with warm history."""
+
+    def __init__(self, logger, lock, shard=None, profile=RUN_PROFILE_ENABLED):
+        self.logger = logger  # Set up logger.
+        self.lock = lock
+        self.shard = shard  # Shard (i, N): only handle asset codes of shard i out of N.
+        self.app = Application(logger, profile)
+
+        self.stop_event = threading.Event()  # Set by SIGTERM or SIGINT.
+        self.meta_df = pd.DataFrame()  # Air compressor meta data.
+        self.meta_mtime = None  # Modified time of meta csv file at last sync.
+
+        # Past runtime data kept in memory: asset codes as keys, and their data frames as values.
+        self.history_dfs_dict = dict()
+        # Asset codes as keys, and earliest datetime their history covers as values.
+        self.history_starts_dict = dict()
+
+        self.cycle_count = 0
+        self.processed_rows = 0
+        self.last_batch_rows = 0
+        self.last_heartbeat_time = None
+        self.heartbeat_path = DAEMON_HEARTBEAT_PATH  # One heartbeat file per shard.
+        if shard is not None:
+            self.heartbeat_path = DAEMON_HEARTBEAT_PATH.replace(
+                ".json", f"_{shard[0]}_of_{shard[1]}.json"
+            )
+
+    def stop(self, signal_number=None, frame=None):  # Finish current cycle, then exit.
+        self.logger.write("info", f"Daemon stopping on signal {signal_number}.")
+        self.stop_event.set()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.logger.write("info", f"Daemon started with pid {os.getpid()}.")
+
+        while not self.stop_event.is_set():
+            cycle_start_time = time.monotonic()
+            try:
+                self.last_batch_rows = self.run_cycle()
+
+            except Exception as e:  # Keep polling after a failed cycle.
+                self.last_batch_rows = 0
+                self.logger.write("error", f"Daemon cycle failed: {e}.")
+
+            self.cycle_count += 1
+            self.processed_rows += self.last_batch_rows
+            self.report_heartbeat()
+
+            elapsed_seconds = time.monotonic() - cycle_start_time
+            self.stop_event.wait(max(DAEMON_POLL_SECONDS - elapsed_seconds, 0))
+
+        self.report_heartbeat(force=True)
+        self.logger.write("info", "Daemon stopped.")
+
+    def run_cycle(self):
+        # Process one micro-batch, and return its number of unprocessed rows.
+        self.sync_meta()
+        if len(self.meta_df) <= 0:  # If meta data is empty.
+            self.logger.write("error", "Daemon error: air compressor meta data empty.")
+            return 0
+
+        unprocessed_df = runtime_dao.read_unprocessed_runtime(self.logger, self.shard)
+        if len(unprocessed_df) <= 0:
+            self.logger.write("debug", "Daemon: unprocessed runtime data empty.")
+            return 0
+
+        with self.app.start_run_timer(self.shard):  # One timing record per micro-batch.
+            self.process_batch(unprocessed_df)
+        return len(unprocessed_df)
+
+    def process_batch(self, unprocessed_df):
+        asset_codes_list = [str(code) for code in unprocessed_df["asset_code"].unique()]
+        # Threshold = 365 days before the earliest unprocessed timestamp.
+        datetime_threshold = (
+            unprocessed_df["datetime"].min()
+            - datetime.timedelta(days=ADDITIONAL_RUNTIME_DAYS)
+        ).to_pydatetime()
+        past_runtime_df = self.get_history(
+            asset_codes_list, datetime_threshold, unprocessed_df["id"]
+        )
+
+        # Combine unprocessed and past runtime data into runtime series store, sorted by asset code and datetime.
+        runtime_store = RuntimeSeriesStore.from_frame(
+            pd.concat([past_runtime_df, unprocessed_df], axis=0)
+        )
+
+        try:
+            processed_ids = self.app.process(runtime_store, self.meta_df)
+
+        except Exception:
+            # Status in database is unknown, so reload these assets next cycle.
+            self.forget_history(asset_codes_list)
+            raise
+
+        # Only rows whose status was updated become past runtime data. Others are polled again.
+        if len(processed_ids) > 0:
+            processed_df = unprocessed_df[unprocessed_df["id"].isin(processed_ids)]
+            self.update_history(processed_df.assign(status=1), datetime_threshold)
+
+    def sync_meta(self):  # Sync and reload meta data only when meta csv file changes.
+        meta_data_path = os.path.join(
+            SOURCE_FOLDER_BASE_PATH, "air_compressor_meta.csv"
+        )
+        try:
+            meta_mtime = os.path.getmtime(meta_data_path)
+
+        except FileNotFoundError:
+            meta_mtime = None
+
+        if (meta_mtime == self.meta_mtime) & (len(self.meta_df) > 0):
+            return
+
+        processing = AirCompressorMetaProcessor(self.logger)
+        # Upload data after truncation. Exceptions are raised before modified time is saved.
+        synced = processing.truncate_and_upload(self.lock)
+        self.meta_df = self.app.asset_registry.refresh_meta(self.logger)
+        if len(self.meta_df) <= 0:  # Failed or empty sync is retried next cycle.
+            return
+
+        # Assets no longer in meta data aren't processed, so their history is dropped.
+        meta_asset_codes_set = set(self.meta_df["asset_code"].astype(str))
+        self.forget_history(
+            [
+                asset_code
+                for asset_code in self.history_dfs_dict
+                if asset_code not in meta_asset_codes_set
+            ]
+        )
+
+        # Failed sync is retried next cycle, even if csv file doesn't change.
+        if synced:
+            self.meta_mtime = meta_mtime
+
+    def get_history(self, asset_codes_list, datetime_threshold, unprocessed_ids=None):
+        # Past runtime data of asset codes not earlier than threshold, loading assets not covered in memory.
+        # Rows of unprocessed ids, such as rows reset to status 0, are left out.
+        missing_asset_codes_list = [
+            asset_code
+            for asset_code in asset_codes_list
+            if self.history_starts_dict.get(asset_code, datetime.datetime.max)
+            > datetime_threshold
+        ]
+        if len(missing_asset_codes_list) > 0:
+            loaded_df = runtime_dao.read_past_runtime(
+                missing_asset_codes_list,
+                datetime_threshold,
+                self.logger,
+                unprocessed_ids,
+            )
+            loaded_df = loaded_df.assign(asset_code=loaded_df["asset_code"].astype(str))
+            loaded_dfs_dict = dict(list(loaded_df.groupby("asset_code")))
+            for asset_code in missing_asset_codes_list:
+                self.history_dfs_dict[asset_code] = loaded_dfs_dict.get(
+                    asset_code, pd.DataFrame(columns=RUNTIME_COLUMNS_LIST)
+                )
+                self.history_starts_dict[asset_code] = datetime_threshold
+
+        history_df_list = []
+        for asset_code in asset_codes_list:
+            history_df = self.history_dfs_dict[asset_code]
+            kept_mask = history_df["datetime"] >= datetime_threshold
+            if unprocessed_ids is not None:
+                kept_mask &= ~history_df["id"].isin(unprocessed_ids)
+            history_df_list.append(history_df[kept_mask])
+        return pd.concat(history_df_list, axis=0)
+
+    def update_history(self, processed_df, datetime_threshold):
+        # Append processed rows in place of rows of same ids, and drop rows no later batch can need.
+        processed_df = processed_df.assign(
+            asset_code=processed_df["asset_code"].astype(str)
+        )
+        for asset_code, asset_df in processed_df.groupby("asset_code"):
+            history_df = self.history_dfs_dict[asset_code]
+            history_df = pd.concat(
+                [history_df[~history_df["id"].isin(asset_df["id"])], asset_df], axis=0
+            )
+            self.history_dfs_dict[asset_code] = history_df[
+                history_df["datetime"] >= datetime_threshold
+            ]
+            self.history_starts_dict[asset_code] = datetime_threshold
+
+    def forget_history(self, asset_codes_list):
+        for asset_code in asset_codes_list:
+            self.history_dfs_dict.pop(asset_code, None)
+            self.history_starts_dict.pop(asset_code, None)
+
+    def report_heartbeat(self, force=False):
+        # Log and save daemon health for monitoring.
+        now_time = time.monotonic()
+        if (not force) & (self.last_heartbeat_time is not None):
+            if now_time - self.last_heartbeat_time < DAEMON_HEARTBEAT_SECONDS:
+                return
+        self.last_heartbeat_time = now_time
+
+        heartbeat_dict = {
+            "pid": os.getpid(),
+            "shard": None if self.shard is None else "/".join(map(str, self.shard)),
+            "time": datetime.datetime.now().isoformat(sep=" ", timespec="seconds"),
+            "cycles": self.cycle_count,
+            "processed_rows": self.processed_rows,
+            "last_batch_rows": self.last_batch_rows,
+            "warm_assets": len(self.history_dfs_dict),
+            "stopping": self.stop_event.is_set(),
+        }
+        self.logger.write("info", f"Daemon heartbeat: {json.dumps(heartbeat_dict)}.")
+
+        try:
+            os.makedirs(os.path.dirname(self.heartbeat_path), exist_ok=True)
+            temporary_path = self.heartbeat_path + ".tmp"
+            file = open(temporary_path, "w")
+            json.dump(heartbeat_dict, file)
+            file.close()
+            os.replace(temporary_path, self.heartbeat_path)  # Swap in atomically.
+
+        except OSError as e:
+            self.logger.write("warning", f"Daemon heartbeat file not written: {e}.")
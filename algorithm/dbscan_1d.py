@@ -0,0 +1,309 @@
+import numpy as np
+
+
+def _within_epsilon(values, left_positions, right_positions, epsilons):
+    # Same neighborhood rule as DBSCAN: distance between two sorted values <= epsilon.
+    return (values[right_positions] - values[left_positions]) <= epsilons
+
+
+def count_neighbors_1d(values, segment_codes, epsilons, return_bounds=False):
+    # Count points within epsilon of each point (itself included), never crossing segments.
+    # Inputs must be sorted by segment code first and value second.
+    # If return bounds is true, also returns first position of each window and first position after it.
+    n = len(values)
+    positions = np.arange(n)
+
+    # Segment boundaries: first position of own segment and first position of next segment.
+    segment_breaks = np.flatnonzero(np.diff(segment_codes)) + 1
+    segment_starts = np.concatenate(([0], segment_breaks))
+    segment_ends = np.concatenate((segment_breaks, [n]))
+    segment_ids = np.repeat(
+        np.arange(len(segment_starts)), segment_ends - segment_starts
+    )
+    starts, ends = segment_starts[segment_ids], segment_ends[segment_ids]
+
+    # Shift segments apart so one search over all points gives candidate window bounds.
+    segment_minimums = values[segment_starts]
+    segment_widths = values[segment_ends - 1] - segment_minimums
+    segment_gaps = segment_widths + 2 * epsilons[segment_starts] + 1
+    segment_bases = np.concatenate(([0], np.cumsum(segment_gaps)[:-1]))
+    shifted_values = values - segment_minimums[segment_ids] + segment_bases[segment_ids]
+    rights = np.searchsorted(shifted_values, shifted_values + epsilons, side="right")
+    lefts = np.searchsorted(shifted_values, shifted_values - epsilons, side="left")
+    rights = np.clip(rights, positions + 1, ends)
+    lefts = np.clip(lefts, starts, positions)
+
+    # Equal values in a segment form a tie group, which is always inside or outside a window as a whole.
+    new_group = np.concatenate(
+        (
+            [True],
+            (values[1:] != values[:-1]) | (segment_codes[1:] != segment_codes[:-1]),
+        )
+    )
+    group_boundaries = np.flatnonzero(new_group)
+    group_ids = np.cumsum(new_group) - 1
+    group_firsts = group_boundaries[group_ids]  # First position of own tie group.
+    group_ends = np.concatenate((group_boundaries[1:], [n]))[
+        group_ids
+    ]  # First position after it.
+
+    # Two-pointer correction: candidates may be off by rounding, so move them by the exact rule, a tie group at a time.
+    while True:  # Extend right bounds.
+        extend = rights < ends
+        extend[extend] = _within_epsilon(
+            values, positions[extend], rights[extend], epsilons[extend]
+        )
+        if not extend.any():
+            break
+        rights[extend] = group_ends[rights[extend]]
+
+    while True:  # Shrink right bounds.
+        shrink = rights - 1 > positions
+        shrink[shrink] = ~_within_epsilon(
+            values, positions[shrink], rights[shrink] - 1, epsilons[shrink]
+        )
+        if not shrink.any():
+            break
+        rights[shrink] = group_firsts[rights[shrink] - 1]
+
+    while True:  # Extend left bounds.
+        extend = lefts > starts
+        extend[extend] = _within_epsilon(
+            values, lefts[extend] - 1, positions[extend], epsilons[extend]
+        )
+        if not extend.any():
+            break
+        lefts[extend] = group_firsts[lefts[extend] - 1]
+
+    while True:  # Shrink left bounds.
+        shrink = lefts < positions
+        shrink[shrink] = ~_within_epsilon(
+            values, lefts[shrink], positions[shrink], epsilons[shrink]
+        )
+        if not shrink.any():
+            break
+        lefts[shrink] = group_ends[lefts[shrink]]
+
+    if return_bounds:
+        return rights - lefts, lefts, rights
+    return rights - lefts
+
+
+def segmented_dbscan_1d(
+    values, segment_codes, epsilons, minimal_samples, return_core=False
+):
+    # Exact DBSCAN on one-dimensional values, run separately for each segment in one vectorized call.
+    # Returns clusters: 0 = outlier, 1 = majority (cluster DBSCAN labels 0) and 2 = minority (other clusters).
+    # If return core is true, also returns whether each point is a core point.
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n <= 0:
+        clusters = np.array([], dtype=np.int8)
+        return (clusters, np.array([], dtype=bool)) if return_core else clusters
+
+    segment_codes = np.asarray(segment_codes)
+    epsilons = np.broadcast_to(np.asarray(epsilons, dtype=np.float64), (n,))
+    minimal_samples = np.broadcast_to(np.asarray(minimal_samples), (n,))
+
+    # Sort by segment code first and value second. Stable sort keeps original order among ties.
+    order = np.lexsort((values, segment_codes))
+    sorted_values = values[order]
+    sorted_segment_codes = segment_codes[order]
+    sorted_epsilons = epsilons[order]
+    positions = np.arange(n)
+
+    neighbor_counts = count_neighbors_1d(
+        sorted_values, sorted_segment_codes, sorted_epsilons
+    )
+    is_core = neighbor_counts >= minimal_samples[order]
+    new_segment = np.concatenate(
+        ([True], sorted_segment_codes[1:] != sorted_segment_codes[:-1])
+    )
+    segment_ids = np.cumsum(new_segment) - 1
+
+    # Core points form one cluster until the gap to next core point exceeds epsilon or segment changes.
+    core_positions = positions[is_core]
+    if len(core_positions) <= 0:  # Without core points, every point is an outlier.
+        clusters = np.zeros(n, dtype=np.int8)
+        return (clusters, np.zeros(n, dtype=bool)) if return_core else clusters
+
+    core_breaks = np.ones(len(core_positions), dtype=bool)
+    if len(core_positions) > 1:
+        core_breaks[1:] = (
+            segment_ids[core_positions[1:]] != segment_ids[core_positions[:-1]]
+        ) | ~_within_epsilon(
+            sorted_values,
+            core_positions[:-1],
+            core_positions[1:],
+            sorted_epsilons[core_positions[1:]],
+        )
+    core_cluster_ids = np.cumsum(core_breaks) - 1
+    cluster_count = core_cluster_ids[-1] + 1
+
+    # DBSCAN discovers clusters in input order, so the earliest core point decides each cluster's rank.
+    cluster_first_inputs = np.full(cluster_count, n, dtype=np.int64)
+    np.minimum.at(cluster_first_inputs, core_cluster_ids, order[core_positions])
+    cluster_segment_ids = segment_ids[core_positions[core_breaks]]
+    segment_first_inputs = np.full(segment_ids[-1] + 1, n, dtype=np.int64)
+    np.minimum.at(segment_first_inputs, cluster_segment_ids, cluster_first_inputs)
+    cluster_labels = np.where(
+        cluster_first_inputs == segment_first_inputs[cluster_segment_ids], 1, 2
+    ).astype(np.int8)
+
+    sorted_clusters = np.zeros(n, dtype=np.int8)  # Outliers by default.
+    sorted_clusters[core_positions] = cluster_labels[core_cluster_ids]
+
+    # Border points join the earliest discovered cluster among nearest cores within epsilon on both sides.
+    core_ranks = np.full(n, -1, dtype=np.int64)
+    core_ranks[core_positions] = np.arange(len(core_positions))
+    left_core_ranks = np.maximum.accumulate(core_ranks)
+    right_core_ranks = np.where(core_ranks >= 0, core_ranks, len(core_positions))
+    right_core_ranks = np.minimum.accumulate(right_core_ranks[::-1])[::-1]
+
+    border_positions = positions[~is_core]
+    left_ranks = left_core_ranks[border_positions]
+    right_ranks = right_core_ranks[border_positions]
+    has_left = left_ranks >= 0
+    has_left[has_left] = (
+        segment_ids[core_positions[left_ranks[has_left]]]
+        == segment_ids[border_positions[has_left]]
+    ) & _within_epsilon(
+        sorted_values,
+        core_positions[left_ranks[has_left]],
+        border_positions[has_left],
+        sorted_epsilons[border_positions[has_left]],
+    )
+    has_right = right_ranks < len(core_positions)
+    has_right[has_right] = (
+        segment_ids[core_positions[right_ranks[has_right]]]
+        == segment_ids[border_positions[has_right]]
+    ) & _within_epsilon(
+        sorted_values,
+        border_positions[has_right],
+        core_positions[right_ranks[has_right]],
+        sorted_epsilons[border_positions[has_right]],
+    )
+
+    left_cluster_ids = core_cluster_ids[np.maximum(left_ranks, 0)]
+    right_cluster_ids = core_cluster_ids[
+        np.minimum(right_ranks, len(core_positions) - 1)
+    ]
+    left_first_inputs = np.where(has_left, cluster_first_inputs[left_cluster_ids], n)
+    right_first_inputs = np.where(has_right, cluster_first_inputs[right_cluster_ids], n)
+    border_cluster_ids = np.where(
+        left_first_inputs <= right_first_inputs, left_cluster_ids, right_cluster_ids
+    )
+    is_border = has_left | has_right
+    sorted_clusters[border_positions[is_border]] = cluster_labels[
+        border_cluster_ids[is_border]
+    ]
+
+    clusters = np.empty(n, dtype=np.int8)
+    clusters[order] = sorted_clusters  # Back to input order.
+    if return_core:
+        core_mask = np.empty(n, dtype=bool)
+        core_mask[order] = is_core
+        return clusters, core_mask
+    return clusters
+
+
+def sweep_dbscan_1d(values, segment_codes, parameter_pairs_list, row_flags):
+    # Count flagged points outside majority cluster (clusters 0 and 2) for every pair of epsilon and minimal
+    # samples, from one sort of values. Neighbor windows are computed once per epsilon, shared by minimal samples.
+    # Row flags: one column of 0 or 1 per kind of flag, such as alarmable rows.
+    # Yields each pair with counts per segment (in sorted segment code order) and flag column.
+    values = np.asarray(values, dtype=np.float64)
+    segment_codes = np.asarray(segment_codes)
+    row_flags = np.asarray(row_flags, dtype=np.int64).reshape(len(values), -1)
+    if len(values) <= 0:
+        for parameter_pair in parameter_pairs_list:
+            yield tuple(parameter_pair), np.zeros(
+                (0, row_flags.shape[1]), dtype=np.int64
+            )
+        return
+
+    order = np.lexsort((values, segment_codes))
+    sorted_values = values[order]
+    sorted_segment_codes = segment_codes[order]
+    new_segment = np.concatenate(
+        ([True], sorted_segment_codes[1:] != sorted_segment_codes[:-1])
+    )
+    new_group = new_segment.copy()
+    new_group[1:] |= sorted_values[1:] != sorted_values[:-1]
+
+    # Equal values of a segment form a tie group, whose points share neighbors and clusters.
+    # So clustering works on tie groups, and rows of group i are sorted positions group bounds [i, i + 1).
+    group_starts = np.flatnonzero(new_group)
+    group_bounds = np.append(group_starts, len(values))
+    group_values = sorted_values[group_starts]
+    group_segment_codes = sorted_segment_codes[group_starts]
+    group_segment_ids = (np.cumsum(new_segment) - 1)[group_starts]
+    group_first_inputs = np.minimum.reduceat(order, group_starts)
+
+    # Flag counts of any sorted range from cumulative sums, and flag totals of each segment.
+    cumulative_flags = np.concatenate(
+        (
+            np.zeros((1, row_flags.shape[1]), dtype=np.int64),
+            np.cumsum(row_flags[order], axis=0),
+        )
+    )
+    segment_bounds = np.append(np.flatnonzero(new_segment), len(values))
+    segment_flag_totals = (
+        cumulative_flags[segment_bounds[1:]] - cumulative_flags[segment_bounds[:-1]]
+    )
+
+    # Epsilons as keys, and their minimal samples as values.
+    minimal_samples_dict = dict()
+    for epsilon, minimal_samples in parameter_pairs_list:
+        minimal_samples_dict.setdefault(epsilon, []).append(minimal_samples)
+
+    for epsilon, minimal_samples_list in minimal_samples_dict.items():
+        _, lefts, rights = count_neighbors_1d(
+            group_values,
+            group_segment_codes,
+            np.full(len(group_values), epsilon, dtype=np.float64),
+            return_bounds=True,
+        )
+        # Window bounds of groups into sorted positions.
+        lefts, rights = group_bounds[lefts], group_bounds[rights]
+        neighbor_counts = rights - lefts
+
+        for minimal_samples in minimal_samples_list:
+            # Without core points, all are outliers.
+            flag_counts = segment_flag_totals.copy()
+            core_groups = np.flatnonzero(neighbor_counts >= minimal_samples)
+            if len(core_groups) <= 0:
+                yield (epsilon, minimal_samples), flag_counts
+                continue
+
+            # Runs of core groups, as in segmented DBSCAN: each run is one cluster.
+            core_breaks = np.ones(len(core_groups), dtype=bool)
+            core_breaks[1:] = (
+                group_segment_ids[core_groups[1:]]
+                != group_segment_ids[core_groups[:-1]]
+            ) | ~_within_epsilon(
+                group_values, core_groups[:-1], core_groups[1:], epsilon
+            )
+            run_starts = np.flatnonzero(core_breaks)
+            run_ends = np.append(run_starts[1:], len(core_groups)) - 1
+            run_first_inputs = np.minimum.reduceat(
+                group_first_inputs[core_groups], run_starts
+            )
+            run_segment_ids = group_segment_ids[core_groups[run_starts]]
+
+            # Majority cluster of each segment is its earliest discovered run. In one dimension it covers
+            # one sorted range: its cores, points between them, and border points within epsilon outside.
+            run_order = np.lexsort((run_first_inputs, run_segment_ids))
+            first_runs = np.concatenate(
+                (
+                    [True],
+                    run_segment_ids[run_order][1:] != run_segment_ids[run_order][:-1],
+                )
+            )
+            majority_runs = run_order[first_runs]
+            majority_lefts = lefts[core_groups[run_starts[majority_runs]]]
+            majority_rights = rights[core_groups[run_ends[majority_runs]]]
+            flag_counts[run_segment_ids[majority_runs]] -= (
+                cumulative_flags[majority_rights] - cumulative_flags[majority_lefts]
+            )
+            yield (epsilon, minimal_samples), flag_counts
@@ -0,0 +1,317 @@
+"""Re-score historical runtime data with DBSCAN in parallel, resumable work units.
+
+Run from repository root:
+    python -m algorithm.dbscan_backfill --start 2020-01-01 --end 2024-01-01
+    python -m algorithm.dbscan_backfill --start 2023-01-01 --end 2024-01-01 --parameters new_thresholds.json
+
+Date range is split into windows, and asset codes into chunks. Each window and chunk is one work unit:
+its runtime data is scored as a run would score it, against the 365 days of history before the window.
+Results of each unit are saved as one partition file, so an interrupted backfill resumes where it stopped.
+"""
+
+import os
+import json
+import time
+import argparse
+import datetime
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config import (
+    ADDITIONAL_RUNTIME_DAYS,
+    DBSCAN_PARAMETERS_DICT,
+    DBSCAN_BACKFILL_PATH,
+    DBSCAN_BACKFILL_ASSET_CHUNK_SIZE,
+    DBSCAN_BACKFILL_WINDOW,
+    DBSCAN_BACKFILL_WORKERS,
+    MOVING_AVG_WINDOW,
+)
+from dao import air_compressor_meta_dao, runtime_dao
+from utils.last_7_day_average import calculate_last_7_day_avg_all
+from algorithm.dbscan_clustering import DBSCANClusterer
+
+MANIFEST_FILE_NAME = "manifest.json"  # Arguments of backfill, checked when resuming.
+ALARMS_FILE_NAME = "air_compressor_alarms.csv"  # Merged results.
+ALARM_COLUMNS_LIST = [
+    "datetime",
+    "asset_code",
+    "runtime",
+    "last_7_day_avg",
+    "deviation",
+    "cluster",
+]
+
+
+def split_windows(start_datetime, end_datetime, window=DBSCAN_BACKFILL_WINDOW):
+    # List of (window start, window end) covering [start, end), split at boundaries of window frequency.
+    boundaries = pd.date_range(start_datetime, end_datetime, freq=window)
+    boundaries = sorted(
+        set([pd.Timestamp(start_datetime), pd.Timestamp(end_datetime)])
+        | set(boundaries)
+    )
+    return [
+        (boundaries[i].to_pydatetime(), boundaries[i + 1].to_pydatetime())
+        for i in range(len(boundaries) - 1)
+    ]
+
+
+def split_work_units(
+    start_datetime,
+    end_datetime,
+    locations_dict,
+    asset_chunk_size=DBSCAN_BACKFILL_ASSET_CHUNK_SIZE,
+    window=DBSCAN_BACKFILL_WINDOW,
+):
+    # Work units as dictionaries of window, asset chunk index and locations of chunk's asset codes.
+    asset_codes_list = sorted(locations_dict.keys())
+    work_units_list = []
+    for window_start, window_end in split_windows(start_datetime, end_datetime, window):
+        for i in range(0, len(asset_codes_list), asset_chunk_size):
+            chunk_asset_codes_list = asset_codes_list[i : i + asset_chunk_size]
+            work_units_list.append(
+                {
+                    "window_start": window_start,
+                    "window_end": window_end,
+                    "chunk_index": i // asset_chunk_size,
+                    "locations_dict": {
+                        asset_code: locations_dict[asset_code]
+                        for asset_code in chunk_asset_codes_list
+                    },
+                }
+            )
+    return work_units_list
+
+
+def get_partition_path(output_path, work_unit):
+    # One parquet file per window and asset chunk.
+    return os.path.join(
+        output_path,
+        f"window={work_unit['window_start'].strftime('%Y-%m-%d')}",
+        f"assets_{work_unit['chunk_index']:04d}.parquet",
+    )
+
+
+def score_work_unit(work_unit, parameters_dict=None):
+    # Abnormal clusters in window of work unit, fitted on window and 365 days of history before it.
+    datetime_threshold = work_unit["window_start"] - datetime.timedelta(
+        days=ADDITIONAL_RUNTIME_DAYS
+    )
+    runtime_df = runtime_dao.read_runtime_range(
+        list(work_unit["locations_dict"].keys()),
+        datetime_threshold,
+        work_unit["window_end"],
+    )
+    if len(runtime_df) <= 0:
+        return pd.DataFrame(columns=ALARM_COLUMNS_LIST)
+
+    runtime_df = calculate_last_7_day_avg_all(runtime_df, MOVING_AVG_WINDOW)
+    runtime_df.sort_values(
+        by=["datetime", "asset_code"], ascending=[True, True], inplace=True
+    )
+    runtime_df["asset_code"] = runtime_df["asset_code"].astype(str)
+
+    clustering = DBSCANClusterer(runtime_df)
+    runtime_df = clustering.runtime_df
+    # Deviation = runtime - last 7-day average.
+    runtime_df["deviation"] = runtime_df["runtime"] - runtime_df["last_7_day_avg"]
+    cluster_df = clustering.predict_cluster_sorted_1d(
+        work_unit["locations_dict"], runtime_df, parameters_dict
+    )
+
+    # Only keep abnormal clusters (cluster != 1) inside window.
+    cluster_df = cluster_df[
+        (cluster_df["cluster"] != 1)
+        & (cluster_df["datetime"] >= work_unit["window_start"])
+    ]
+    return cluster_df[ALARM_COLUMNS_LIST].reset_index(drop=True)
+
+
+def run_work_unit(work_unit, output_path, parameters_dict=None):
+    # Score work unit and save its partition file. Return partition path and number of abnormal rows.
+    partition_path = get_partition_path(output_path, work_unit)
+    alarm_df = score_work_unit(work_unit, parameters_dict)
+
+    os.makedirs(os.path.dirname(partition_path), exist_ok=True)
+    temporary_path = partition_path + ".tmp"
+    alarm_df.to_parquet(temporary_path, index=False)
+    # Swap in atomically, so partitions are never partial.
+    os.replace(temporary_path, partition_path)
+    return partition_path, len(alarm_df)
+
+
+def initialize_worker():
+    # Forked workers must not share parent's database connections, so drop them without closing.
+    from dao.db_connector import engine
+
+    engine.dispose(close=False)
+
+
+def check_manifest(output_path, manifest_dict):
+    # Save arguments of a new backfill, or check that a resumed backfill has the same arguments.
+    manifest_path = os.path.join(output_path, MANIFEST_FILE_NAME)
+    if os.path.exists(manifest_path):
+        file = open(manifest_path, "r")
+        saved_manifest_dict = json.load(file)
+        file.close()
+
+        if saved_manifest_dict != manifest_dict:
+            raise ValueError(
+                f"Backfill at {output_path} has other arguments: use a new output path, or delete it."
+            )
+        return
+
+    os.makedirs(output_path, exist_ok=True)
+    file = open(manifest_path, "w")
+    json.dump(manifest_dict, file, indent=2)
+    file.close()
+
+
+def merge_partitions(work_units_list, output_path):
+    # Merge partition files of all work units into one csv, sorted as tester's alarms.
+    alarm_df_list = [
+        pd.read_parquet(get_partition_path(output_path, work_unit))
+        for work_unit in work_units_list
+    ]
+    alarm_df = pd.concat(alarm_df_list, axis=0, ignore_index=True)
+    alarm_df.sort_values(
+        by=["datetime", "asset_code"], ascending=[True, True], inplace=True
+    )
+    alarm_df.reset_index(drop=True, inplace=True)
+
+    alarms_path = os.path.join(output_path, ALARMS_FILE_NAME)
+    alarm_df.to_csv(alarms_path, index=False)
+    return alarm_df, alarms_path
+
+
+def backfill(
+    start_datetime,
+    end_datetime,
+    locations_dict,
+    output_path=DBSCAN_BACKFILL_PATH,
+    parameters_dict=None,
+    asset_chunk_size=DBSCAN_BACKFILL_ASSET_CHUNK_SIZE,
+    window=DBSCAN_BACKFILL_WINDOW,
+    workers=DBSCAN_BACKFILL_WORKERS,
+):
+    # Run all work units without partition files in a process pool, then merge every partition.
+    if parameters_dict is None:  # Parameters of config unless others are given.
+        parameters_dict = DBSCAN_PARAMETERS_DICT
+
+    check_manifest(
+        output_path,
+        {
+            "start": str(start_datetime),
+            "end": str(end_datetime),
+            "window": window,
+            "asset_chunk_size": asset_chunk_size,
+            "parameters": parameters_dict,
+            "locations": dict(sorted(locations_dict.items())),
+        },
+    )
+
+    work_units_list = split_work_units(
+        start_datetime, end_datetime, locations_dict, asset_chunk_size, window
+    )
+    pending_work_units_list = [
+        work_unit
+        for work_unit in work_units_list
+        if not os.path.exists(get_partition_path(output_path, work_unit))
+    ]
+    print(
+        f"{len(work_units_list)} work units, {len(work_units_list) - len(pending_work_units_list)} already done."
+    )
+
+    if len(pending_work_units_list) > 0:
+        executor = ProcessPoolExecutor(
+            max_workers=min(workers, len(pending_work_units_list)),
+            initializer=initialize_worker,
+        )
+        futures_dict = {
+            executor.submit(run_work_unit, work_unit, output_path, parameters_dict): (
+                work_unit
+            )
+            for work_unit in pending_work_units_list
+        }
+        try:
+            for i, future in enumerate(as_completed(futures_dict)):
+                partition_path, alarm_count = future.result()
+                print(
+                    f"[{i + 1}/{len(pending_work_units_list)}] {os.path.relpath(partition_path, output_path)}: "
+                    f"{alarm_count} abnormal rows."
+                )
+
+        finally:  # On failure, finished partitions stay for resuming, and queued units are dropped.
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    return merge_partitions(work_units_list, output_path)
+
+
+def get_locations_dict(meta_data, parameters_dict, asset_codes_list=None):
+    # Asset codes as keys and locations as values, of locations having DBSCAN parameters.
+    meta_data = meta_data[meta_data["location"].isin(list(parameters_dict.keys()))]
+    if asset_codes_list is not None:
+        meta_data = meta_data[meta_data["asset_code"].isin(asset_codes_list)]
+    return dict(zip(meta_data["asset_code"].astype(str), meta_data["location"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Backfill DBSCAN abnormal clusters over a date range in parallel work units."
+    )
+    parser.add_argument("--start", required=True, help="Start date, inclusive.")
+    parser.add_argument("--end", required=True, help="End date, exclusive.")
+    parser.add_argument("--output-path", default=DBSCAN_BACKFILL_PATH)
+    parser.add_argument(
+        "--parameters",
+        default=None,
+        help="JSON file of DBSCAN parameters per location. Default: config.",
+    )
+    parser.add_argument(
+        "--asset-codes", default=None, help="Comma-separated asset codes. Default: all."
+    )
+    parser.add_argument(
+        "--asset-chunk-size", type=int, default=DBSCAN_BACKFILL_ASSET_CHUNK_SIZE
+    )
+    parser.add_argument(
+        "--window",
+        default=DBSCAN_BACKFILL_WINDOW,
+        help="Pandas frequency of windows, such as MS or W-MON.",
+    )
+    parser.add_argument("--workers", type=int, default=DBSCAN_BACKFILL_WORKERS)
+    arguments = parser.parse_args(argv)
+
+    parameters_dict = DBSCAN_PARAMETERS_DICT
+    if arguments.parameters is not None:
+        file = open(arguments.parameters, "r")
+        parameters_dict = json.load(file)
+        file.close()
+
+    asset_codes_list = None
+    if arguments.asset_codes is not None:
+        asset_codes_list = arguments.asset_codes.split(",")
+
+    start = time.time()
+    meta_data = air_compressor_meta_dao.read_air_compressor_meta()
+    locations_dict = get_locations_dict(meta_data, parameters_dict, asset_codes_list)
+    if (
+        len(locations_dict) <= 0
+    ):  # If no asset code has a location with DBSCAN parameters.
+        print("DBSCAN backfill stopped: air compressor asset codes list empty.")
+        return
+
+    alarm_df, alarms_path = backfill(
+        datetime.datetime.fromisoformat(arguments.start),
+        datetime.datetime.fromisoformat(arguments.end),
+        locations_dict,
+        arguments.output_path,
+        parameters_dict,
+        arguments.asset_chunk_size,
+        arguments.window,
+        arguments.workers,
+    )
+
+    print(f"\n{len(alarm_df)} abnormal rows saved to {alarms_path}.")
+    print("Total running time: " + str(round(time.time() - start, 2)) + " seconds.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,16 @@
 from sklearn.cluster import DBSCAN
 import pandas as pd
 import numpy as np
-from config import DF_ALIGNMENT, DBSCAN_PARAMETERS_DICT, RUNTIME_LEVEL
+from config import (
+    DF_ALIGNMENT,
+    DBSCAN_PARAMETERS_DICT,
+    DBSCAN_MODE,
+    RUNTIME_LEVEL,
+    RUNTIME_STORE_BATCH_ROWS,
+)
+from algorithm import dbscan_incremental
+from algorithm.dbscan_1d import segmented_dbscan_1d
+from utils.asset_registry import AssetRegistry
 
 
 class DBSCANClusterer:
@@ -36,26 +45,223 @@ class DBSCANClusterer:
 
             self.dbscan_clusterers_dict.update({key: clusterer})
 
-    def predict_cluster(self, location, runtime_df):
-        # Reshape deviation for DBSCAN clustering.
-        deviation_reshaped = np.array(runtime_df["deviation"]).reshape(-1, 1)
+    def predict_cluster_array(self, location, deviations, runtimes):
+        # Clusters of one asset code's deviations: 0 = outlier, 1 = majority and 2 = minority.
+        clusters = (
+            self.dbscan_clusterers_dict[location].fit_predict(deviations.reshape(-1, 1))
+            + 1
+        )
+        return self.mask_cluster_array(np.clip(clusters, None, 2), deviations, runtimes)
+
+    @staticmethod
+    def get_parameter_arrays(locations_dict, asset_codes, parameters_dict=None):
+        # Epsilon and minimal samples of each row, looked up by its asset code's location.
+        # Dictionaries are mapped per asset code, so categorical asset codes map categories only.
+        if parameters_dict is None:  # Parameters of config unless others are given.
+            parameters_dict = DBSCAN_PARAMETERS_DICT
+
+        epsilons_dict, minimal_samples_dict = dict(), dict()
+        for asset_code, location in locations_dict.items():
+            epsilons_dict[asset_code] = parameters_dict[location]["epsilon"]
+            minimal_samples_dict[asset_code] = parameters_dict[location][
+                "minimal_samples"
+            ]
 
-        # Predict clusters.
-        runtime_df["cluster"] = (
-            self.dbscan_clusterers_dict[location].fit_predict(deviation_reshaped) + 1
+        epsilons = asset_codes.map(epsilons_dict)
+        minimal_samples = asset_codes.map(minimal_samples_dict)
+        return np.asarray(epsilons, dtype=np.float64), np.asarray(
+            minimal_samples, dtype=np.int64
         )
-        runtime_df["cluster"].clip(
-            upper=2, inplace=True
-        )  # Clusters: 0 = outlier, 1 = majority and 2 = minority.
 
+    @staticmethod
+    def mask_cluster_array(clusters, deviations, runtimes):
         # Minority and outlier clusters are only applied to positive deviations.
-        runtime_df.loc[runtime_df["deviation"] <= 0, "cluster"] = 1
+        clusters[deviations <= 0] = 1
         # Runtime <= threshold is automatically labeled as majority.
-        runtime_df.loc[runtime_df["runtime"] <= RUNTIME_LEVEL, "cluster"] = 1
+        clusters[runtimes <= RUNTIME_LEVEL] = 1
+        return clusters
+
+    @staticmethod
+    def mask_clusters(clusters, runtime_df):
+        return DBSCANClusterer.mask_cluster_array(
+            clusters.astype(np.int64),
+            runtime_df["deviation"].to_numpy(),
+            runtime_df["runtime"].to_numpy(),
+        )
+
+    @classmethod
+    def predict_cluster_sorted_1d_array(
+        cls, locations_dict, asset_codes, deviations, runtimes, parameters_dict=None
+    ):
+        # Clusters of rows whose asset codes are all in locations dictionary, each asset code as its own segment.
+        epsilons, minimal_samples = cls.get_parameter_arrays(
+            locations_dict, asset_codes, parameters_dict
+        )
+
+        # Clusters: 0 = outlier, 1 = majority and 2 = minority.
+        clusters = segmented_dbscan_1d(
+            deviations, pd.factorize(asset_codes)[0], epsilons, minimal_samples
+        )
+        return cls.mask_cluster_array(clusters.astype(np.int64), deviations, runtimes)
+
+    def predict_cluster_sorted_1d(
+        self, locations_dict, runtime_df, parameters_dict=None
+    ):
+        # Cluster all asset codes of locations dictionary in one call, each asset code as its own segment.
+        runtime_df = runtime_df[
+            runtime_df["asset_code"].isin(list(locations_dict.keys()))
+        ]
+        clusters = self.predict_cluster_sorted_1d_array(
+            locations_dict,
+            runtime_df["asset_code"],
+            runtime_df["deviation"].to_numpy(dtype=np.float64),
+            runtime_df["runtime"].to_numpy(),
+            parameters_dict,
+        )
+        return runtime_df.assign(cluster=clusters)
+
+    @classmethod
+    def predict_cluster_store(
+        cls,
+        locations_dict,
+        runtime_store,
+        parameters_dict=None,
+        batch_rows=RUNTIME_STORE_BATCH_ROWS,
+    ):
+        # Cluster asset codes of locations dictionary in batches of whole asset codes, each asset code as a segment.
+        # Results are written into preallocated arrays by position. Asset codes not in dictionary: cluster -1.
+        if parameters_dict is None:  # Parameters of config unless others are given.
+            parameters_dict = DBSCAN_PARAMETERS_DICT
+
+        asset_epsilons = np.full(len(runtime_store.asset_codes), np.nan)
+        asset_minimal_samples = np.zeros(len(runtime_store.asset_codes), dtype=np.int64)
+        for asset_id, asset_code in enumerate(runtime_store.asset_codes):
+            if asset_code in locations_dict:
+                parameters = parameters_dict[locations_dict[asset_code]]
+                asset_epsilons[asset_id] = parameters["epsilon"]
+                asset_minimal_samples[asset_id] = parameters["minimal_samples"]
+
+        deviations = np.empty(len(runtime_store), dtype=np.float32)
+        clusters = np.full(len(runtime_store), -1, dtype=np.int8)
+        for start_asset, stop_asset in runtime_store.split_assets(batch_rows):
+            batch_store = runtime_store.view_assets(start_asset, stop_asset)
+            start_row = runtime_store.offsets[start_asset]
+            stop_row = runtime_store.offsets[stop_asset]
+
+            # Deviation = runtime - last 7-day average, in minutes as data frames compute it.
+            runtimes = batch_store.runtimes / 60
+            batch_deviations = runtimes - batch_store.averages.astype(np.float64) / 60
+            deviations[start_row:stop_row] = batch_deviations
+
+            asset_ids = batch_store.get_asset_ids()
+            clustered = ~np.isnan(asset_epsilons[start_asset:stop_asset])[asset_ids]
+            if not clustered.any():
+                continue
+
+            asset_ids = asset_ids[clustered]
+            # Clusters: 0 = outlier, 1 = majority and 2 = minority.
+            batch_clusters = segmented_dbscan_1d(
+                batch_deviations[clustered],
+                asset_ids,
+                asset_epsilons[start_asset:stop_asset][asset_ids],
+                asset_minimal_samples[start_asset:stop_asset][asset_ids],
+            )
+            clusters[start_row:stop_row][clustered] = cls.mask_cluster_array(
+                batch_clusters, batch_deviations[clustered], runtimes[clustered]
+            )
+
+        return deviations, clusters
+
+    def predict_cluster_incremental(self, locations_dict, runtime_df):
+        # Score unprocessed rows against saved models, and only refit assets without valid models.
+        runtime_df = runtime_df[
+            runtime_df["asset_code"].isin(list(locations_dict.keys()))
+        ]
+
+        cluster_df_list = []  # List of cluster data for air compressors.
+        refit_asset_codes_list = []  # Asset codes that need a full fit.
+        for asset_code, asset_df in runtime_df.groupby(
+            "asset_code", observed=True, sort=False
+        ):
+            asset_code = str(asset_code)
+            parameters = DBSCAN_PARAMETERS_DICT[locations_dict[asset_code]]
+            latest_datetime = asset_df["datetime"].max()
+
+            model = dbscan_incremental.load_model(asset_code)
+            if dbscan_incremental.needs_refit(
+                model,
+                parameters["epsilon"],
+                parameters["minimal_samples"],
+                latest_datetime,
+            ):
+                refit_asset_codes_list.append(asset_code)
+                continue
+
+            unprocessed_df = asset_df[asset_df["status"] == 0]
+            deviations = unprocessed_df["deviation"].to_numpy(dtype=np.float64)
+
+            # Only fold in rows newer than model, in case same rows are scored again.
+            new_mask = (
+                unprocessed_df["datetime"] > pd.Timestamp(model["latest_datetime"])
+            ).to_numpy()
+            dbscan_incremental.fold(
+                model,
+                deviations[new_mask],
+                unprocessed_df["datetime"].to_numpy()[new_mask],
+                latest_datetime,
+            )
+            dbscan_incremental.save_model(asset_code, model)
+            # Classified after fold, so new points that become core points count, as in a full fit.
+            clusters = dbscan_incremental.classify(model, deviations)
+
+            cluster_df_list.append(
+                unprocessed_df.assign(
+                    cluster=self.mask_clusters(clusters, unprocessed_df)
+                )
+            )
 
-        return runtime_df
+        if len(refit_asset_codes_list) > 0:  # Fully fit all such assets in one call.
+            refit_df = runtime_df[runtime_df["asset_code"].isin(refit_asset_codes_list)]
+            epsilons, minimal_samples = self.get_parameter_arrays(
+                locations_dict, refit_df["asset_code"]
+            )
+            deviations = refit_df["deviation"].to_numpy(dtype=np.float64)
+            asset_ids, asset_codes = pd.factorize(refit_df["asset_code"])
+            clusters, core_mask = segmented_dbscan_1d(
+                deviations, asset_ids, epsilons, minimal_samples, return_core=True
+            )
 
-    def fit_and_predict(self, meta_data):
+            # Save one model per asset from its own rows.
+            order = np.argsort(asset_ids, kind="stable")
+            bounds = np.searchsorted(asset_ids[order], np.arange(len(asset_codes) + 1))
+            datetimes = refit_df["datetime"].to_numpy()
+            for i, asset_code in enumerate(asset_codes):
+                positions = order[bounds[i] : bounds[i + 1]]
+                dbscan_incremental.save_model(
+                    str(asset_code),
+                    dbscan_incremental.build_model(
+                        deviations[positions],
+                        datetimes[positions],
+                        core_mask[positions],
+                        clusters[positions],
+                        epsilons[positions[0]],
+                        minimal_samples[positions[0]],
+                    ),
+                )
+
+            cluster_df_list.append(
+                refit_df.assign(cluster=self.mask_clusters(clusters, refit_df))
+            )
+
+        if self.logger is not None:
+            self.logger.write(
+                "debug",
+                f"Incremental DBSCAN: {len(refit_asset_codes_list)} assets refitted.",
+            )
+        return pd.concat(cluster_df_list, axis=0)
+
+    def fit_and_predict(self, meta_data, asset_registry=None):
+        # Asset registry holds hashed lookups of meta data. If not given, one is built from meta data.
         asset_codes_list = sorted(
             set(self.runtime_df["asset_code"])
         )  # List of asset codes in runtime data.
@@ -69,62 +275,147 @@ class DBSCANClusterer:
             return
 
         runtime_df = self.runtime_df
+        # Index = row position, so that clusters of every engine line up with rows.
+        runtime_df.reset_index(drop=True, inplace=True)
         # Deviation = runtime - last 7-day average.
         runtime_df["deviation"] = runtime_df["runtime"] - runtime_df["last_7_day_avg"]
+        deviations = runtime_df["deviation"].to_numpy(dtype=np.float64)
+        runtimes = runtime_df["runtime"].to_numpy()
 
-        cluster_df_list = []  # List of cluster data for air compressors.
+        # Clusters written by row position into one array aligned with runtime data. -1: not clustered.
+        clusters = np.full(len(runtime_df), -1, dtype=np.int8)
+        # Row positions of each asset code, in input order.
+        asset_ids, asset_codes = pd.factorize(runtime_df["asset_code"])
+        asset_ids_dict = {str(code): i for i, code in enumerate(asset_codes)}
+        order = np.argsort(asset_ids, kind="stable")
+        bounds = np.searchsorted(asset_ids[order], np.arange(len(asset_codes) + 1))
+
+        # Asset codes clustered together by sorted 1d engine or incremental models, with their locations.
+        sorted_1d_locations_dict = dict()
+        incremental_locations_dict = dict()
+
+        if asset_registry is None:
+            asset_registry = AssetRegistry()
+            asset_registry.load_meta(meta_data)
+        # Only asset codes found in meta data, whose locations are IV or MSR_2.
+        locations_dict = asset_registry.get_dbscan_locations_dict(asset_codes_list)
 
-        for (
-            asset_code
-        ) in asset_codes_list:  # Iterate through air compressors' asset codes.
-            # If iterated asset code is not found in meta data, continue to next iteration.
-            if asset_code not in list(meta_data["asset_code"]):
+        # Iterate through air compressors' asset codes.
+        for asset_code, location_iter in locations_dict.items():
+            if DBSCAN_MODE == "incremental":
+                incremental_locations_dict.update({asset_code: location_iter})
                 continue
 
-            location_iter = meta_data.loc[
-                meta_data["asset_code"] == asset_code, "location"
-            ].iloc[0]
-            # If found location is neither IV nor MSR_2, continue to next iteration.
-            if location_iter not in ["IV", "MSR_2"]:
+            if DBSCAN_PARAMETERS_DICT[location_iter].get("engine") == "sorted_1d":
+                sorted_1d_locations_dict.update({asset_code: location_iter})
                 continue
 
-            runtime_df_iter = runtime_df[runtime_df["asset_code"] == asset_code]
-            cluster_df_iter = self.predict_cluster(location_iter, runtime_df_iter)
-            cluster_df_list.append(cluster_df_iter)
+            asset_id = asset_ids_dict[asset_code]
+            positions = order[bounds[asset_id] : bounds[asset_id + 1]]
+            clusters[positions] = self.predict_cluster_array(
+                location_iter, deviations[positions], runtimes[positions]
+            )
+
+        # Batches of whole asset codes, of about batch rows each, bound memory of sorted 1d engine.
+        sorted_1d_asset_ids = np.array(
+            [asset_ids_dict[code] for code in sorted_1d_locations_dict], dtype=np.int64
+        )
+        batch_numbers = (
+            np.cumsum(np.diff(bounds)[sorted_1d_asset_ids]) - 1
+        ) // RUNTIME_STORE_BATCH_ROWS
+        for batch_number in np.unique(batch_numbers):
+            # Positions of batch's rows, sorted back to input order.
+            positions = np.sort(
+                np.concatenate(
+                    [
+                        order[bounds[i] : bounds[i + 1]]
+                        for i in sorted_1d_asset_ids[batch_numbers == batch_number]
+                    ]
+                )
+            )
+            clusters[positions] = self.predict_cluster_sorted_1d_array(
+                sorted_1d_locations_dict,
+                runtime_df["asset_code"].iloc[positions],
+                deviations[positions],
+                runtimes[positions],
+            )
 
-        cluster_df = pd.concat(
-            cluster_df_list, axis=0
-        )  # Data frame of appended clustering results.
-        del cluster_df_list  # Delete cluster data list from memory.
+        if len(incremental_locations_dict) > 0:
+            cluster_df = self.predict_cluster_incremental(
+                incremental_locations_dict, runtime_df
+            )
+            clusters[cluster_df.index.to_numpy()] = cluster_df["cluster"].to_numpy()
 
+        # Only runtime data with status = 0 and conducted DBSCAN will be kept, by one mask.
+        runtime_df["cluster"] = clusters
         runtime_df = runtime_df[
-            runtime_df["status"] == 0
-        ]  # Only keep runtime data with status = 0 after DBSCAN.
-
-        # Inner join cluster column into runtime data and save into property.
-        # Only runtime data with status = 0 and conducted DBSCAN will be kept.
-        runtime_df = runtime_df.merge(
-            cluster_df[["datetime", "asset_code", "cluster"]],
-            left_on=["datetime", "asset_code"],
-            right_on=["datetime", "asset_code"],
-            how="inner",
-        )
+            (clusters >= 0) & (runtime_df["status"].to_numpy() == 0)
+        ]
+        runtime_df.reset_index(drop=True, inplace=True)
         self.runtime_df = runtime_df
 
         # Store abnormal clusters data (cluster != 1) into property.
-        abnormal_cluster_df = runtime_df[runtime_df["cluster"] != 1]
-        abnormal_cluster_df.sort_values(
-            by=["datetime", "asset_code"], ascending=[True, True], inplace=True
+        self.abnormal_cluster_df = runtime_df[runtime_df["cluster"] != 1].sort_values(
+            by=["datetime", "asset_code"], ascending=[True, True], ignore_index=True
         )
-        abnormal_cluster_df.reset_index(drop=True, inplace=True)
-        self.abnormal_cluster_df = abnormal_cluster_df
 
         if self.logger is not None:
             self.logger.write("info", "Air compressors clustering completed.")
             self.logger.write(
                 "debug", "Clustering results stored into clustering class."
             )
-            log_message = self.abnormal_cluster_df.to_string(
-                justify=DF_ALIGNMENT, index=False
+            # Rendered only if debug level is enabled.
+            self.logger.write(
+                "debug",
+                lambda: "Abnormal clusters\n"
+                + self.abnormal_cluster_df.to_string(justify=DF_ALIGNMENT, index=False),
             )
-            self.logger.write("debug", f"Abnormal clusters\n{log_message}")
+
+    @classmethod
+    def fit_and_predict_store(
+        cls, runtime_store, meta_data, asset_registry=None, logger=None
+    ):
+        # Fit and predict on runtime series store. Deviations and clusters of every row are set on store.
+        if len(runtime_store.asset_codes) <= 0:  # If asset codes list is empty.
+            if logger is not None:
+                logger.write(
+                    "error",
+                    "DBSCAN clustering stopped: air compressor asset codes list empty.",
+                )
+            print("DBSCAN clustering stopped: air compressor asset codes list empty.")
+            runtime_store.deviations = np.zeros(len(runtime_store), dtype=np.float32)
+            runtime_store.clusters = np.full(len(runtime_store), -1, dtype=np.int8)
+            return runtime_store
+
+        if asset_registry is None:
+            asset_registry = AssetRegistry()
+            asset_registry.load_meta(meta_data)
+        # Only asset codes found in meta data, whose locations are IV or MSR_2.
+        locations_dict = asset_registry.get_dbscan_locations_dict(
+            runtime_store.asset_codes
+        )
+
+        if (DBSCAN_MODE == "full") & all(
+            DBSCAN_PARAMETERS_DICT[location].get("engine") == "sorted_1d"
+            for location in locations_dict.values()
+        ):
+            deviations, clusters = cls.predict_cluster_store(
+                locations_dict, runtime_store
+            )
+
+        else:  # Per-asset sklearn and incremental engines run on data frames, whose clusters are put back by key.
+            clustering = cls(runtime_store.to_frame(), logger)
+            clustering.fit_and_predict(meta_data, asset_registry)
+            cluster_df = clustering.runtime_df
+            positions = runtime_store.get_positions(
+                cluster_df["asset_code"], cluster_df["datetime"]
+            )
+            deviations = np.full(len(runtime_store), np.nan, dtype=np.float32)
+            deviations[positions] = cluster_df["deviation"].to_numpy(dtype=np.float32)
+            clusters = np.full(len(runtime_store), -1, dtype=np.int8)
+            clusters[positions] = cluster_df["cluster"].to_numpy(dtype=np.int8)
+
+        runtime_store.deviations, runtime_store.clusters = deviations, clusters
+        if logger is not None:
+            logger.write("info", "Air compressors clustering completed.")
+        return runtime_store
@@ -0,0 +1,208 @@
+import os
+import numpy as np
+from config import (
+    DBSCAN_MODEL_PATH,
+    DBSCAN_REFIT_HOURS,
+    DBSCAN_DRIFT_THRESHOLD,
+    ADDITIONAL_RUNTIME_DAYS,
+)
+
+# Model entries saved as scalars rather than arrays.
+SCALAR_KEYS_LIST = [
+    "epsilon",
+    "minimal_samples",
+    "fitted_datetime",
+    "latest_datetime",
+    "fit_mean",
+    "fit_std",
+    "folded_sum",
+    "folded_count",
+]
+
+
+def _get_model_path(asset_code):
+    return os.path.join(DBSCAN_MODEL_PATH, f"{asset_code}.npz")
+
+
+def get_cluster_bounds(core_values, core_labels, epsilon):
+    # Cluster intervals as rows of (lowest core, highest core, cluster) over sorted core points.
+    if len(core_values) <= 0:
+        return np.empty((0, 3), dtype=np.float64)
+
+    # A new interval starts wherever the gap to previous core point exceeds epsilon.
+    starts = np.concatenate(([True], (core_values[1:] - core_values[:-1]) > epsilon))
+    interval_ids = np.cumsum(starts) - 1
+    interval_count = interval_ids[-1] + 1
+
+    lows = core_values[starts]
+    highs = core_values[np.concatenate((starts[1:], [True]))]
+    # Majority absorbs any minority cluster merged into same interval.
+    labels = np.full(interval_count, 2, dtype=np.int64)
+    np.minimum.at(labels, interval_ids, core_labels.astype(np.int64))
+    return np.column_stack((lows, highs, labels.astype(np.float64)))
+
+
+def build_model(values, datetimes, core_mask, clusters, epsilon, minimal_samples):
+    # Model of one asset from a full fit: sorted values with their datetimes, core status and clusters of cores.
+    values = np.asarray(values, dtype=np.float64)
+    datetimes = np.asarray(datetimes, dtype="datetime64[s]")
+    order = np.argsort(values, kind="stable")
+    core_mask = np.asarray(core_mask, dtype=bool)[order]
+    labels = np.where(core_mask, clusters[order], 0).astype(np.int8)
+
+    return {
+        "values": values[order],
+        "datetimes": datetimes[order],
+        "core_mask": core_mask,
+        "labels": labels,
+        "cluster_bounds": get_cluster_bounds(
+            values[order][core_mask], labels[core_mask], epsilon
+        ),
+        "epsilon": float(epsilon),
+        "minimal_samples": int(minimal_samples),
+        "fitted_datetime": datetimes.max(),
+        "latest_datetime": datetimes.max(),
+        "fit_mean": float(values.mean()),
+        "fit_std": float(values.std()),
+        "folded_sum": 0.0,
+        "folded_count": 0,
+    }
+
+
+def load_model(asset_code):  # Return None if asset has no saved model.
+    try:
+        saved_model = np.load(_get_model_path(asset_code))
+
+    except FileNotFoundError:
+        return None
+
+    model = {key: saved_model[key] for key in saved_model.files}
+    saved_model.close()
+    for key in SCALAR_KEYS_LIST:
+        model[key] = model[key][()]
+    return model
+
+
+def save_model(asset_code, model):
+    os.makedirs(DBSCAN_MODEL_PATH, exist_ok=True)
+    model_path = _get_model_path(asset_code)
+    temporary_path = model_path + ".tmp.npz"
+    np.savez(temporary_path, **model)
+    os.replace(temporary_path, model_path)  # Swap in atomically.
+
+
+def needs_refit(model, epsilon, minimal_samples, latest_datetime):
+    if model is None:  # Never fitted.
+        return True
+
+    if "datetimes" not in model:  # Saved before models kept datetimes of values.
+        return True
+
+    if (model["epsilon"] != epsilon) | (model["minimal_samples"] != minimal_samples):
+        return True
+
+    # Scheduled refit.
+    hours_since_fit = (
+        np.datetime64(latest_datetime, "s") - model["fitted_datetime"]
+    ) / np.timedelta64(1, "h")
+    if hours_since_fit >= DBSCAN_REFIT_HOURS:
+        return True
+
+    # Drift: mean deviation of folded points moved away from fitted mean, in units of fitted std.
+    if model["folded_count"] >= model["minimal_samples"]:
+        folded_mean = model["folded_sum"] / model["folded_count"]
+        drift = abs(folded_mean - model["fit_mean"]) / max(model["fit_std"], 1e-9)
+        if drift > DBSCAN_DRIFT_THRESHOLD:
+            return True
+
+    return False
+
+
+def classify(model, values):
+    # Clusters of new points against fitted cluster intervals: 0 = outlier, 1 = majority and 2 = minority.
+    values = np.asarray(values, dtype=np.float64)
+    cluster_bounds, epsilon = model["cluster_bounds"], model["epsilon"]
+    clusters = np.zeros(len(values), dtype=np.int8)
+    if len(cluster_bounds) <= 0:
+        return clusters
+
+    # Intervals on both sides of each point: last starting at or below it, and next one.
+    left_ids = np.searchsorted(cluster_bounds[:, 0], values, side="right") - 1
+    right_ids = left_ids + 1
+    has_left = left_ids >= 0
+    has_left[has_left] = (
+        values[has_left] - cluster_bounds[left_ids[has_left], 1]
+    ) <= epsilon
+    has_right = right_ids < len(cluster_bounds)
+    has_right[has_right] = (
+        cluster_bounds[right_ids[has_right], 0] - values[has_right]
+    ) <= epsilon
+
+    left_labels = np.where(has_left, cluster_bounds[np.maximum(left_ids, 0), 2], np.inf)
+    right_labels = np.where(
+        has_right,
+        cluster_bounds[np.minimum(right_ids, len(cluster_bounds) - 1), 2],
+        np.inf,
+    )
+    labels = np.minimum(left_labels, right_labels)  # Majority wins when both match.
+    clusters[np.isfinite(labels)] = labels[np.isfinite(labels)]
+    return clusters
+
+
+def get_nearby_mask(sorted_values, values, epsilon):
+    # Mask of sorted values within epsilon of any given value.
+    starts = np.searchsorted(sorted_values, values - epsilon, side="left")
+    stops = np.searchsorted(sorted_values, values + epsilon, side="right")
+    changes = np.zeros(len(sorted_values) + 1, dtype=np.int64)
+    np.add.at(changes, starts, 1)
+    np.add.at(changes, stops, -1)
+    return np.cumsum(changes[:-1]) > 0
+
+
+def fold(model, values, datetimes, latest_datetime):
+    # Insert new points, and drop points older than runtime window of a full fit.
+    # Only points within epsilon of inserted or dropped ones change neighbor counts, so their core status is redone.
+    values = np.asarray(values, dtype=np.float64)
+    datetimes = np.asarray(datetimes, dtype="datetime64[s]")
+    epsilon, minimal_samples = model["epsilon"], model["minimal_samples"]
+    latest_datetime = max(model["latest_datetime"], np.datetime64(latest_datetime, "s"))
+
+    order = np.argsort(values, kind="stable")
+    positions = np.searchsorted(model["values"], values[order])
+    model_values = np.insert(model["values"], positions, values[order])
+    model_datetimes = np.insert(model["datetimes"], positions, datetimes[order])
+    core_mask = np.insert(model["core_mask"], positions, False)
+    labels = np.insert(model["labels"], positions, 0).astype(np.int8)
+
+    kept = model_datetimes >= latest_datetime - np.timedelta64(
+        ADDITIONAL_RUNTIME_DAYS, "D"
+    )
+    dropped_values = model_values[~kept]
+    model_values, model_datetimes = model_values[kept], model_datetimes[kept]
+    core_mask, labels = core_mask[kept], labels[kept]
+
+    affected = np.flatnonzero(
+        get_nearby_mask(model_values, np.concatenate((values, dropped_values)), epsilon)
+    )
+    neighbor_counts = np.searchsorted(
+        model_values, model_values[affected] + epsilon, side="right"
+    ) - np.searchsorted(model_values, model_values[affected] - epsilon, side="left")
+    is_core = neighbor_counts >= minimal_samples
+
+    # Points becoming core join cluster interval they fall in. Core points outside all clusters start a minority.
+    promoted = affected[is_core & ~core_mask[affected]]
+    promoted_labels = classify(model, model_values[promoted])
+    labels[promoted] = np.where(promoted_labels == 0, 2, promoted_labels)
+    core_mask[affected] = is_core
+    labels[~core_mask] = 0
+
+    model["values"], model["datetimes"] = model_values, model_datetimes
+    model["core_mask"], model["labels"] = core_mask, labels
+    model["cluster_bounds"] = get_cluster_bounds(
+        model_values[core_mask], labels[core_mask], epsilon
+    )
+
+    model["folded_sum"] += float(values.sum())
+    model["folded_count"] += len(values)
+    model["latest_datetime"] = latest_datetime
+    return model
@@ -3,6 +3,7 @@ import os
 import pandas as pd
 import numpy as np
 from config import APP_BASE_PATH, DBSCAN_PARAMETERS_DICT, RUNTIME_LEVEL
+from algorithm.dbscan_1d import sweep_dbscan_1d
 
 
 class DBSCANTester:
@@ -119,6 +120,96 @@ class DBSCANTester:
                 index=False,
             )
 
+    def sweep(
+        self,
+        meta_data,
+        parameter_grid_dict,
+        asset_codes_list=None,
+        events_df=None,
+        clustering_summary=True,
+        export_csv=True,
+    ):
+        # Alarm counts of every (epsilon, minimal samples) pair of each location, from one sort per location.
+        # Only counts are computed, so a large grid costs close to one clustering run.
+        # Parameter grid: locations as keys, and lists of (epsilon, minimal samples) pairs as values.
+        # Events (optional): datetime and asset code of known abnormal hours, to count hits among alarms.
+        runtime_df = self.runtime_df.assign(
+            asset_code=self.runtime_df["asset_code"].astype(str)
+        )
+        if asset_codes_list is not None:
+            runtime_df = runtime_df[runtime_df["asset_code"].isin(asset_codes_list)]
+
+        locations_dict = dict(
+            zip(meta_data["asset_code"].astype(str), meta_data["location"])
+        )
+        runtime_df = runtime_df.assign(
+            location=runtime_df["asset_code"].map(locations_dict)
+        )
+
+        sweep_list = []  # One dictionary of counts per location and pair.
+        for location, parameter_pairs_list in parameter_grid_dict.items():
+            location_df = runtime_df[runtime_df["location"] == location]
+            if len(location_df) <= 0:
+                continue
+
+            # Deviation = runtime - last 7-day average.
+            deviations = (
+                location_df["runtime"] - location_df["last_7_day_avg"]
+            ).to_numpy(dtype=np.float64)
+            # Minority and outlier clusters are only applied to positive deviations above runtime threshold.
+            alarmable = (deviations > 0) & (
+                location_df["runtime"].to_numpy() > RUNTIME_LEVEL
+            )
+            asset_ids, asset_codes = pd.factorize(location_df["asset_code"])
+
+            # Flags counted outside majority cluster: alarms, and hits if events are given.
+            row_flags_list = [alarmable]
+            event_count = None
+            if events_df is not None:
+                event_keys = pd.MultiIndex.from_arrays(
+                    [events_df["datetime"], events_df["asset_code"].astype(str)]
+                )
+                is_event = pd.MultiIndex.from_arrays(
+                    [location_df["datetime"], location_df["asset_code"]]
+                ).isin(event_keys)
+                row_flags_list.append(alarmable & is_event)
+                event_count = int(is_event.sum())
+
+            for (epsilon, minimal_samples), flag_counts in sweep_dbscan_1d(
+                deviations,
+                asset_ids,
+                parameter_pairs_list,
+                np.column_stack(row_flags_list),
+            ):
+                alarm_count = int(flag_counts[:, 0].sum())
+                counts_dict = {
+                    "location": location,
+                    "epsilon": epsilon,
+                    "minimal_samples": minimal_samples,
+                    "rows": len(location_df),
+                    "assets": len(asset_codes),
+                    "alarms": alarm_count,
+                    "alarmed_assets": int((flag_counts[:, 0] > 0).sum()),
+                    "alarm_rate": alarm_count / len(location_df),
+                }
+                if event_count is not None:  # Hit rate: share of events alarmed.
+                    hit_count = int(flag_counts[:, 1].sum())
+                    counts_dict["hits"] = hit_count
+                    counts_dict["hit_rate"] = hit_count / max(event_count, 1)
+                    counts_dict["precision"] = hit_count / max(alarm_count, 1)
+                sweep_list.append(counts_dict)
+
+        sweep_df = pd.DataFrame(sweep_list)
+        if clustering_summary:
+            print("\n", sweep_df.to_string(index=False))  # Print sweep results.
+
+        if export_csv:  # Save sweep results as csv.
+            sweep_df.to_csv(
+                os.path.join(APP_BASE_PATH, "test", "air_compressor_sweep.csv"),
+                index=False,
+            )
+        return sweep_df
+
 
 if __name__ == "__main__":
     import datetime
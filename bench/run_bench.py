@@ -0,0 +1,232 @@
+"""Time pipeline hot paths on synthetic runtime data, and compare results against a stored baseline.
+
+Run from repository root:
+    python -m bench.run_bench --scales 10,100,1000,5000 --years 1
+    python -m bench.run_bench --save-baseline  # Store results as new baseline.
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import itertools
+import warnings
+import platform
+import datetime
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from config import APP_BASE_PATH, MOVING_AVG_WINDOW
+from bench.runtime_generator import generate_runtime, generate_meta, write_air_compressor_codes
+from utils.last_7_day_average import calculate_last_7_day_avg, calculate_last_7_day_avg_all
+from utils.runtime_series_store import RuntimeSeriesStore
+from utils.tag_names_getter import get_tag_names_dict
+from workflow.moving_avg_calculation_step import CalculationStep
+from workflow.upload_result_status_step import UploadStep
+from algorithm.dbscan_clustering import DBSCANClusterer
+from algorithm.dbscan_test import DBSCANTester
+
+BENCH_RESULTS_PATH = os.path.join(APP_BASE_PATH, 'bench', 'results')
+DEFAULT_OUTPUT_PATH = os.path.join(BENCH_RESULTS_PATH, 'latest.json')
+DEFAULT_BASELINE_PATH = os.path.join(BENCH_RESULTS_PATH, 'baseline.json')
+# Parameter grid of 100 (epsilon, minimal samples) pairs per location.
+SWEEP_GRID_DICT = {location: list(itertools.product([0.5, 1, 2, 3, 4, 5, 6, 8, 10, 15],
+                                                    [4, 6, 8, 10, 12, 14, 16, 20, 24, 30]))
+                   for location in ['IV', 'MSR_2']}
+
+
+def time_call(function, repeats):  # Best wall-clock seconds of repeated calls, and result of last call.
+    best_seconds, result = None, None
+    for _ in range(repeats):
+        gc.collect()
+        start_time = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start_time
+        best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+    return best_seconds, result
+
+
+def trace_call(function):  # Peak memory in MB allocated by one call, above memory held before it.
+    gc.collect()
+    tracemalloc.start()
+    function()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak_memory / 1024 ** 2
+
+
+def calculate_per_asset(runtime_df):  # Per-asset rolling mean, one asset after another.
+    return [calculate_last_7_day_avg(asset_df) for _, asset_df in runtime_df.groupby('asset_code', observed=True)]
+
+
+def conduct_calculation_step(runtime_df):
+    calculation_step = CalculationStep()
+    calculation_step.conduct(RuntimeSeriesStore.from_frame(runtime_df))
+    return calculation_step.runtime_store
+
+
+def process_frames(runtime_df, meta_df):  # Steps 1 and 2 on data frames, as before runtime series store.
+    calculated_df = calculate_last_7_day_avg_all(runtime_df, MOVING_AVG_WINDOW)
+    calculated_df.sort_values(by=['datetime', 'asset_code'], ascending=[True, True], inplace=True)
+    clustering = DBSCANClusterer(calculated_df)
+    clustering.fit_and_predict(meta_df)
+    return clustering.abnormal_cluster_df
+
+
+def process_store(runtime_df, meta_df):  # Steps 1 and 2 on runtime series store, converted from data frame.
+    runtime_store = conduct_calculation_step(runtime_df)
+    runtime_store = DBSCANClusterer.fit_and_predict_store(runtime_store, meta_df)
+    runtime_store = runtime_store.select((runtime_store.statuses == 0) & (runtime_store.clusters >= 0))
+    return runtime_store.select(runtime_store.clusters != 1)
+
+
+def fit_and_predict(runtime_df, meta_df):
+    clustering = DBSCANClusterer(runtime_df.copy())
+    clustering.fit_and_predict(meta_df)
+    return clustering.abnormal_cluster_df
+
+
+def sweep(runtime_df, meta_df):
+    tester = DBSCANTester(runtime_df.copy())
+    return tester.sweep(meta_df, SWEEP_GRID_DICT, clustering_summary=False, export_csv=False)
+
+
+def bench_scale(asset_count, years, unprocessed_hours, repeats, legacy_max_assets, seed):
+    # Results of every target at one scale.
+    runtime_df = generate_runtime(asset_count, years, unprocessed_hours, seed=seed)
+    meta_df = generate_meta(asset_count)
+    rows = len(runtime_df)
+    results_list = []
+
+    def add_result(target, seconds, target_rows=rows, peak_memory_mb=None):
+        results_list.append({'target': target, 'assets': asset_count, 'years': years, 'rows': target_rows,
+                             'seconds': round(seconds, 6),
+                             'rows_per_sec': round(target_rows / max(seconds, 1e-9), 1)})
+        memory_str = ''
+        if peak_memory_mb is not None:
+            results_list[-1]['peak_memory_mb'] = round(peak_memory_mb, 1)
+            memory_str = f' peak_memory_mb={peak_memory_mb:.1f}'
+        print(f'{target:<40} assets={asset_count:<6} rows={target_rows:<10} seconds={seconds:.4f}{memory_str}')
+
+    if asset_count <= legacy_max_assets:  # Per-asset pandas rolling mean gets slow at large scales.
+        seconds, _ = time_call(lambda: calculate_per_asset(runtime_df), repeats)
+        add_result('calculate_last_7_day_avg', seconds)
+
+    seconds, calculated_store = time_call(lambda: conduct_calculation_step(runtime_df), repeats)
+    add_result('CalculationStep.conduct', seconds)
+    calculated_df = calculated_store.to_frame().sort_values(by=['datetime', 'asset_code'], ignore_index=True)
+    del calculated_store
+
+    # Steps 1 and 2 end to end, with memory they allocate on top of queried runtime data.
+    for target, process in [('process (data frames)', process_frames), ('process (RuntimeSeriesStore)', process_store)]:
+        seconds, _ = time_call(lambda: process(runtime_df, meta_df), repeats)
+        add_result(target, seconds, peak_memory_mb=trace_call(lambda: process(runtime_df, meta_df)))
+
+    seconds, abnormal_cluster_df = time_call(lambda: fit_and_predict(calculated_df, meta_df), repeats)
+    add_result('DBSCANClusterer.fit_and_predict', seconds, len(calculated_df),
+               trace_call(lambda: fit_and_predict(calculated_df, meta_df)))
+
+    seconds, _ = time_call(lambda: sweep(calculated_df, meta_df), repeats)
+    add_result('DBSCANTester.sweep (100 pairs)', seconds, len(calculated_df))
+
+    with tempfile.TemporaryDirectory() as folder_path:
+        air_compressor_codes_path = write_air_compressor_codes(folder_path, asset_count)
+        seconds, tag_names_dict = time_call(lambda: get_tag_names_dict(air_compressor_codes_path), repeats)
+        add_result('get_tag_names_dict', seconds, asset_count)
+
+    if len(abnormal_cluster_df) > 0:
+        seconds, _ = time_call(lambda: UploadStep.build_result_status_df(abnormal_cluster_df.copy(), tag_names_dict),
+                               repeats)
+        add_result('UploadStep.build_result_status_df', seconds, len(abnormal_cluster_df))
+
+    return results_list
+
+
+def compare_with_baseline(results_list, baseline_path, tolerance):
+    # Print ratio of current to baseline seconds per target and scale. Return number of regressions.
+    try:
+        file = open(baseline_path, 'r')
+        baseline_dict = json.load(file)
+        file.close()
+
+    except FileNotFoundError:
+        print(f'No baseline at {baseline_path}: save one with --save-baseline.')
+        return 0
+
+    baseline_seconds_dict = {(result['target'], result['assets'], result['years']): result['seconds']
+                             for result in baseline_dict['results']}
+    baseline_memory_dict = {(result['target'], result['assets'], result['years']): result.get('peak_memory_mb')
+                            for result in baseline_dict['results']}
+    regression_count = 0
+    print(f'\nComparison with baseline {baseline_path} (tolerance {tolerance:.0%}):')
+    for result in results_list:
+        baseline_seconds = baseline_seconds_dict.get((result['target'], result['assets'], result['years']))
+        if baseline_seconds is None:
+            continue
+
+        ratio = result['seconds'] / max(baseline_seconds, 1e-9)
+        result['baseline_seconds'] = baseline_seconds
+        result['ratio'] = round(ratio, 4)
+        verdict = 'REGRESSION' if ratio > 1 + tolerance else ('faster' if ratio < 1 - tolerance else 'same')
+        regression_count += verdict == 'REGRESSION'
+        memory_str = ''
+        baseline_memory_mb = baseline_memory_dict[(result['target'], result['assets'], result['years'])]
+        if (baseline_memory_mb is not None) & ('peak_memory_mb' in result):
+            result['baseline_peak_memory_mb'] = baseline_memory_mb
+            memory_str = f', peak memory {baseline_memory_mb:.1f} MB -> {result["peak_memory_mb"]:.1f} MB'
+        print(f'{result["target"]:<40} assets={result["assets"]:<6} {baseline_seconds:.4f}s -> '
+              f'{result["seconds"]:.4f}s ({ratio:.2f}x) {verdict}{memory_str}')
+    return regression_count
+
+
+def save_results(results_dict, output_path):
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    file = open(output_path, 'w')
+    json.dump(results_dict, file, indent=2)
+    file.close()
+    print(f'Results saved to {output_path}.')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark pipeline hot paths offline on synthetic runtime data.')
+    parser.add_argument('--scales', default='10,100,1000,5000', help='Comma-separated asset counts.')
+    parser.add_argument('--years', type=float, default=1.0, help='Years of hourly runtime data per asset.')
+    parser.add_argument('--unprocessed-hours', type=int, default=24,
+                        help='Latest hours left unprocessed, as in one batch of ingestion.')
+    parser.add_argument('--repeats', type=int, default=3, help='Calls per target, best one kept.')
+    parser.add_argument('--legacy-max-assets', type=int, default=100,
+                        help='Largest scale at which per-asset calculate_last_7_day_avg is timed.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_PATH, help='JSON file of results.')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH, help='JSON file of baseline results.')
+    parser.add_argument('--save-baseline', action='store_true', help='Also save results as baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Slowdown ratio counted as regression.')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with 1 if any target regressed.')
+    arguments = parser.parse_args(argv)
+    # Pipeline steps assign into slices of data frames in place, which would flood the output.
+    warnings.filterwarnings('ignore', category=pd.errors.SettingWithCopyWarning)
+    warnings.filterwarnings('ignore', category=FutureWarning)
+
+    results_list = []
+    for asset_count in [int(scale) for scale in arguments.scales.split(',')]:
+        results_list.extend(bench_scale(asset_count, arguments.years, arguments.unprocessed_hours,
+                                        arguments.repeats, arguments.legacy_max_assets, arguments.seed))
+
+    regression_count = compare_with_baseline(results_list, arguments.baseline, arguments.tolerance)
+    results_dict = {'created_time': datetime.datetime.now().isoformat(sep=' ', timespec='seconds'),
+                    'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                                    'numpy': np.__version__, 'pandas': pd.__version__},
+                    'arguments': vars(arguments), 'results': results_list}
+    save_results(results_dict, arguments.output)
+    if arguments.save_baseline:
+        save_results(results_dict, arguments.baseline)
+
+    if arguments.fail_on_regression & (regression_count > 0):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import os
+import datetime
+import numpy as np
+import pandas as pd
+from config import DBSCAN_PARAMETERS_DICT, RUNTIME_COLUMNS_LIST
+
+ASSET_CODE_START = 10100000  # Asset codes of synthetic air compressors count up from here.
+
+
+def generate_asset_runtime(rng, hour_datetimes, spike_rates, gap_rate):
+    # Hourly runtime in seconds of one air compressor, and mask of hours kept after gaps.
+    hour_count = len(hour_datetimes)
+    hours_of_day = hour_datetimes.hour.to_numpy()
+    is_weekend = hour_datetimes.dayofweek.to_numpy() >= 5
+
+    # Daily cycle in minutes: busy day shift and quiet night, shifted per asset; lighter weekends.
+    base_load = rng.uniform(15, 35)
+    daily_amplitude = rng.uniform(5, 20)
+    phase = rng.uniform(-2, 2)
+    runtime = base_load + daily_amplitude * np.sin(2 * np.pi * (hours_of_day - 8 + phase) / 24)
+    runtime = runtime - is_weekend * rng.uniform(0, 10) + rng.normal(0, 3, hour_count)
+
+    # Spikes: sudden hours near full runtime.
+    spikes = rng.random(hour_count) < spike_rates
+    runtime[spikes] = rng.uniform(45, 60, spikes.sum())
+    runtime = np.clip(np.round(runtime * 60), 0, 3600).astype(np.int32)  # Minutes into seconds.
+
+    # Gaps: stretches of missing hours, such as sensor or network outages.
+    kept = np.ones(hour_count, dtype=bool)
+    for gap_start in np.flatnonzero(rng.random(hour_count) < gap_rate):
+        kept[gap_start: gap_start + rng.geometric(1 / 6)] = False
+    return runtime, kept
+
+
+def generate_runtime(asset_count=10, years=1.0, unprocessed_hours=1, spike_rate=0.001, unprocessed_spike_rate=0.05,
+                     gap_rate=0.001, seed=0, end_datetime=datetime.datetime(2024, 1, 1)):
+    # Runtime data typed as bulk reads return it: sorted by datetime and asset code, last hours unprocessed.
+    # Unprocessed hours spike more often, so that each batch has abnormal clusters to upload.
+    rng = np.random.default_rng(seed)
+    hour_count = int(years * 365 * 24) + unprocessed_hours
+    hour_datetimes = pd.date_range(end=end_datetime, periods=hour_count, freq='h')
+    first_unprocessed_datetime = hour_datetimes[-unprocessed_hours] if unprocessed_hours > 0 else None
+    spike_rates = np.full(hour_count, spike_rate)
+    spike_rates[hour_count - unprocessed_hours:] = unprocessed_spike_rate
+
+    asset_codes_list = [str(ASSET_CODE_START + i) for i in range(asset_count)]
+    column_chunks_dict = {column: [] for column in RUNTIME_COLUMNS_LIST}
+    for asset_index, asset_code in enumerate(asset_codes_list):
+        runtime, kept = generate_asset_runtime(rng, hour_datetimes, spike_rates, gap_rate)
+        datetimes = hour_datetimes[kept].to_numpy().astype('datetime64[s]')
+
+        column_chunks_dict['id'].append(asset_code + '-' + pd.Index(np.flatnonzero(kept)).astype(str))
+        column_chunks_dict['datetime'].append(datetimes)
+        column_chunks_dict['asset_code'].append(np.full(len(datetimes), asset_index, dtype=np.int32))
+        column_chunks_dict['runtime'].append(runtime[kept])
+        if first_unprocessed_datetime is None:
+            column_chunks_dict['status'].append(np.ones(len(datetimes), dtype=np.int8))
+        else:
+            column_chunks_dict['status'].append((datetimes < first_unprocessed_datetime).astype(np.int8))
+
+    runtime_df = pd.DataFrame({column: np.concatenate(column_chunks)
+                               for column, column_chunks in column_chunks_dict.items()})
+    runtime_df['asset_code'] = pd.Categorical.from_codes(runtime_df['asset_code'], asset_codes_list)
+    runtime_df.sort_values(by=['datetime', 'asset_code'], ascending=[True, True], inplace=True, kind='stable')
+    return runtime_df.reset_index(drop=True)
+
+
+def generate_meta(asset_count=10):  # Air compressor meta data, spreading assets over all DBSCAN locations.
+    locations_list = list(DBSCAN_PARAMETERS_DICT.keys())
+    return pd.DataFrame({'name': [f'air_compressor_{i + 1}' for i in range(asset_count)],
+                         'asset_code': [str(ASSET_CODE_START + i) for i in range(asset_count)],
+                         'location': [locations_list[i % len(locations_list)] for i in range(asset_count)]})
+
+
+def write_air_compressor_codes(folder_path, asset_count=10):  # Write codes csv read by tag names getter.
+    air_compressor_codes_path = os.path.join(folder_path, 'air_compressor_codes.csv')
+    pd.DataFrame({'asset_code': [str(ASSET_CODE_START + i) for i in range(asset_count)],
+                  'tag_name': [f'AC{ASSET_CODE_START + i}.RUNTIME' for i in range(asset_count)]}
+                 ).to_csv(air_compressor_codes_path, index=False)
+    return air_compressor_codes_path
+
+
+if __name__ == '__main__':
+    print(generate_runtime(3, 0.01))
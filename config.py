@@ -6,8 +6,9 @@ import os
 # File path settings.
 APP_BASE_PATH = os.path.dirname(os.path.abspath(__file__))  # Where python files are stored.
 
-# Source folder.
-SOURCE_FOLDER_BASE_PATH = os.path.join(os.path.dirname(APP_BASE_PATH), 'source', 'air_compressor')
+# Source folder. Environment variable AIR_COMPRESSOR_SOURCE_PATH moves it, such as into a load test folder.
+SOURCE_FOLDER_BASE_PATH = os.environ.get('AIR_COMPRESSOR_SOURCE_PATH',
+                                         os.path.join(os.path.dirname(APP_BASE_PATH), 'source', 'air_compressor'))
 
 
 # MySQL database connection settings.
@@ -18,10 +19,46 @@ DB_PASSWORD = 'suezAdmin!3'
 DB_SCHEMA = 'mw_task1_pm_db'
 DB_POOL_SIZE = 30
 DB_MAX_OVERFLOW = 15
+# Engine URL replacing MySQL settings above, such as 'sqlite:////tmp/load_test.db'. None: MySQL.
+DB_URL = os.environ.get('AIR_COMPRESSOR_DB_URL')
+# Independent reads at start of run, such as meta data sync and runtime query, run at once in a thread pool.
+DB_CONCURRENT_READS_ENABLED = True
+DB_CONCURRENT_READ_WORKERS = 4  # Threads issuing reads, each holding one pooled connection. At most DB_POOL_SIZE.
+
+
+# Meta data sync settings.
+# 'diff': insert new rows and delete removed rows in one transaction; 'truncate': truncate and insert all rows.
+META_SYNC_MODE = 'diff'
+
+
+# Shard and lock settings.
+# 'file': lock file shared by processes on one host; 'mysql': advisory lock shared by all hosts.
+META_SYNC_LOCK = 'file'
+META_SYNC_LOCK_PATH = os.path.join(SOURCE_FOLDER_BASE_PATH, 'meta_sync.lock')
+META_SYNC_LOCK_NAME = 'air_compressor_meta_sync'  # Name of MySQL advisory lock.
+META_SYNC_LOCK_TIMEOUT = 600  # Seconds to wait for MySQL advisory lock.
+
+
+# Daemon settings.
+DAEMON_POLL_SECONDS = 10  # Seconds between polls for unprocessed runtime data.
+DAEMON_HEARTBEAT_SECONDS = 60  # Seconds between heartbeats.
+DAEMON_HEARTBEAT_PATH = os.path.join(SOURCE_FOLDER_BASE_PATH, 'daemon_heartbeat.json')
+
+
+# Run timing settings.
+RUN_TIMING_ENABLED = True  # Save nested timing spans of each run as one JSON line.
+RUN_TIMING_PATH = os.path.join(SOURCE_FOLDER_BASE_PATH, 'run_timings.jsonl')
+RUN_PROFILE_ENABLED = False  # Dump one cProfile pstats file per stage. Also set by --profile.
+# Profiles only cover main thread: concurrent reads and write-behind writes run in pool threads, and only show up
+# as timing spans.
+RUN_PROFILE_PATH = os.path.join(SOURCE_FOLDER_BASE_PATH, 'profiles')  # One folder per run.
 
 
 # Logger settings.
 DEFAULT_LOG_LEVEL = 20  # CRITICAL: 50; ERROR: 40; WARNING: 30; INFO: 20; DEBUG: 10.
+LOG_MAX_BYTES = 10 * 1024 ** 2  # Log file is rotated once it reaches this size.
+LOG_BACKUP_COUNT = 5  # Rotated log files kept.
+# Sharded runs write one log file per shard, such as task_1_ac_app_shard_0_of_4.log.
 DF_ALIGNMENT = 'center'  # Alignment of data frame columns.
 
 
@@ -35,17 +72,87 @@ ADDITIONAL_RUNTIME_DAYS = 365
 
 RUNTIME_COLUMNS_LIST = ['id', 'datetime', 'asset_code', 'runtime', 'status']  # Columns needed for runtime data.
 
+# 'bulk': typed core select streamed in chunks, unprocessed and past rows in one query; 'orm': ORM row objects.
+RUNTIME_READ_MODE = 'bulk'
+RUNTIME_FETCH_CHUNK_SIZE = 50000  # Rows per fetch in bulk mode.
+
+# 'bulk': executemany updates committed per chunk; 'orm': one update and commit per row.
+RUNTIME_UPDATE_MODE = 'bulk'
+RUNTIME_UPDATE_CHUNK_SIZE = 5000  # Rows per commit in bulk mode.
+
+
+# Write-behind settings.
+# Runtime status updates and result status upserts are queued in chunks and written by background threads,
+# so writes overlap with later computation. Before each run returns, queue is flushed and written rows reported by
+# each chunk are checked against its submitted rows.
+WRITE_BEHIND_ENABLED = True
+WRITE_BEHIND_WRITERS = 2  # Writer threads, each holding one pooled connection at a time. At most DB_POOL_SIZE.
+WRITE_BEHIND_QUEUE_SIZE = 8  # Chunks queued at most. Producer blocks while queue is full.
+WRITE_BEHIND_CHUNK_ROWS = 50000  # Rows per queued chunk. Runtime status chunks hold whole asset codes.
+WRITE_BEHIND_RETRIES = 2  # Retries of a failed chunk. Writes are idempotent, so retried chunks are safe.
+WRITE_BEHIND_RETRY_SECONDS = 1  # Seconds before first retry, doubled on each later retry.
+
+
+# Runtime series store settings.
+# Steps pass runtime data as compact arrays sorted by asset code and datetime, batched by whole asset codes.
+RUNTIME_STORE_BATCH_ROWS = 1000000  # Rows per batch of moving average and DBSCAN clustering.
+
+
+# Runtime history cache settings.
+# Past runtime data (status = 1) is kept locally so that only newly processed rows are queried each run.
+RUNTIME_HISTORY_CACHE_ENABLED = True
+# One folder per asset code, one parquet file per month.
+RUNTIME_HISTORY_CACHE_PATH = os.path.join(SOURCE_FOLDER_BASE_PATH, 'runtime_history')
+
+
+# Moving average settings.
+# 'cumsum': all asset codes in one vectorized pass; 'joblib': rolling mean per asset code in thread pool;
+# 'stateful': unprocessed rows from saved per-asset ring buffers, other rows as 'cumsum'.
+MOVING_AVG_ENGINE = 'cumsum'
+# Integer: number of hourly rows. Time string such as '168h': time-aware window, 'stateful' falls back to 'cumsum'.
+MOVING_AVG_WINDOW = 168
+MOVING_AVG_STATES_PATH = os.path.join(SOURCE_FOLDER_BASE_PATH, 'last_7_day_avg_states.npz')  # Ring buffers.
+
 
 # DBSCAN clustering settings.
-DBSCAN_PARAMETERS_DICT = {'IV': {'minimal_samples': 12, 'epsilon': 5},
-                          'MSR_2': {'minimal_samples': 12, 'epsilon': 1}}
+# Engine 'sorted_1d': exact one-dimensional DBSCAN over all assets in one vectorized call; 'sklearn': per-asset DBSCAN.
+DBSCAN_PARAMETERS_DICT = {'IV': {'minimal_samples': 12, 'epsilon': 5, 'engine': 'sorted_1d'},
+                          'MSR_2': {'minimal_samples': 12, 'epsilon': 1, 'engine': 'sorted_1d'}}
 
 RUNTIME_LEVEL = 30  # Runtime threshold. Unit: minutes.
 
+# 'full': fit DBSCAN on whole runtime history every run; 'incremental': score new rows against saved models.
+DBSCAN_MODE = 'full'
+DBSCAN_MODEL_PATH = os.path.join(SOURCE_FOLDER_BASE_PATH, 'dbscan_models')  # One model file per asset code.
+DBSCAN_REFIT_HOURS = 24 * 7  # Hours of new runtime data after which a model is fully refitted.
+# Refit when mean deviation of folded points drifts more than this many fitted standard deviations.
+DBSCAN_DRIFT_THRESHOLD = 1.0
+
+
+# DBSCAN backfill settings.
+DBSCAN_BACKFILL_PATH = os.path.join(SOURCE_FOLDER_BASE_PATH, 'dbscan_backfill')  # Partitioned results.
+DBSCAN_BACKFILL_ASSET_CHUNK_SIZE = 50  # Asset codes per work unit.
+DBSCAN_BACKFILL_WINDOW = 'MS'  # Pandas frequency splitting date range into work unit windows. 'MS': months.
+DBSCAN_BACKFILL_WORKERS = os.cpu_count()  # Processes in pool.
+
+
+# ID generation settings.
+ID_POOL_MIN_ROWS = 5000000  # Batches of at least this many rows are hashed in a pool of spawned processes.
+ID_POOL_WORKERS = os.cpu_count()  # Processes in pool. None or 1: always hash in this process.
+
 
 # Cluster names settings.
 CLUSTER_NAMES_DICT = {0: 'Outlier', 2: 'Minority'}  # Dictionary to name clusters.
 
 
+# Result status settings.
+RESULT_STATUS_UPSERT_CHUNK_SIZE = 1000  # Rows per multi-row upsert statement and commit.
+# Only upsert new alarms and alarms whose result status changed, so unchanged ones keep load date and push status.
+RESULT_STATUS_SKIP_UNCHANGED = True
+RESULT_STATUS_FETCH_CHUNK_SIZE = 1000  # Ids per query of existing result statuses.
+
+
 # Unsent result status settings.
 UNSENT_RESULT_STATUS_COLUMNS_LIST = ['Time', 'Tag Name', 'Asset Code', 'Severity']
+UNSENT_RESULT_STATUS_PAGE_SIZE = 10000  # Rows per keyset page, ordered by id.
+PUSH_STATUS_UPDATE_CHUNK_SIZE = 1000  # Ids per push status update statement and commit.
@@ -0,0 +1,38 @@
+from sqlalchemy import text
+from dao.db_connector import engine
+
+
+class DatabaseLock:
+    """Lock shared by processes on all hosts, held as a MySQL advisory lock."""
+
+    def __init__(self, lock_name, timeout_seconds=600):
+        self.lock_name = lock_name
+        self.timeout_seconds = timeout_seconds
+        self.connection = None
+
+    def acquire(
+        self,
+    ):  # Advisory locks belong to a connection, so keep it until release.
+        self.connection = engine.connect()
+        acquired = self.connection.execute(
+            text("SELECT GET_LOCK(:lock_name, :timeout_seconds)"),
+            {"lock_name": self.lock_name, "timeout_seconds": self.timeout_seconds},
+        ).scalar()
+        if acquired != 1:
+            self.connection.close()
+            self.connection = None
+            raise TimeoutError(f"Advisory lock {self.lock_name} not acquired.")
+
+    def release(self):
+        self.connection.execute(
+            text("SELECT RELEASE_LOCK(:lock_name)"), {"lock_name": self.lock_name}
+        )
+        self.connection.close()
+        self.connection = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
@@ -1,6 +1,7 @@
 from sqlalchemy import Column, String, text
 import pandas as pd
 from dao.db_connector import Base, DBSession
+from utils.run_timer import timed
 
 
 class AirCompressorDao(Base):
@@ -13,6 +14,7 @@ class AirCompressorDao(Base):
     location = Column(String)
 
 
+@timed("air_compressor_meta_dao.read_air_compressor_meta")
 def read_air_compressor_meta(logger=None):  # Read air compressor meta data.
     if logger is not None:
         logger.write("debug", "MySQL connection ready.")
@@ -37,6 +39,21 @@ def read_air_compressor_meta(logger=None):  # Read air compressor meta data.
     )
 
 
+@timed("air_compressor_meta_dao.read_air_compressor_meta_ids")
+def read_air_compressor_meta_ids(logger=None):  # Read ids of air compressor meta data.
+    if logger is not None:
+        logger.write("debug", "MySQL connection ready.")
+
+    session = DBSession()
+    results = session.query(AirCompressorDao.id).all()
+    session.close()
+
+    if logger is not None:
+        logger.write("debug", "MySQL connection closed.")
+    return [result.id for result in results]
+
+
+@timed("air_compressor_meta_dao.truncate_and_insert")
 def truncate_and_insert(
     data_frame, logger=None
 ):  # Insert air compressor meta data into database.
@@ -44,8 +61,11 @@ def truncate_and_insert(
         logger.write("debug", "MySQL connection ready.")
 
     session = DBSession()
-    # Truncate air_compressor_meta_data table first.
-    session.execute(text("""TRUNCATE air_compressor_meta_data;"""))
+    # Truncate air_compressor_meta_data table first. SQLite has no truncate statement.
+    if session.get_bind().dialect.name == "sqlite":
+        session.execute(text("""DELETE FROM air_compressor_meta_data;"""))
+    else:
+        session.execute(text("""TRUNCATE air_compressor_meta_data;"""))
     # Insert all air compressor information.
     session.bulk_insert_mappings(AirCompressorDao, data_frame.to_dict(orient="records"))
     session.commit()
@@ -54,3 +74,37 @@ def truncate_and_insert(
     if logger is not None:
         logger.write("info", "Air compressor meta data attempted database insertion.")
         logger.write("debug", "MySQL connection closed.")
+
+
+@timed("air_compressor_meta_dao.insert_and_delete")
+def insert_and_delete(data_frame, deleted_ids_list, logger=None):
+    # Insert new air compressor meta data and delete removed ids in one transaction.
+    # Unlike truncation, concurrent readers see old rows until commit, never an empty table.
+    if logger is not None:
+        logger.write("debug", "MySQL connection ready.")
+
+    session = DBSession()
+    try:
+        if len(deleted_ids_list) > 0:
+            session.query(AirCompressorDao).filter(
+                AirCompressorDao.id.in_(deleted_ids_list)
+            ).delete(synchronize_session=False)
+        if len(data_frame) > 0:
+            session.bulk_insert_mappings(
+                AirCompressorDao, data_frame.to_dict(orient="records")
+            )
+        session.commit()
+
+    except Exception:
+        session.rollback()
+        raise
+
+    finally:
+        session.close()
+
+    if logger is not None:
+        logger.write(
+            "info",
+            f"Air compressor meta data: {len(data_frame)} rows inserted and {len(deleted_ids_list)} rows deleted.",
+        )
+        logger.write("debug", "MySQL connection closed.")
@@ -0,0 +1,70 @@
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from config import DB_POOL_SIZE, DB_CONCURRENT_READ_WORKERS
+
+
+class ConcurrentDao:
+    """Issue independent database round trips at once in a thread pool, over engine's connection pool."""
+
+    def __init__(self, workers=DB_CONCURRENT_READ_WORKERS, logger=None):
+        # At most pool size, so threads don't wait for pooled connections.
+        self.workers = max(1, min(workers, DB_POOL_SIZE))
+        self.logger = logger
+        # Names as keys, and seconds of their calls in last gather as values.
+        self.seconds_dict = dict()
+
+    def gather(self, calls_dict):
+        # Run callables of dictionary at once and return their results under same names.
+        # All calls end before first exception, in dictionary order, is raised.
+        self.seconds_dict = dict()
+        if (self.workers <= 1) | (
+            len(calls_dict) <= 1
+        ):  # One after another, in dictionary order.
+            return {
+                name: self.call(name, function) for name, function in calls_dict.items()
+            }
+
+        executor = ThreadPoolExecutor(
+            max_workers=min(self.workers, len(calls_dict)),
+            thread_name_prefix="concurrent_dao",
+        )
+        # Each call runs in a copy of caller's context, so its run timer spans nest under caller's open span.
+        futures_dict = {
+            name: executor.submit(
+                contextvars.copy_context().run, self.call, name, function
+            )
+            for name, function in calls_dict.items()
+        }
+        executor.shutdown(wait=True)
+        # Calls end in any order, so keep seconds in dictionary order.
+        self.seconds_dict = {name: self.seconds_dict[name] for name in calls_dict}
+
+        for name, future in futures_dict.items():
+            if future.exception() is not None:
+                if self.logger is not None:
+                    self.logger.write(
+                        "error", f"Concurrent read {name} failed: {future.exception()}."
+                    )
+                raise future.exception()
+
+        if self.logger is not None:
+            self.logger.write(
+                "debug",
+                lambda: "Concurrent reads: "
+                + ", ".join(
+                    f"{name}: {seconds:.3f}s"
+                    for name, seconds in self.seconds_dict.items()
+                )
+                + ".",
+            )
+        return {name: future.result() for name, future in futures_dict.items()}
+
+    def call(self, name, function):
+        # Call function and record its seconds under name.
+        start_time = time.perf_counter()
+        try:
+            return function()
+
+        finally:
+            self.seconds_dict[name] = round(time.perf_counter() - start_time, 6)
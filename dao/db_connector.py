@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine, QueuePool
+import zlib
+from sqlalchemy import create_engine, event, QueuePool
 from sqlalchemy.orm import sessionmaker, declarative_base
 from config import (
     DB_IP,
@@ -8,6 +9,7 @@ from config import (
     DB_SCHEMA,
     DB_POOL_SIZE,
     DB_MAX_OVERFLOW,
+    DB_URL,
 )
 
 
@@ -15,22 +17,35 @@ from config import (
 Base = declarative_base()
 
 # Database connection engine.
-engine = create_engine(
-    "mysql+pymysql://"
-    + DB_USERNAME
-    + ":"
-    + DB_PASSWORD
-    + "@"
-    + DB_IP
-    + ":"
-    + DB_PORT
-    + "/"
-    + DB_SCHEMA,
-    poolclass=QueuePool,
-    pool_size=DB_POOL_SIZE,
-    max_overflow=DB_MAX_OVERFLOW,
-    echo=False,
-)
+if DB_URL is None:
+    engine = create_engine(
+        "mysql+pymysql://"
+        + DB_USERNAME
+        + ":"
+        + DB_PASSWORD
+        + "@"
+        + DB_IP
+        + ":"
+        + DB_PORT
+        + "/"
+        + DB_SCHEMA,
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        echo=False,
+    )
+
+else:  # Stand-in database, such as SQLite for offline load tests.
+    engine = create_engine(DB_URL, echo=False)
+
+    if engine.dialect.name == "sqlite":
+
+        @event.listens_for(engine, "connect")
+        def register_sqlite_functions(dbapi_connection, connection_record):
+            # MySQL functions used by DAO queries. CRC32 hashes asset codes into shards.
+            dbapi_connection.create_function(
+                "crc32", 1, lambda value: zlib.crc32(str(value).encode())
+            )
 
 # Database session.
 DBSession = sessionmaker(bind=engine)
@@ -1,7 +1,18 @@
-from sqlalchemy import Column, DateTime, String, Integer, text
+from sqlalchemy import Column, DateTime, String, Integer, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+import datetime
 import pandas as pd
-from config import DF_ALIGNMENT, UNSENT_RESULT_STATUS_COLUMNS_LIST
-from dao.db_connector import Base, engine, DBSession
+from config import (
+    DF_ALIGNMENT,
+    UNSENT_RESULT_STATUS_COLUMNS_LIST,
+    RESULT_STATUS_UPSERT_CHUNK_SIZE,
+    RESULT_STATUS_FETCH_CHUNK_SIZE,
+    UNSENT_RESULT_STATUS_PAGE_SIZE,
+    PUSH_STATUS_UPDATE_CHUNK_SIZE,
+)
+from dao.db_connector import Base, engine
+from utils.run_timer import timed
 
 
 class ResultStatusDao(Base):
@@ -17,113 +28,184 @@ class ResultStatusDao(Base):
     load_date = Column(DateTime)
 
 
-def insert_and_update(result_status_df, load_date_str, logger=None):
-    if len(result_status_df) <= 0:  # If result status data is empty.
-        if logger is not None:
-            logger.write("debug", "Result status data empty.")
-        return
+def build_upsert_statement(records_list):
+    if (
+        engine.dialect.name == "sqlite"
+    ):  # Insert on conflict of id on stand-in database.
+        statement = sqlite_insert(ResultStatusDao.__table__).values(records_list)
+        return statement.on_conflict_do_update(
+            index_elements=["id"],
+            set_={column: statement.excluded[column] for column in records_list[0]},
+        )
 
-    result_status_df_str = result_status_df.to_string(justify=DF_ALIGNMENT, index=False)
-    result_status_df_str = result_status_df_str.replace("\n", "\n\t")
-    if logger is not None:
-        logger.write("debug", f"Abnormal clusters data\n{result_status_df_str}")
-
-    result_status_df["datetime"] = result_status_df["datetime"].astype(
-        str
-    )  # Turn timestamps to string.
-    result_status_df["push_status"] = 0  # Default value of push status column.
-    result_status_df["load_date"] = load_date_str
-    result_status_df_col_names = ", ".join(
-        list(result_status_df.columns)
-    )  # Column names in result status data.
-
-    # String that represents SQL update syntax.
-    update_str = ", ".join(
-        ["".join([l, " = VALUES(", l, ")"]) for l in list(result_status_df.columns)]
+    # Use insert on duplicate key with multi-row values to prevent duplicates from entering database.
+    statement = mysql_insert(ResultStatusDao.__table__).values(records_list)
+    return statement.on_duplicate_key_update(
+        {column: statement.inserted[column] for column in records_list[0].keys()}
     )
 
+
+@timed("result_status_dao.read_result_statuses")
+def read_result_statuses(result_status_ids_list, logger=None):
+    # Result statuses already in database for given ids, queried in chunks of ids. Ids as keys.
     if logger is not None:
         logger.write("debug", "MySQL connection ready.")
+
+    result_statuses_dict = dict()
     connection = engine.connect()
+    for i in range(0, len(result_status_ids_list), RESULT_STATUS_FETCH_CHUNK_SIZE):
+        statement = select(ResultStatusDao.id, ResultStatusDao.result_status).where(
+            ResultStatusDao.id.in_(
+                result_status_ids_list[i : i + RESULT_STATUS_FETCH_CHUNK_SIZE]
+            )
+        )
+        result_statuses_dict.update(
+            (result_status_id, result_status)
+            for result_status_id, result_status in connection.execute(statement)
+        )
+    connection.close()
+
+    if logger is not None:
+        logger.write("debug", "MySQL connection closed.")
+    return result_statuses_dict
 
-    for (
-        i,
-        row,
-    ) in result_status_df.iterrows():  # For each row, put all values into a tuple.
-        values_tuple = (
-            row["id"],
-            row["datetime"],
-            row["asset_code"],
-            row["tag_name"],
-            row["result_status"],
-            int(row["push_status"]),
-            row["load_date"],
+
+@timed("result_status_dao.insert_and_update")
+def insert_and_update(result_status_df, load_date_str, logger=None):
+    # Return number of rows written. Rows failing row by row retry are logged and left out.
+    if len(result_status_df) <= 0:  # If result status data is empty.
+        if logger is not None:
+            logger.write("debug", "Result status data empty.")
+        return 0
+
+    if logger is not None:  # Rendered only if debug level is enabled.
+        logger.write(
+            "debug",
+            lambda: "Abnormal clusters data\n"
+            + result_status_df.to_string(justify=DF_ALIGNMENT, index=False).replace(
+                "\n", "\n\t"
+            ),
         )
 
-        # Use insert on duplicate key to prevent duplicates from entering database.
-        query = (
-            """INSERT INTO ts_air_compressor_result_status ("""
-            + result_status_df_col_names
-            + """)
-                   VALUES """
-            + str(values_tuple)
-            + """
-                   ON DUPLICATE KEY UPDATE """
-            + update_str
-            + """;"""
+    load_date = datetime.datetime.fromisoformat(load_date_str)
+    # Put all values into a dictionary per row. Push status defaults to 0.
+    records_list = [
+        {
+            "id": result_status_id,
+            "datetime": timestamp.to_pydatetime(),
+            "asset_code": asset_code,
+            "tag_name": tag_name,
+            "result_status": result_status,
+            "push_status": 0,
+            "load_date": load_date,
+        }
+        for result_status_id, timestamp, asset_code, tag_name, result_status in zip(
+            result_status_df["id"],
+            pd.to_datetime(result_status_df["datetime"]),
+            result_status_df["asset_code"],
+            result_status_df["tag_name"],
+            result_status_df["result_status"],
         )
-        query = query.replace(
-            "None", "Null"
-        )  # Replace None with Null to match MySQL syntax.
+    ]
 
-        try:  # Insert records into database.
-            connection.execute(text(query))
+    if logger is not None:
+        logger.write("debug", "MySQL connection ready.")
+    written_rows = 0
+    connection = engine.connect()
+
+    for i in range(0, len(records_list), RESULT_STATUS_UPSERT_CHUNK_SIZE):
+        chunk_records_list = records_list[i : i + RESULT_STATUS_UPSERT_CHUNK_SIZE]
+        try:  # Insert records of chunk in one statement and commit.
+            connection.execute(build_upsert_statement(chunk_records_list))
             connection.commit()
+            written_rows += len(chunk_records_list)
 
-        except Exception as e:  # If insertion fails.
+        except Exception as e:  # If chunk insertion fails, retry row by row.
+            connection.rollback()
             if logger is not None:
-                logger.write("error", f"Result status data insertion failed: {e}.")
+                logger.write(
+                    "warning",
+                    f"Result status chunk insertion failed, retrying row by row: {e}.",
+                )
+
+            for record in chunk_records_list:
+                try:
+                    connection.execute(build_upsert_statement([record]))
+                    connection.commit()
+                    written_rows += 1
+
+                except Exception as e:  # If insertion fails.
+                    connection.rollback()
+                    if logger is not None:
+                        logger.write(
+                            "error", f"Result status data insertion failed: {e}."
+                        )
 
     connection.close()
     if logger is not None:
-        logger.write("info", "Result status data attempted database insertion.")
-        logger.write("debug", "MySQL connection closed.")
-
-
-def read_unsent_result_status(logger=None):
-    if logger is not None:
-        logger.write("debug", "MySQL connection ready.")
-
-    session = DBSession()  # Unsent result status filtering criterion: push status = 0.
-    unsent_results = (
-        session.query(
-            ResultStatusDao.datetime,
-            ResultStatusDao.tag_name,
-            ResultStatusDao.asset_code,
-            ResultStatusDao.result_status,
+        logger.write(
+            "info",
+            f"Result status data inserted: {written_rows} of {len(records_list)} rows.",
         )
-        .filter(ResultStatusDao.push_status == 0)
-        .all()
-    )
-    session.close()
+        logger.write("debug", "MySQL connection closed.")
+    return written_rows
+
+
+def build_unsent_page_statement(last_id=None, page_size=UNSENT_RESULT_STATUS_PAGE_SIZE):
+    # Page of unsent result status data (push status = 0) after last id.
+    # Paged on primary key alone: datetime and tag name are nullable, and comparisons with null match no rows.
+    statement = select(
+        ResultStatusDao.id,
+        ResultStatusDao.datetime,
+        ResultStatusDao.tag_name,
+        ResultStatusDao.asset_code,
+        ResultStatusDao.result_status,
+    ).where(ResultStatusDao.push_status == 0)
+    if last_id is not None:
+        statement = statement.where(ResultStatusDao.id > last_id)
+    return statement.order_by(ResultStatusDao.id).limit(page_size)
+
+
+def read_unsent_result_status_pages(
+    page_size=UNSENT_RESULT_STATUS_PAGE_SIZE, logger=None
+):
+    # Yield unsent result status data in pages of at most page size rows, each sorted by time and tag name.
+    # Ids are index of each page, so that sent rows can be passed to update_push_status.
+    last_id = None
+    while True:
+        with engine.connect() as connection:  # No connection is held between pages.
+            rows = connection.execute(
+                build_unsent_page_statement(last_id, page_size)
+            ).all()
+
+        if len(rows) <= 0:
+            break
+
+        last_id = rows[-1].id
+        ids, datetimes, tag_names, asset_codes, result_statuses = zip(*rows)
+        yield pd.DataFrame(
+            dict(
+                zip(
+                    UNSENT_RESULT_STATUS_COLUMNS_LIST,
+                    [datetimes, tag_names, asset_codes, result_statuses],
+                )
+            ),
+            index=pd.Index(ids, name="id"),
+        ).sort_values(by=["Time", "Tag Name"], kind="stable")
+
+        if len(rows) < page_size:  # Last page.
+            break
 
     if logger is not None:
-        logger.write("debug", "MySQL connection closed.")
+        logger.write("debug", "Unsent result status pages read.")
 
-    unsent_result_status_values_list = []
-    if unsent_results is not None:
-        for unsent_result in unsent_results:
-            unsent_result_status_values_list.append(
-                [
-                    unsent_result.datetime,
-                    unsent_result.tag_name,
-                    unsent_result.asset_code,
-                    unsent_result.result_status,
-                ]
-            )
 
-    unsent_result_status_df = pd.DataFrame(
-        unsent_result_status_values_list, columns=UNSENT_RESULT_STATUS_COLUMNS_LIST
+@timed("result_status_dao.read_unsent_result_status")
+def read_unsent_result_status(logger=None):
+    # All unsent result status data in one data frame. Large backlogs: use read_unsent_result_status_pages.
+    unsent_result_status_df = pd.concat(
+        list(read_unsent_result_status_pages(logger=logger))
+        or [pd.DataFrame(columns=UNSENT_RESULT_STATUS_COLUMNS_LIST)]
     )
     if (
         len(unsent_result_status_df) <= 0
@@ -135,24 +217,35 @@ def read_unsent_result_status(logger=None):
     if logger is not None:
         logger.write("info", "Unsent result status data query successful.")
 
-    # Return sorted unsent result status data.
+    # Return sorted unsent result status data, without ids.
+    unsent_result_status_df.reset_index(drop=True, inplace=True)
     unsent_result_status_df.sort_values(
         by=["Time", "Tag Name"], ascending=[True, True], inplace=True
     )
     return unsent_result_status_df
 
 
+@timed("result_status_dao.update_push_status")
 def update_push_status(sent_result_status_id_list, logger=None):
     if logger is not None:
         logger.write("debug", "MySQL connection ready.")
 
     # Update push status column of ts_air_compressor_result_status that are just sent by email.
-    session = DBSession()
-    session.query(ResultStatusDao).filter(
-        ResultStatusDao.id.in_(sent_result_status_id_list)
-    ).update({"push_status": 1})
-    session.commit()
-    session.close()
+    # Ids are updated and committed in chunks, so that statement size stays bounded.
+    sent_result_status_id_list = list(sent_result_status_id_list)
+    connection = engine.connect()
+    for i in range(0, len(sent_result_status_id_list), PUSH_STATUS_UPDATE_CHUNK_SIZE):
+        connection.execute(
+            update(ResultStatusDao.__table__)
+            .where(
+                ResultStatusDao.id.in_(
+                    sent_result_status_id_list[i : i + PUSH_STATUS_UPDATE_CHUNK_SIZE]
+                )
+            )
+            .values(push_status=1)
+        )
+        connection.commit()
+    connection.close()
 
     if logger is not None:
         logger.write("debug", "MySQL connection closed.")
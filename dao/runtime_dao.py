@@ -1,8 +1,44 @@
-from sqlalchemy import Column, DateTime, String, Integer
+from sqlalchemy import (
+    Column,
+    DateTime,
+    String,
+    Integer,
+    select,
+    union_all,
+    update,
+    bindparam,
+    func,
+    or_,
+)
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
 import datetime
+import time
+import numpy as np
 import pandas as pd
-from config import RUNTIME_COLUMNS_LIST, ADDITIONAL_RUNTIME_DAYS
-from dao.db_connector import Base, DBSession
+from config import (
+    RUNTIME_COLUMNS_LIST,
+    ADDITIONAL_RUNTIME_DAYS,
+    RUNTIME_HISTORY_CACHE_ENABLED,
+    RUNTIME_READ_MODE,
+    RUNTIME_FETCH_CHUNK_SIZE,
+    RUNTIME_UPDATE_MODE,
+    RUNTIME_UPDATE_CHUNK_SIZE,
+)
+from dao import runtime_history_cache
+from utils.run_timer import timed
+from utils.runtime_series_store import RuntimeSeriesStore
+from dao.db_connector import Base, engine, DBSession
+
+# Column types of runtime data read in bulk mode. Asset codes are turned into categories afterwards.
+RUNTIME_COLUMN_DTYPES_DICT = {
+    "id": object,
+    "datetime": "datetime64[s]",
+    "asset_code": object,
+    "runtime": np.int32,
+    "status": np.int8,
+    "load_date": "datetime64[s]",
+}
 
 
 class RuntimeDao(Base):
@@ -18,7 +54,20 @@ class RuntimeDao(Base):
     status = Column(Integer)
 
 
-def read_runtime(logger=None):
+def get_unprocessed_criterion(shard=None):
+    # Unprocessed runtime filtering criterion: status = 0, and asset code hashed into shard if given.
+    criterion = RuntimeDao.status == 0
+    if shard is not None:
+        shard_index, shard_count = shard
+        criterion &= (func.crc32(RuntimeDao.asset_code) % shard_count) == shard_index
+    return criterion
+
+
+@timed("runtime_dao.read_runtime")
+def read_runtime(logger=None, shard=None):
+    if RUNTIME_READ_MODE == "bulk":
+        return read_runtime_bulk(logger, shard)
+
     if logger is not None:
         logger.write("debug", "MySQL connection ready.")
 
@@ -31,7 +80,7 @@ def read_runtime(logger=None):
             RuntimeDao.runtime,
             RuntimeDao.status,
         )
-        .filter(RuntimeDao.status == 0)
+        .filter(get_unprocessed_criterion(shard))
         .all()
     )
     session.close()
@@ -68,29 +117,74 @@ def read_runtime(logger=None):
     # List of asset codes in unprocessed run time data.
     asset_codes_list = list(set(unprocessed_runtime_df["asset_code"]))
     # Threshold = 365 days before the earliest unprocessed timestamp.
-    datetime_threshold = str(
-        min(unprocessed_runtime_df["datetime"])
-        - datetime.timedelta(days=ADDITIONAL_RUNTIME_DAYS)
+    datetime_threshold = min(unprocessed_runtime_df["datetime"]) - datetime.timedelta(
+        days=ADDITIONAL_RUNTIME_DAYS
+    )
+
+    past_runtime_df = read_past_runtime(
+        asset_codes_list, datetime_threshold, logger, unprocessed_runtime_df["id"]
+    )
+
+    # Combine unprocessed and past runtime data.
+    runtime_df = pd.concat([past_runtime_df, unprocessed_runtime_df], axis=0)
+    # Return sorted runtime data.
+    runtime_df.sort_values(
+        by=["datetime", "asset_code"], ascending=[True, True], inplace=True
+    )
+    return runtime_df
+
+
+def read_runtime_series(logger=None, shard=None):
+    # Runtime data as runtime series store. Queried data frame is dropped once store is built.
+    return RuntimeSeriesStore.from_frame(read_runtime(logger, shard))
+
+
+@timed("runtime_dao.read_past_runtime")
+def read_past_runtime(
+    asset_codes_list, datetime_threshold, logger=None, unprocessed_ids=None
+):
+    # Past runtime filtering criterion: status = 1, asset codes in list and not earlier than threshold.
+    # Ids of unprocessed rows are never served as past runtime data.
+    past_filter_criterion = (
+        (RuntimeDao.status == 1)
+        & (RuntimeDao.asset_code.in_(asset_codes_list))
+        & (RuntimeDao.datetime >= datetime_threshold)
     )
 
+    if RUNTIME_HISTORY_CACHE_ENABLED:
+        try:  # Serve past runtime data from local cache, only querying new rows.
+            return read_past_runtime_with_cache(
+                asset_codes_list, datetime_threshold, logger, unprocessed_ids
+            )
+
+        except Exception as e:  # If cache fails, fall back to full past runtime query.
+            if logger is not None:
+                logger.write("error", f"Runtime history cache failed: {e}.")
+
+    return query_past_runtime(past_filter_criterion, logger)
+
+
+def query_past_runtime(filter_criterion, logger=None, with_load_date=False):
     if logger is not None:
         logger.write("debug", "MySQL connection ready.")
 
+    columns_list = RUNTIME_COLUMNS_LIST + (["load_date"] if with_load_date else [])
+    if RUNTIME_READ_MODE == "bulk":
+        past_runtime_df = fetch_runtime_frame(
+            select(*[getattr(RuntimeDao, column) for column in columns_list]).where(
+                filter_criterion
+            ),
+            columns_list,
+        )
+        if logger is not None:
+            logger.write("info", "Past runtime data query successful.")
+            logger.write("debug", "MySQL connection closed.")
+        return past_runtime_df
+
     session = DBSession()
-    # Past runtime filtering criterion: status = 1, asset codes in list and not earlier than threshold.
     results_past = (
-        session.query(
-            RuntimeDao.id,
-            RuntimeDao.datetime,
-            RuntimeDao.asset_code,
-            RuntimeDao.runtime,
-            RuntimeDao.status,
-        )
-        .filter(
-            (RuntimeDao.status == 1)
-            & (RuntimeDao.asset_code.in_(asset_codes_list))
-            & (RuntimeDao.datetime >= datetime_threshold)
-        )
+        session.query(*[getattr(RuntimeDao, column) for column in columns_list])
+        .filter(filter_criterion)
         .all()
     )
     session.close()
@@ -103,44 +197,319 @@ def read_runtime(logger=None):
     if results_past is not None:
         for result in results_past:
             past_runtime_values_list.append(
-                [
-                    result.id,
-                    result.datetime,
-                    result.asset_code,
-                    result.runtime,
-                    result.status,
-                ]
+                [getattr(result, column) for column in columns_list]
+            )
+
+    return pd.DataFrame(past_runtime_values_list, columns=columns_list)
+
+
+def read_past_runtime_with_cache(
+    asset_codes_list, datetime_threshold, logger=None, unprocessed_ids=None
+):
+    cache_states_dict = runtime_history_cache.read_cache_states(asset_codes_list)
+
+    # Warm assets: cache covers threshold and has a high-water mark, so only rows processed since it are needed.
+    # Cold assets: whole past runtime window is queried, so that one cold asset doesn't refetch warm ones.
+    warm_asset_codes_list, cold_asset_codes_list, unfilled_asset_codes_list = [], [], []
+    for asset_code in asset_codes_list:
+        if (asset_code not in cache_states_dict) or (
+            cache_states_dict[asset_code]["coverage_start"] > datetime_threshold
+        ):
+            unfilled_asset_codes_list.append(asset_code)
+            cold_asset_codes_list.append(asset_code)
+        elif cache_states_dict[asset_code]["load_date"] is None:
+            cold_asset_codes_list.append(asset_code)
+        else:
+            warm_asset_codes_list.append(asset_code)
+
+    new_runtime_df_list = []
+    if len(warm_asset_codes_list) > 0:
+        # Each warm asset only refetches rows since its own high-water mark, with assets grouped by mark.
+        # Rows loaded at high-water mark are refetched and deduplicated by id.
+        # High-water marks as keys, and lists of asset codes as values.
+        asset_codes_dict = dict()
+        for asset_code in warm_asset_codes_list:
+            asset_codes_dict.setdefault(
+                cache_states_dict[asset_code]["load_date"], []
+            ).append(asset_code)
+        new_runtime_df_list.append(
+            query_past_runtime(
+                (RuntimeDao.status == 1)
+                & or_(
+                    *[
+                        RuntimeDao.asset_code.in_(mark_asset_codes_list)
+                        & (RuntimeDao.load_date >= load_date)
+                        for load_date, mark_asset_codes_list in asset_codes_dict.items()
+                    ]
+                ),
+                logger,
+                with_load_date=True,
+            )
+        )
+
+    if len(cold_asset_codes_list) > 0:  # Fill cache with whole past runtime window.
+        new_runtime_df_list.append(
+            query_past_runtime(
+                (RuntimeDao.status == 1)
+                & (RuntimeDao.asset_code.in_(cold_asset_codes_list))
+                & (RuntimeDao.datetime >= datetime_threshold),
+                logger,
+                with_load_date=True,
             )
+        )
+
+    new_runtime_df = pd.concat(new_runtime_df_list, axis=0)
+    new_runtime_df["asset_code"] = new_runtime_df["asset_code"].astype(str)
+    new_runtime_df["datetime"] = pd.to_datetime(new_runtime_df["datetime"])
+    new_runtime_df["load_date"] = pd.to_datetime(new_runtime_df["load_date"])
+    runtime_history_cache.append_runtime(new_runtime_df)
 
-    past_runtime_df = pd.DataFrame(
-        past_runtime_values_list, columns=RUNTIME_COLUMNS_LIST
+    # Move high-water marks forward and drop months no longer needed.
+    latest_load_dates_dict = (
+        new_runtime_df.groupby("asset_code")["load_date"].max().dropna().to_dict()
     )
-    # Combine unprocessed and past runtime data.
-    runtime_df = pd.concat([past_runtime_df, unprocessed_runtime_df], axis=0)
-    # Return sorted runtime data.
-    runtime_df.sort_values(
-        by=["datetime", "asset_code"], ascending=[True, True], inplace=True
+    for asset_code in asset_codes_list:
+        state = cache_states_dict.get(
+            asset_code, {"load_date": None, "coverage_start": datetime_threshold}
+        )
+        if asset_code in unfilled_asset_codes_list:
+            state = {"load_date": None, "coverage_start": datetime_threshold}
+
+        if asset_code in latest_load_dates_dict:
+            latest_load_date = latest_load_dates_dict[asset_code].to_pydatetime()
+            if (state["load_date"] is None) or (state["load_date"] < latest_load_date):
+                state["load_date"] = latest_load_date
+
+        coverage_start = runtime_history_cache.prune_runtime(
+            asset_code, datetime_threshold
+        )
+        if coverage_start is not None:
+            state["coverage_start"] = max(state["coverage_start"], coverage_start)
+        cache_states_dict.update({asset_code: state})
+
+    runtime_history_cache.write_cache_states(cache_states_dict)
+
+    if logger is not None:
+        logger.write(
+            "info",
+            f"Past runtime data served from cache: {len(new_runtime_df)} new rows queried.",
+        )
+
+    past_runtime_df = runtime_history_cache.read_runtime_window(
+        asset_codes_list, datetime_threshold
     )
+    # Cached rows reset to status 0 are unprocessed again, so they aren't past runtime data.
+    if unprocessed_ids is not None:
+        past_runtime_df = past_runtime_df[~past_runtime_df["id"].isin(unprocessed_ids)]
+    return past_runtime_df
+
+
+class days_before(FunctionElement):
+    """Datetime expression shifted back by a number of days."""
+
+    inherit_cache = True
+
+    def __init__(self, datetime_expression, days):
+        self.days = days
+        super().__init__(datetime_expression)
+
+
+@compiles(days_before)
+def _compile_days_before(element, compiler, **kw):  # MySQL syntax.
+    return f"DATE_SUB({compiler.process(element.clauses, **kw)}, INTERVAL {int(element.days)} DAY)"
+
+
+@compiles(days_before, "sqlite")
+def _compile_days_before_sqlite(element, compiler, **kw):  # SQLite syntax.
+    return f"datetime({compiler.process(element.clauses, **kw)}, '-{int(element.days)} days')"
+
+
+def fetch_runtime_frame(statement, columns_list):
+    # Stream rows in chunks straight into typed column arrays, skipping ORM row objects.
+    column_chunks_dict = {column: [] for column in columns_list}
+
+    connection = engine.connect()
+    result = connection.execution_options(stream_results=True).execute(statement)
+    while True:
+        rows = result.fetchmany(RUNTIME_FETCH_CHUNK_SIZE)
+        if len(rows) <= 0:
+            break
+
+        for column, values in zip(columns_list, zip(*rows)):
+            if RUNTIME_COLUMN_DTYPES_DICT[column] in (np.int32, np.int8):
+                values = np.array(values, dtype=np.float64)  # Nulls become NaN.
+                if not np.isnan(values).any():
+                    values = values.astype(RUNTIME_COLUMN_DTYPES_DICT[column])
+            else:
+                values = np.array(values, dtype=RUNTIME_COLUMN_DTYPES_DICT[column])
+            column_chunks_dict[column].append(values)
+    connection.close()
+
+    runtime_df = pd.DataFrame(
+        {
+            column: (
+                np.concatenate(column_chunks)
+                if len(column_chunks) > 0
+                else np.array([], dtype=RUNTIME_COLUMN_DTYPES_DICT[column])
+            )
+            for column, column_chunks in column_chunks_dict.items()
+        }
+    )
+    runtime_df["asset_code"] = runtime_df["asset_code"].astype("category")
+    return runtime_df
+
+
+def cast_runtime_df(runtime_df):  # Set typed columns of runtime data.
+    for column in runtime_df.columns:
+        if column == "asset_code":
+            runtime_df[column] = runtime_df[column].astype(str).astype("category")
+        elif (RUNTIME_COLUMN_DTYPES_DICT[column] is not object) and (
+            not runtime_df[column].isna().any()
+        ):
+            runtime_df[column] = runtime_df[column].astype(
+                RUNTIME_COLUMN_DTYPES_DICT[column]
+            )
     return runtime_df
 
 
+def read_runtime_bulk(logger=None, shard=None):
+    if logger is not None:
+        logger.write("debug", "MySQL connection ready.")
+
+    runtime_columns = [getattr(RuntimeDao, column) for column in RUNTIME_COLUMNS_LIST]
+    unprocessed_criterion = get_unprocessed_criterion(shard)
+    unprocessed_statement = select(*runtime_columns).where(unprocessed_criterion)
+
+    if (
+        RUNTIME_HISTORY_CACHE_ENABLED
+    ):  # Past runtime data is served by cache, so only query unprocessed rows.
+        runtime_df = fetch_runtime_frame(unprocessed_statement, RUNTIME_COLUMNS_LIST)
+
+    else:  # Query unprocessed and past runtime data in one round trip.
+        unprocessed_asset_codes = (
+            select(RuntimeDao.asset_code).where(unprocessed_criterion).distinct()
+        )
+        # Threshold = 365 days before the earliest unprocessed timestamp.
+        datetime_threshold = days_before(
+            select(func.min(RuntimeDao.datetime))
+            .where(unprocessed_criterion)
+            .scalar_subquery(),
+            ADDITIONAL_RUNTIME_DAYS,
+        )
+        # Past runtime filtering criterion: status = 1, asset codes in list and not earlier than threshold.
+        past_statement = select(*runtime_columns).where(
+            (RuntimeDao.status == 1)
+            & (RuntimeDao.asset_code.in_(unprocessed_asset_codes))
+            & (RuntimeDao.datetime >= datetime_threshold)
+        )
+
+        union_statement = union_all(unprocessed_statement, past_statement)
+        union_statement = union_statement.order_by(  # Sort by server.
+            union_statement.selected_columns.datetime,
+            union_statement.selected_columns.asset_code,
+        )
+        runtime_df = fetch_runtime_frame(union_statement, RUNTIME_COLUMNS_LIST)
+
+    if logger is not None:
+        logger.write("debug", "MySQL connection closed.")
+
+    if (
+        runtime_df["status"] == 0
+    ).sum() <= 0:  # If unprocessed runtime data is empty, return empty data frame.
+        if logger is not None:
+            logger.write("warning", "Unprocessed runtime data empty.")
+        return pd.DataFrame()
+
+    if logger is not None:
+        logger.write("info", "Runtime data query successful.")
+
+    if RUNTIME_HISTORY_CACHE_ENABLED:
+        # List of asset codes in unprocessed run time data.
+        asset_codes_list = [str(code) for code in runtime_df["asset_code"].unique()]
+        # Threshold = 365 days before the earliest unprocessed timestamp.
+        datetime_threshold = (
+            runtime_df["datetime"].min()
+            - datetime.timedelta(days=ADDITIONAL_RUNTIME_DAYS)
+        ).to_pydatetime()
+        past_runtime_df = read_past_runtime(
+            asset_codes_list, datetime_threshold, logger, runtime_df["id"]
+        )
+
+        # Combine unprocessed and past runtime data.
+        runtime_df = pd.concat([past_runtime_df, runtime_df], axis=0)
+        runtime_df = cast_runtime_df(runtime_df)
+        runtime_df.sort_values(
+            by=["datetime", "asset_code"], ascending=[True, True], inplace=True
+        )
+
+    return runtime_df
+
+
+@timed("runtime_dao.read_unprocessed_runtime")
+def read_unprocessed_runtime(logger=None, shard=None):
+    # Only unprocessed runtime data, for callers that keep past runtime data themselves.
+    if logger is not None:
+        logger.write("debug", "MySQL connection ready.")
+
+    runtime_columns = [getattr(RuntimeDao, column) for column in RUNTIME_COLUMNS_LIST]
+    runtime_df = fetch_runtime_frame(
+        select(*runtime_columns).where(get_unprocessed_criterion(shard)),
+        RUNTIME_COLUMNS_LIST,
+    )
+
+    if logger is not None:
+        logger.write("debug", "MySQL connection closed.")
+    return cast_runtime_df(runtime_df)
+
+
+@timed("runtime_dao.read_runtime_range")
+def read_runtime_range(asset_codes_list, start_datetime, end_datetime, logger=None):
+    # Runtime data of any status of given asset codes, from start datetime until before end datetime.
+    if logger is not None:
+        logger.write("debug", "MySQL connection ready.")
+
+    runtime_columns = [getattr(RuntimeDao, column) for column in RUNTIME_COLUMNS_LIST]
+    runtime_df = fetch_runtime_frame(
+        select(*runtime_columns).where(
+            (RuntimeDao.asset_code.in_(asset_codes_list))
+            & (RuntimeDao.datetime >= start_datetime)
+            & (RuntimeDao.datetime < end_datetime)
+        ),
+        RUNTIME_COLUMNS_LIST,
+    )
+
+    if logger is not None:
+        logger.write("debug", "MySQL connection closed.")
+    return cast_runtime_df(runtime_df)
+
+
+@timed("runtime_dao.update_execution_status")
 def update_execution_status(runtime_df, load_date_str, logger=None):
+    # Return number of rows matched by ids, so that callers can check every row was updated.
+    if RUNTIME_UPDATE_MODE == "bulk":
+        return update_execution_status_bulk(runtime_df, load_date_str, logger)
+
     if logger is not None:
         logger.write("debug", "MySQL connection ready.")
 
     session = DBSession()
+    updated_rows = 0
     for (
         i,
         row,
     ) in (
         runtime_df.iterrows()
     ):  # Update last-7-day average, load date and status by filtering ID.
-        session.query(RuntimeDao).filter(RuntimeDao.id == row["id"]).update(
-            {
-                "last_7_day_avg": row["last_7_day_avg"],
-                "load_date": load_date_str,
-                "status": 1,
-            }
+        updated_rows += (
+            session.query(RuntimeDao)
+            .filter(RuntimeDao.id == row["id"])
+            .update(
+                {
+                    "last_7_day_avg": row["last_7_day_avg"],
+                    "load_date": load_date_str,
+                    "status": 1,
+                }
+            )
         )
         session.commit()
     session.close()
@@ -148,3 +517,48 @@ def update_execution_status(runtime_df, load_date_str, logger=None):
     if logger is not None:
         logger.write("debug", "MySQL connection closed.")
         logger.write("info", "Runtime data status updated.")
+    return updated_rows
+
+
+def update_execution_status_bulk(runtime_df, load_date_str, logger=None):
+    if logger is not None:
+        logger.write("debug", "MySQL connection ready.")
+
+    start_time = time.perf_counter()
+    runtime_table = RuntimeDao.__table__
+    # Update last-7-day average, load date and status by filtering ID, sent as executemany per chunk.
+    statement = (
+        update(runtime_table)
+        .where(runtime_table.c.id == bindparam("runtime_id"))
+        .values(
+            last_7_day_avg=bindparam("runtime_last_7_day_avg"),
+            load_date=datetime.datetime.fromisoformat(load_date_str),
+            status=1,
+        )
+    )
+    parameters_list = [
+        {"runtime_id": runtime_id, "runtime_last_7_day_avg": last_7_day_avg}
+        for runtime_id, last_7_day_avg in zip(
+            runtime_df["id"].tolist(), runtime_df["last_7_day_avg"].tolist()
+        )
+    ]
+
+    updated_rows = 0
+    connection = engine.connect()
+    for i in range(0, len(parameters_list), RUNTIME_UPDATE_CHUNK_SIZE):
+        # Matched rows, summed over executemany. MySQL dialects count matched, not changed, rows.
+        updated_rows += connection.execute(
+            statement, parameters_list[i : i + RUNTIME_UPDATE_CHUNK_SIZE]
+        ).rowcount
+        connection.commit()  # One commit per chunk.
+    connection.close()
+
+    elapsed_seconds = time.perf_counter() - start_time
+    if logger is not None:
+        logger.write("debug", "MySQL connection closed.")
+        logger.write(
+            "info",
+            f"Runtime data status updated: {len(parameters_list)} rows in {elapsed_seconds:.2f} seconds "
+            + f"({len(parameters_list) / max(elapsed_seconds, 1e-9):.0f} rows/sec).",
+        )
+    return updated_rows
@@ -0,0 +1,148 @@
+import os
+import json
+import datetime
+import pandas as pd
+from config import RUNTIME_COLUMNS_LIST, RUNTIME_HISTORY_CACHE_PATH
+
+# Columns kept in cache: runtime columns plus load date, which drives high-water marks.
+CACHE_COLUMNS_LIST = RUNTIME_COLUMNS_LIST + ["load_date"]
+
+CACHE_STATE_FILE_NAME = "cache_state.json"  # High-water mark and coverage of an asset.
+
+
+def _get_asset_folder_path(asset_code):
+    return os.path.join(RUNTIME_HISTORY_CACHE_PATH, f"asset_code={asset_code}")
+
+
+def _get_partition_path(asset_code, month_str):  # Month string format: YYYY-MM.
+    return os.path.join(_get_asset_folder_path(asset_code), f"{month_str}.parquet")
+
+
+def _replace_file(
+    path, write_function
+):  # Write into temporary file, then swap in atomically.
+    temporary_path = path + ".tmp"
+    write_function(temporary_path)
+    os.replace(temporary_path, path)
+
+
+def _get_cache_state_path(asset_code):
+    # One state file per asset, so shards never overwrite each other.
+    return os.path.join(_get_asset_folder_path(asset_code), CACHE_STATE_FILE_NAME)
+
+
+def read_cache_states(asset_codes_list):
+    # Dictionary of asset codes as keys, and their high-water mark load date and coverage start as values.
+    cache_states_dict = dict()
+    for asset_code in asset_codes_list:
+        try:
+            file = open(_get_cache_state_path(asset_code), "r")
+            state = json.load(file)
+            file.close()
+
+        except FileNotFoundError:  # If asset's cache has never been filled.
+            continue
+
+        load_date = state["load_date"]
+        cache_states_dict.update(
+            {
+                asset_code: {
+                    "load_date": (
+                        None
+                        if load_date is None
+                        else datetime.datetime.fromisoformat(load_date)
+                    ),
+                    "coverage_start": datetime.datetime.fromisoformat(
+                        state["coverage_start"]
+                    ),
+                }
+            }
+        )
+
+    return cache_states_dict
+
+
+def write_cache_states(cache_states_dict):
+    for asset_code, state in cache_states_dict.items():
+        load_date = state["load_date"]
+        saved_state = {
+            "load_date": None if load_date is None else load_date.isoformat(),
+            "coverage_start": state["coverage_start"].isoformat(),
+        }
+
+        def write_json(path):
+            file = open(path, "w")
+            json.dump(saved_state, file)
+            file.close()
+
+        os.makedirs(_get_asset_folder_path(asset_code), exist_ok=True)
+        _replace_file(_get_cache_state_path(asset_code), write_json)
+
+
+def append_runtime(runtime_df):  # Merge past runtime rows into asset/month partitions.
+    if len(runtime_df) <= 0:
+        return
+
+    runtime_df = runtime_df[CACHE_COLUMNS_LIST]
+    months = runtime_df["datetime"].dt.strftime("%Y-%m")
+
+    for (asset_code, month_str), partition_df in runtime_df.groupby(
+        [runtime_df["asset_code"], months], observed=True
+    ):
+        os.makedirs(_get_asset_folder_path(asset_code), exist_ok=True)
+        partition_path = _get_partition_path(asset_code, month_str)
+
+        if os.path.exists(
+            partition_path
+        ):  # Newly fetched rows replace cached rows of same id.
+            partition_df = pd.concat(
+                [pd.read_parquet(partition_path), partition_df], axis=0
+            )
+            partition_df = partition_df.drop_duplicates(subset=["id"], keep="last")
+
+        partition_df = partition_df.sort_values(by=["datetime"], ascending=True)
+        _replace_file(
+            partition_path,
+            lambda path: partition_df.to_parquet(path, index=False),
+        )
+
+
+def read_runtime_window(asset_codes_list, datetime_threshold):
+    # Read cached runtime data of given asset codes not earlier than threshold.
+    threshold_month_str = datetime_threshold.strftime("%Y-%m")
+
+    partition_df_list = []
+    for asset_code in asset_codes_list:
+        asset_folder_path = _get_asset_folder_path(asset_code)
+        if not os.path.isdir(asset_folder_path):
+            continue
+
+        for file_name in sorted(os.listdir(asset_folder_path)):
+            if not file_name.endswith(".parquet"):  # Skip unfinished temporary files.
+                continue
+            if file_name[:7] < threshold_month_str:  # Whole month before threshold.
+                continue
+            partition_df_list.append(
+                pd.read_parquet(os.path.join(asset_folder_path, file_name))
+            )
+
+    if len(partition_df_list) <= 0:
+        return pd.DataFrame(columns=RUNTIME_COLUMNS_LIST)
+
+    runtime_df = pd.concat(partition_df_list, axis=0)
+    runtime_df = runtime_df[runtime_df["datetime"] >= datetime_threshold]
+    return runtime_df[RUNTIME_COLUMNS_LIST]
+
+
+def prune_runtime(asset_code, datetime_threshold):
+    # Delete partitions whose whole month is before threshold, and return new coverage start.
+    threshold_month_str = datetime_threshold.strftime("%Y-%m")
+    asset_folder_path = _get_asset_folder_path(asset_code)
+    if not os.path.isdir(asset_folder_path):
+        return None
+
+    for file_name in os.listdir(asset_folder_path):
+        if file_name.endswith(".parquet") & (file_name[:7] < threshold_month_str):
+            os.remove(os.path.join(asset_folder_path, file_name))
+
+    return datetime.datetime(datetime_threshold.year, datetime_threshold.month, 1)
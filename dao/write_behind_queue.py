@@ -0,0 +1,142 @@
+import time
+import queue
+import threading
+import contextvars
+from config import (
+    DB_POOL_SIZE,
+    WRITE_BEHIND_WRITERS,
+    WRITE_BEHIND_QUEUE_SIZE,
+    WRITE_BEHIND_RETRIES,
+    WRITE_BEHIND_RETRY_SECONDS,
+)
+
+
+class WriteBehindQueue:
+    """Apply queued database writes in background threads while caller keeps computing. One queue per run."""
+
+    def __init__(
+        self,
+        writers=WRITE_BEHIND_WRITERS,
+        queue_size=WRITE_BEHIND_QUEUE_SIZE,
+        retries=WRITE_BEHIND_RETRIES,
+        logger=None,
+    ):
+        # Bounded, so producer blocks while writers catch up: backpressure.
+        self.tasks_queue = queue.Queue(maxsize=max(1, queue_size))
+        self.retries = retries
+        self.logger = logger
+
+        self.lock = threading.Lock()  # Guards counts and failures below.
+        # Names as keys, and rows submitted and written as values.
+        self.submitted_rows_dict = dict()
+        self.written_rows_dict = dict()
+        # Name, rows and exception of chunks failing all retries.
+        self.failures_list = []
+        self.blocked_seconds = 0.0  # Seconds producer waited on full queue.
+
+        # Each writer runs in a copy of creator's context, so run timer spans of writes nest under creator's span.
+        self.threads_list = [
+            threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(self.write,),
+                name=f"write_behind_{i}",
+                daemon=True,
+            )
+            for i in range(max(1, min(writers, DB_POOL_SIZE)))
+        ]
+        for thread in self.threads_list:
+            thread.start()
+
+    def submit(self, name, rows, function, *args):
+        # Queue function(*args) writing given number of rows under name. Blocks while queue is full.
+        # Function returns number of rows it wrote, and chunk fails unless all rows were written.
+        with self.lock:
+            self.submitted_rows_dict[name] = (
+                self.submitted_rows_dict.get(name, 0) + rows
+            )
+
+        start_time = time.perf_counter()
+        self.tasks_queue.put((name, rows, function, args))
+        self.blocked_seconds += time.perf_counter() - start_time
+
+    def write(self):  # Writer thread: apply queued chunks until stop signal None.
+        while True:
+            task = self.tasks_queue.get()
+            if task is None:
+                return
+
+            name, rows, function, args = task
+            for attempt in range(self.retries + 1):
+                try:
+                    written_rows = function(*args)
+                    if written_rows != rows:
+                        raise RuntimeError(f"{written_rows} of {rows} rows written")
+                    with self.lock:
+                        self.written_rows_dict[name] = (
+                            self.written_rows_dict.get(name, 0) + rows
+                        )
+                    break
+
+                except Exception as e:  # Retry, then record failure for flush to raise.
+                    if attempt < self.retries:
+                        if self.logger is not None:
+                            self.logger.write(
+                                "warning",
+                                f"Write-behind {name} chunk of {rows} rows failed, retrying: {e}.",
+                            )
+                        time.sleep(WRITE_BEHIND_RETRY_SECONDS * 2**attempt)
+                        continue
+
+                    with self.lock:
+                        self.failures_list.append((name, rows, e))
+                    if self.logger is not None:
+                        self.logger.write(
+                            "error",
+                            f"Write-behind {name} chunk of {rows} rows failed: {e}.",
+                        )
+
+    def stop(self):  # Wait until every queued chunk is applied, and stop writers.
+        for _ in self.threads_list:
+            self.tasks_queue.put(None)
+        for thread in self.threads_list:
+            thread.join()
+
+    def flush(self):
+        # Stop writers. Then verify all submitted rows were written.
+        # Rows of failed chunks keep status 0 in database, so next run processes them again: at least once.
+        self.stop()
+        if len(self.failures_list) > 0:
+            name, rows, e = self.failures_list[0]
+            raise RuntimeError(
+                f"Write-behind: {len(self.failures_list)} chunks failed, first {name} chunk of {rows} rows: {e}."
+            ) from e
+
+        for name, rows in self.submitted_rows_dict.items():
+            if self.written_rows_dict.get(name, 0) != rows:
+                raise RuntimeError(
+                    f"Write-behind: {self.written_rows_dict.get(name, 0)} of {rows} {name} rows written."
+                )
+
+        if self.logger is not None:
+            self.logger.write(
+                "debug",
+                f"Write-behind flushed: {self.written_rows_dict}, "
+                + f"producer blocked {self.blocked_seconds:.3f} seconds.",
+            )
+        return {
+            "written_rows": dict(self.written_rows_dict),
+            "blocked_seconds": round(self.blocked_seconds, 6),
+        }
+
+    def drain(self):
+        # Stop writers after caller failed. Unwritten rows are logged, not raised, so caller's exception is kept.
+        self.stop()
+        if self.logger is None:
+            return
+
+        for name, rows in self.submitted_rows_dict.items():
+            if self.written_rows_dict.get(name, 0) != rows:
+                self.logger.write(
+                    "error",
+                    f"Write-behind drained: {self.written_rows_dict.get(name, 0)} of {rows} {name} rows written.",
+                )
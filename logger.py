@@ -1,7 +1,18 @@
 import os
+import queue
+import atexit
 import logging
+import logging.handlers
 from pathlib import Path
-from config import APP_BASE_PATH, DEFAULT_LOG_LEVEL
+from config import APP_BASE_PATH, DEFAULT_LOG_LEVEL, LOG_MAX_BYTES, LOG_BACKUP_COUNT
+
+LOG_LEVELS_DICT = {
+    "critical": logging.CRITICAL,
+    "error": logging.ERROR,
+    "warning": logging.WARNING,
+    "info": logging.INFO,
+    "debug": logging.DEBUG,
+}  # Level names as keys, and logging levels as values.
 
 
 class Logger:
@@ -10,43 +21,62 @@ class Logger:
     __instance = None
 
     @staticmethod
-    def get_instance():  # Static access method.
+    def get_instance(shard=None):  # Static access method. Shard only applies to first call.
         if Logger.__instance is None:
-            Logger()
+            Logger(shard)
         return Logger.__instance
 
-    def __init__(self):  # Set up basic config.
-        log_txt_path = os.path.join(APP_BASE_PATH, "log", "task_1_ac_app.log")
+    def __init__(self, shard=None):  # Set up basic config.
+        # Virtually private constructor: checked before any handler or thread is set up.
+        if Logger.__instance is not None:
+            raise Exception("This class is a singleton!")
+
+        # Shard (i, N): processes of shards on one host each rotate their own log file.
+        # Rotation of one file by several processes loses records.
+        log_name = "task_1_ac_app"
+        if shard is not None:
+            log_name += f"_shard_{shard[0]}_of_{shard[1]}"
+        log_txt_path = os.path.join(APP_BASE_PATH, "log", f"{log_name}.log")
         file = Path(log_txt_path)  # In case if log.txt is not already existing.
         file.touch(exist_ok=True)
 
-        logging.basicConfig(
-            filename=log_txt_path,
-            format="%(asctime)s: %(levelname)s: %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
+        # Records are put into a queue, and a listener thread writes them into a size-rotated file.
+        # So pipeline thread never waits for disk.
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_txt_path,
+            maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUP_COUNT,
             encoding="utf-8",
-            level=DEFAULT_LOG_LEVEL,
         )
-        self.logger = logging.getLogger()  # Create logger and store it as property.
-
-        if Logger.__instance is not None:  # Virtually private constructor.
-            raise Exception("This class is a singleton!")
+        file_handler.setFormatter(
+            logging.Formatter(
+                "%(asctime)s: %(levelname)s: %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+            )
+        )
+        log_queue = queue.Queue(-1)
+        self.listener = logging.handlers.QueueListener(log_queue, file_handler)
+        self.listener.start()
+        self.listening = True
+        atexit.register(self.close)  # Write remaining records at exit.
 
-        else:
-            Logger.__instance = self
+        self.logger = logging.getLogger()  # Create logger and store it as property.
+        self.logger.setLevel(DEFAULT_LOG_LEVEL)
+        self.logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        Logger.__instance = self
 
     def write(self, level, message):  # Write messages into txt.
-        if level == "critical":  # Critical level.
-            self.logger.critical(message)
-
-        elif level == "error":  # Error level.
-            self.logger.error(message)
-
-        elif level == "warning":  # Warning level.
-            self.logger.warning(message)
+        # Message may be a callable returning the message, only called if level is enabled.
+        log_level = LOG_LEVELS_DICT.get(level, logging.DEBUG)  # Debug level by default.
+        if not self.logger.isEnabledFor(log_level):
+            return
 
-        elif level == "info":  # Info level.
-            self.logger.info(message)
+        if callable(message):
+            message = message()
+        self.logger.log(log_level, message)
 
-        else:  # Debug level.
-            self.logger.debug(message)
+    def close(
+        self,
+    ):  # Write queued records and stop listener thread. Later calls do nothing.
+        if self.listening:
+            self.listening = False
+            self.listener.stop()
@@ -1,11 +1,36 @@
-import threading
+import argparse
+from config import (META_SYNC_LOCK, META_SYNC_LOCK_PATH, META_SYNC_LOCK_NAME, META_SYNC_LOCK_TIMEOUT,
+                    RUN_PROFILE_ENABLED)
 from air_compressor_pm_app import Application
 from logger import Logger
+from utils.file_lock import FileLock
+from utils.shard import parse_shard
 
 
 if __name__ == '__main__':
-    logger = Logger.get_instance()
-    lock = threading.Lock()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shard', default=None, help='Handle shard i out of N asset code shards, as i/N.')
+    parser.add_argument('--daemon', action='store_true', help='Stay resident and poll unprocessed runtime data.')
+    parser.add_argument('--profile', action='store_true',
+                        help='Dump one cProfile pstats file per stage. Only main thread is profiled, '
+                             'so concurrent reads and background writes are left out.')
+    arguments = parser.parse_args()
 
-    app = Application(logger)  # Air compressor predictive maintenance application.
-    app.execute(lock)
+    shard = parse_shard(arguments.shard)
+    logger = Logger.get_instance(shard)  # Each shard writes its own log file.
+    profile = RUN_PROFILE_ENABLED | arguments.profile
+    if META_SYNC_LOCK == 'mysql':  # Shards on several hosts.
+        from dao.advisory_lock import DatabaseLock
+        lock = DatabaseLock(META_SYNC_LOCK_NAME, META_SYNC_LOCK_TIMEOUT)
+
+    else:  # Shards on one host.
+        lock = FileLock(META_SYNC_LOCK_PATH)
+
+    if arguments.daemon:
+        from air_compressor_pm_daemon import Daemon
+        daemon = Daemon(logger, lock, shard, profile)
+        daemon.run()
+
+    else:
+        app = Application(logger, profile)  # Air compressor predictive maintenance application.
+        app.execute(lock, shard)
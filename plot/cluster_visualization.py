@@ -3,7 +3,7 @@ import swifter
 import plotly.graph_objects as go
 import plotly.io as pio
 import plotly.offline as pyo
-from config import DBSCAN_PARAMETERS_DICT
+from utils.asset_registry import AssetRegistry
 
 
 class ClusterVisualizer:
@@ -15,7 +15,8 @@ class ClusterVisualizer:
 
         self.air_compressor_meta_df = air_compressor_meta_df
         self.run_time_df = run_time_df
-        self.dbscan_parameters_dict = DBSCAN_PARAMETERS_DICT
+        self.asset_registry = AssetRegistry()  # Locations and DBSCAN parameters looked up by asset code.
+        self.asset_registry.load_meta(air_compressor_meta_df)
 
         malfunction_df = malfunction_df[['asset_code', 'report_date', 'action_complete']]
         malfunction_df.drop_duplicates(inplace=True)
@@ -34,7 +35,6 @@ class ClusterVisualizer:
         self.malfunction_df = malfunction_df
 
     def plot(self):
-        meta_df = self.air_compressor_meta_df
         run_time_df = self.run_time_df
         malfunction_df = self.malfunction_df
 
@@ -43,10 +43,11 @@ class ClusterVisualizer:
             run_time_df_iter.set_index('datetime', inplace=True)
 
             mal_df_iter = malfunction_df[malfunction_df['asset_code'] == asset_code]
-            location_iter = meta_df.loc[meta_df['asset_code'] == asset_code, 'location'].iloc[0]
+            location_iter = self.asset_registry.get_location(asset_code)
 
-            minimal_samples_iter = self.dbscan_parameters_dict[location_iter]['minimal_samples']
-            epsilon_iter = self.dbscan_parameters_dict[location_iter]['epsilon']
+            parameters_iter = self.asset_registry.get_parameters(asset_code)
+            minimal_samples_iter = parameters_iter['minimal_samples']
+            epsilon_iter = parameters_iter['epsilon']
 
             fig = go.Figure(layout=go.Layout(
                 updatemenus=[dict(type='buttons', direction='right', x=0.9, y=1.16)],
@@ -141,6 +142,7 @@ if __name__ == '__main__':
     from config import APP_BASE_PATH
     from dao import air_compressor_meta_dao, runtime_dao
     from workflow.moving_avg_calculation_step import CalculationStep
+    from utils.runtime_series_store import RuntimeSeriesStore
     from algorithm.dbscan_test import DBSCANTester
 
     runtime_data_main = runtime_dao.read_runtime()  # Runtime data.
@@ -158,8 +160,8 @@ if __name__ == '__main__':
         runtime_data_main = runtime_data_main[runtime_data_main['datetime'] >= datetime_threshold]
 
         calculation_step = CalculationStep()
-        calculation_step.conduct(runtime_data_main)
-        runtime_data_main = calculation_step.runtime_df
+        calculation_step.conduct(RuntimeSeriesStore.from_frame(runtime_data_main))
+        runtime_data_main = calculation_step.runtime_store.to_frame()
 
         tester = DBSCANTester(runtime_data_main)  # DBSCAN Clustering.
         tester.evaluate(meta_data_main, None, False, False)
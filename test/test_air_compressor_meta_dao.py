@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from dao import air_compressor_meta_dao
+from dao.air_compressor_meta_dao import AirCompressorDao
+from dao.db_connector import Base
+
+
+class TestAirCompressorMetaDao(unittest.TestCase):
+    """Verify if meta data diff sync inserts and deletes rows in one transaction, rolled back as a whole."""
+
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.engine = create_engine(f'sqlite:///{os.path.join(self.work_path, "load_test.db")}')
+        Base.metadata.create_all(self.engine)
+        self.patch = mock.patch.object(air_compressor_meta_dao, 'DBSession', sessionmaker(bind=self.engine))
+        self.patch.start()
+        air_compressor_meta_dao.insert_and_delete(self.get_meta_frame(['a', 'b', 'c']), [])
+
+    def tearDown(self):
+        self.patch.stop()
+        self.engine.dispose()
+
+    @staticmethod
+    def get_meta_frame(ids_list):
+        return pd.DataFrame({'id': ids_list, 'name': [f'air_compressor_{i + 1}' for i in range(len(ids_list))],
+                             'asset_code': [f'1010000{i + 1}' for i in range(len(ids_list))], 'location': 'IV'})
+
+    def read_meta_ids(self):
+        with self.engine.connect() as connection:
+            return sorted(connection.execute(select(AirCompressorDao.id)).scalars())
+
+    def test_insert_and_delete(self):
+        air_compressor_meta_dao.insert_and_delete(self.get_meta_frame(['d']), ['b'])
+        self.assertEqual(self.read_meta_ids(), ['a', 'c', 'd'])
+
+    def test_rollback(self):
+        # Inserted id clashes with an existing one, so deletion of b is rolled back with insertion of e.
+        with self.assertRaises(IntegrityError):
+            air_compressor_meta_dao.insert_and_delete(self.get_meta_frame(['e', 'a']), ['b'])
+        self.assertEqual(self.read_meta_ids(), ['a', 'b', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import time
+import datetime
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from sqlalchemy import create_engine
+from bench.load_test import insert_runtime
+from dao import runtime_dao
+from dao.concurrent_dao import ConcurrentDao
+from dao.db_connector import Base
+from dao.runtime_dao import RuntimeDao
+from utils.run_timer import RunTimer, span
+
+
+class TestConcurrentDao(unittest.TestCase):
+    """Verify if gathered calls run at once, and keep their names and exceptions."""
+
+    def test_gather(self):
+        concurrent_dao = ConcurrentDao(4)
+        start_time = time.perf_counter()
+        results_dict = concurrent_dao.gather({name: lambda name=name: time.sleep(0.2) or name
+                                              for name in ['meta_data', 'runtime_data', 'result_status']})
+        self.assertLess(time.perf_counter() - start_time, 0.5)  # Roughly slowest call, not sum of calls.
+        self.assertEqual(results_dict, {'meta_data': 'meta_data', 'runtime_data': 'runtime_data',
+                                        'result_status': 'result_status'})
+        self.assertEqual(list(concurrent_dao.seconds_dict), ['meta_data', 'runtime_data', 'result_status'])
+
+        with self.assertRaises(ZeroDivisionError):
+            concurrent_dao.gather({'meta_data': lambda: 1 / 0, 'runtime_data': lambda: 1})
+
+    def test_gather_spans(self):  # Spans of DAO functions called in pool threads nest under caller's span.
+        work_path = tempfile.mkdtemp()
+        engine = create_engine(f'sqlite:///{os.path.join(work_path, "load_test.db")}')
+        Base.metadata.create_all(engine)
+        start_datetime = datetime.datetime(2024, 1, 1)
+        runtime_df = pd.DataFrame([[f'A_{hour:02d}', start_datetime + datetime.timedelta(hours=hour), 'A', 3000]
+                                   for hour in range(24)], columns=['id', 'datetime', 'asset_code', 'runtime'])
+        insert_runtime(engine, RuntimeDao, runtime_df.iloc[:20], processed=True)
+        insert_runtime(engine, RuntimeDao, runtime_df.iloc[20:], processed=False)
+
+        with mock.patch.object(runtime_dao, 'engine', engine):
+            with RunTimer() as run_timer:
+                with span('read_inputs'):
+                    ConcurrentDao(2).gather({
+                        'runtime_data': lambda: runtime_dao.read_unprocessed_runtime(),
+                        'past_runtime_data': lambda: runtime_dao.read_runtime_range(
+                            ['A'], start_datetime, start_datetime + datetime.timedelta(days=1))})
+                with span('calculation_step'):
+                    pass
+        engine.dispose()
+
+        self.assertEqual([stage_span['name'] for stage_span in run_timer.record['spans']],
+                         ['read_inputs', 'calculation_step'])
+        rows_dict = {dao_span['name']: dao_span['rows_out'] for dao_span in run_timer.record['spans'][0]['children']}
+        self.assertEqual(rows_dict, {'runtime_dao.read_unprocessed_runtime': 4, 'runtime_dao.read_runtime_range': 24})
+        self.assertEqual(run_timer.record['spans'][1]['children'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import numpy as np
+from sklearn.cluster import DBSCAN
+from algorithm.dbscan_1d import segmented_dbscan_1d, sweep_dbscan_1d
+
+
+class TestSortedDBSCAN(unittest.TestCase):
+    """Verify if sorted 1d DBSCAN clusters match sklearn DBSCAN clusters."""
+
+    @staticmethod
+    def predict_with_sklearn(values, epsilon, minimal_samples):  # Same cluster mapping as predict_cluster.
+        clusters = DBSCAN(eps=epsilon, min_samples=minimal_samples).fit_predict(values.reshape(-1, 1)) + 1
+        return np.clip(clusters, None, 2)
+
+    def test_single_asset(self):
+        rng = np.random.default_rng(0)
+        for trial in range(200):
+            if trial % 2 == 0:
+                values = rng.normal(0, rng.uniform(0.5, 20), rng.integers(1, 300))
+            else:  # Rounded values give many ties and distances exactly equal to epsilon.
+                values = np.round(rng.normal(0, 5, rng.integers(1, 300)))
+            epsilon = float(rng.choice([0.5, 1, 2.5, 5]))
+            minimal_samples = int(rng.integers(1, 15))
+
+            expected_clusters = self.predict_with_sklearn(values, epsilon, minimal_samples)
+            clusters = segmented_dbscan_1d(values, np.zeros(len(values), dtype=int), epsilon, minimal_samples)
+            np.testing.assert_array_equal(clusters, expected_clusters)
+
+    def test_interleaved_assets(self):
+        rng = np.random.default_rng(1)
+        for trial in range(50):
+            values_list, codes_list, epsilons_list, minimal_samples_list, expected_list = [], [], [], [], []
+            for code in range(int(rng.integers(1, 6))):
+                values = np.concatenate([rng.normal(0, 3, rng.integers(1, 150)),
+                                         rng.normal(rng.uniform(5, 40), 2, rng.integers(1, 30))])
+                epsilon = float(rng.choice([1, 5]))
+                minimal_samples = int(rng.integers(1, 15))
+
+                values_list.append(values)
+                codes_list.append(np.full(len(values), code))
+                epsilons_list.append(np.full(len(values), epsilon))
+                minimal_samples_list.append(np.full(len(values), minimal_samples))
+                expected_list.append(self.predict_with_sklearn(values, epsilon, minimal_samples))
+
+            codes = np.concatenate(codes_list)
+            # Shuffle assets together while keeping each asset's own row order.
+            slots = rng.permutation(len(codes))
+            order = np.empty(len(codes), dtype=int)
+            for code in np.unique(codes):
+                indices = np.flatnonzero(codes == code)
+                order[np.sort(slots[indices])] = indices
+
+            clusters = segmented_dbscan_1d(np.concatenate(values_list)[order], codes[order],
+                                           np.concatenate(epsilons_list)[order],
+                                           np.concatenate(minimal_samples_list)[order])
+            np.testing.assert_array_equal(clusters, np.concatenate(expected_list)[order])
+
+    def test_sweep(self):
+        rng = np.random.default_rng(2)
+        for trial in range(20):
+            values = np.round(np.concatenate([rng.normal(0, 3, rng.integers(0, 600)),
+                                              rng.normal(20, 2, rng.integers(1, 60))]))
+            codes = rng.integers(0, 4, len(values))
+            flags = rng.integers(0, 2, (len(values), 2))
+            parameter_pairs_list = [(epsilon, minimal_samples) for epsilon in [0.5, 1, 2.5, 5]
+                                    for minimal_samples in [1, 4, 12, 40]]
+
+            swept_pairs_list = []
+            for (epsilon, minimal_samples), flag_counts in sweep_dbscan_1d(values, codes, parameter_pairs_list,
+                                                                           flags):
+                swept_pairs_list.append((epsilon, minimal_samples))
+                clusters = segmented_dbscan_1d(values, codes, epsilon, minimal_samples)
+                expected_flag_counts = [flags[(codes == code) & (clusters != 1)].sum(axis=0)
+                                        for code in np.unique(codes)]
+                np.testing.assert_array_equal(flag_counts, expected_flag_counts)
+            self.assertEqual(sorted(swept_pairs_list), sorted(parameter_pairs_list))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import datetime
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from sqlalchemy import create_engine
+from bench.load_test import insert_runtime
+from bench.runtime_generator import generate_runtime, generate_meta
+from config import DBSCAN_PARAMETERS_DICT
+from dao import db_connector, runtime_dao
+from dao.db_connector import Base
+from dao.runtime_dao import RuntimeDao
+from algorithm import dbscan_backfill
+
+
+class TestDBSCANBackfill(unittest.TestCase):
+    """Verify if backfill partitions match scores of single windows, and resumed backfills skip them."""
+
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.engine = create_engine(f'sqlite:///{os.path.join(self.work_path, "load_test.db")}')
+        Base.metadata.create_all(self.engine)
+        # Forked workers inherit patched engine, and drop its connections in initialize_worker.
+        self.patches_list = [mock.patch.object(runtime_dao, 'engine', self.engine),
+                             mock.patch.object(db_connector, 'engine', self.engine)]
+        for patch in self.patches_list:
+            patch.start()
+
+        insert_runtime(self.engine, RuntimeDao, generate_runtime(4, 60 / 365, 0, seed=5), processed=True)
+        self.engine.dispose()  # No pooled connection is shared with forked workers.
+        self.locations_dict = dbscan_backfill.get_locations_dict(generate_meta(4), DBSCAN_PARAMETERS_DICT)
+
+    def tearDown(self):
+        for patch in self.patches_list:
+            patch.stop()
+        self.engine.dispose()
+
+    def test_backfill(self):
+        start_datetime, end_datetime = datetime.datetime(2023, 12, 12), datetime.datetime(2024, 1, 1)
+        output_path = os.path.join(self.work_path, 'dbscan_backfill')
+        alarm_df, _ = dbscan_backfill.backfill(start_datetime, end_datetime, self.locations_dict, output_path,
+                                               asset_chunk_size=4, window='10D', workers=2)
+
+        expected_df_list = []
+        for window_start, window_end in dbscan_backfill.split_windows(start_datetime, end_datetime, '10D'):
+            expected_df_list.append(dbscan_backfill.score_work_unit(
+                {'window_start': window_start, 'window_end': window_end, 'chunk_index': 0,
+                 'locations_dict': self.locations_dict}))
+        self.assertEqual(len(expected_df_list), 2)
+        expected_df = pd.concat(expected_df_list, axis=0).sort_values(by=['datetime', 'asset_code'],
+                                                                      ignore_index=True)
+        self.assertGreater(len(expected_df), 0)
+        assert_frame_equal(alarm_df, expected_df, check_dtype=False)
+
+        # Resumed backfill finds every partition, so none is scored or written again.
+        partition_paths_list = [dbscan_backfill.get_partition_path(output_path, work_unit)
+                                for work_unit in dbscan_backfill.split_work_units(
+                                    start_datetime, end_datetime, self.locations_dict, 4, '10D')]
+        modified_times_list = [os.stat(path).st_mtime_ns for path in partition_paths_list]
+        with mock.patch.object(dbscan_backfill, 'ProcessPoolExecutor') as executor_class:
+            resumed_df, _ = dbscan_backfill.backfill(start_datetime, end_datetime, self.locations_dict, output_path,
+                                                     asset_chunk_size=4, window='10D', workers=2)
+        executor_class.assert_not_called()
+        self.assertEqual([os.stat(path).st_mtime_ns for path in partition_paths_list], modified_times_list)
+        assert_frame_equal(resumed_df, alarm_df)
+
+
+if __name__ == '__main__':
+    unittest.main()
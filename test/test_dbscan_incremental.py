@@ -0,0 +1,74 @@
+import unittest
+import numpy as np
+from algorithm import dbscan_incremental
+from algorithm.dbscan_1d import segmented_dbscan_1d
+from config import ADDITIONAL_RUNTIME_DAYS
+
+
+class TestIncrementalDBSCAN(unittest.TestCase):
+    """Verify if folded models keep same core points and cluster intervals as full fits on their window."""
+
+    def assert_new_clusters(self, model, values, datetimes, start, epsilon, minimal_samples):
+        # Clusters of new points from start on, classified by folded model, are those of a full fit on its window.
+        kept = datetimes >= datetimes[-1] - np.timedelta64(ADDITIONAL_RUNTIME_DAYS, 'D')
+        expected_clusters = segmented_dbscan_1d(values[kept], np.zeros(kept.sum(), dtype=int), epsilon,
+                                                minimal_samples)
+        np.testing.assert_array_equal(dbscan_incremental.classify(model, values[start:]),
+                                      expected_clusters[np.flatnonzero(kept) >= start])
+
+    def test_fold_matches_full_fit(self):
+        rng = np.random.default_rng(3)
+        epsilon, minimal_samples = 1.0, 6
+        start_datetime = np.datetime64('2024-01-01T00:00:00', 's')
+        for trial in range(20):
+            values = np.round(np.concatenate([rng.normal(0, 2, 300), rng.normal(12, 1, 8)]), 1)
+            datetimes = start_datetime + np.arange(len(values)).astype('timedelta64[h]') * 30
+            fitted_count = 250
+
+            clusters, core_mask = segmented_dbscan_1d(values[:fitted_count], np.zeros(fitted_count, dtype=int),
+                                                      epsilon, minimal_samples, return_core=True)
+            model = dbscan_incremental.build_model(values[:fitted_count], datetimes[:fitted_count], core_mask,
+                                                   clusters, epsilon, minimal_samples)
+            for start, stop in [(fitted_count, 280), (280, len(values))]:  # Fold new points in two runs.
+                dbscan_incremental.fold(model, values[start:stop], datetimes[start:stop], datetimes[stop - 1])
+                self.assert_new_clusters(model, values[:stop], datetimes[:stop], start, epsilon, minimal_samples)
+
+            # Full fit on points still in runtime window.
+            kept = datetimes >= datetimes[-1] - np.timedelta64(ADDITIONAL_RUNTIME_DAYS, 'D')
+            self.assertLess(kept.sum(), len(values))  # Oldest points were dropped.
+            _, expected_core_mask = segmented_dbscan_1d(values[kept], np.zeros(kept.sum(), dtype=int),
+                                                        epsilon, minimal_samples, return_core=True)
+            order = np.argsort(values[kept], kind='stable')
+            np.testing.assert_array_equal(model['values'], values[kept][order])
+            np.testing.assert_array_equal(model['core_mask'], expected_core_mask[order])
+
+            expected_core_values = values[kept][order][expected_core_mask[order]]
+            expected_bounds = dbscan_incremental.get_cluster_bounds(
+                expected_core_values, np.ones(len(expected_core_values), dtype=np.int8), epsilon)
+            np.testing.assert_array_equal(model['cluster_bounds'][:, :2], expected_bounds[:, :2])
+
+
+    def test_cluster_boundary(self):
+        # Fitted majority cluster of cores from 0 to 2, and points of its edge region folded in.
+        epsilon, minimal_samples = 1.0, 4
+        fitted_values = np.round(np.arange(0, 2.05, 0.1), 1)
+        datetimes = np.datetime64('2024-01-01T00:00:00', 's') + np.arange(40).astype('timedelta64[h]')
+        clusters, core_mask = segmented_dbscan_1d(fitted_values, np.zeros(len(fitted_values), dtype=int), epsilon,
+                                                  minimal_samples, return_core=True)
+        model = dbscan_incremental.build_model(fitted_values, datetimes[:len(fitted_values)], core_mask, clusters,
+                                               epsilon, minimal_samples)
+        self.assertEqual(model['cluster_bounds'][:, :2].tolist(), [[0.0, 2.0]])
+
+        # Within epsilon of edge core: border point. Just beyond it: outlier, until nearby new points make the
+        # border point a core point, and pull the outlier into the cluster.
+        for new_values in [np.array([3.0, 3.1, -1.2]), np.array([3.3, 3.5, 3.6])]:
+            start = len(fitted_values)
+            fitted_values = np.concatenate((fitted_values, new_values))
+            stop = len(fitted_values)
+            dbscan_incremental.fold(model, new_values, datetimes[start:stop], datetimes[stop - 1])
+            self.assert_new_clusters(model, fitted_values, datetimes[:stop], start, epsilon, minimal_samples)
+        self.assertEqual(dbscan_incremental.classify(model, [3.0, 3.1, -1.2, 4.6, 4.7]).tolist(), [1, 1, 0, 1, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
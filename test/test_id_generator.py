@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+import pandas as pd
+from utils import id_generator
+from utils.id_generator import generate_id, generate_ids, generate_row_ids
+
+
+class TestIdGenerator(unittest.TestCase):
+    """Verify if batch ids are identical to ids of generate_id applied row by row."""
+
+    @staticmethod
+    def get_result_status_frame(datetimes):
+        asset_codes = pd.Categorical(np.resize(['10100001', '10100002', '81000946'], len(datetimes)))
+        return pd.DataFrame({'datetime': pd.Series(datetimes).astype('datetime64[s]'), 'asset_code': asset_codes})
+
+    def assert_result_status_ids(self, result_status_df, workers=None):
+        # Ids as upload step used to build them: string of datetime + asset code, applied one row at a time.
+        expected_ids = (result_status_df['datetime'].astype(str) + result_status_df['asset_code'].astype(str)).apply(
+            generate_id).tolist()
+        ids = generate_ids([result_status_df['datetime'], result_status_df['asset_code']], workers=workers)
+        self.assertEqual(ids, expected_ids)
+
+    def test_result_status_ids(self):
+        hourly_datetimes = pd.date_range('2023-12-30 22:00:00', periods=500, freq='h')
+        self.assert_result_status_ids(self.get_result_status_frame(hourly_datetimes))
+        # All-midnight datetimes are formatted as dates only, both row by row and in batch.
+        self.assert_result_status_ids(self.get_result_status_frame(pd.date_range('2024-01-01', periods=50, freq='D')))
+
+    def test_process_pool(self):
+        original_pool_min_rows = id_generator.ID_POOL_MIN_ROWS
+        id_generator.ID_POOL_MIN_ROWS = 1
+        try:
+            self.assert_result_status_ids(
+                self.get_result_status_frame(pd.date_range('2024-01-01', periods=1000, freq='h')), workers=2)
+
+        finally:
+            id_generator.ID_POOL_MIN_ROWS = original_pool_min_rows
+
+    def test_row_ids(self):
+        meta_df = pd.DataFrame({'name': ['compressor', 'kompressör', None], 'asset_code': [10100001, 10100002, 81000946],
+                                'location': ['IV', 'MSR_2', np.nan], 'rating': [7.5, 11.0, np.nan]})
+        expected_ids = [generate_id(', '.join(map(str, row_values))) for row_values in meta_df.astype(str).values]
+        self.assertEqual(generate_row_ids(meta_df), expected_ids)
+
+
+if __name__ == '__main__':
+    unittest.main()
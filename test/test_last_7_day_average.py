@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from utils.last_7_day_average import (calculate_last_7_day_avg, calculate_last_7_day_avg_all,
+                                      calculate_last_7_day_avg_store, calculate_last_7_day_avg_stateful)
+from utils.runtime_series_store import RuntimeSeriesStore
+
+
+class TestLast7DayAverage(unittest.TestCase):
+    """Verify if cumulative sum and stateful averages are identical to rolling means of baseline."""
+
+    @staticmethod
+    def get_runtime_frame(hours, seed=0):
+        # Hourly runtime data of 3 asset codes with about 1 in 10 hours missing, sorted by asset code and datetime.
+        random_generator = np.random.default_rng(seed)
+        runtime_df_list = []
+        for asset_code in ['10100001', '10100002', '81000946']:
+            datetimes = pd.date_range('2024-01-01', periods=hours, freq='h')
+            datetimes = datetimes[random_generator.random(hours) > 0.1]
+            runtime_df_list.append(pd.DataFrame({
+                'id': [f'{asset_code}_{timestamp:%Y%m%d%H}' for timestamp in datetimes], 'datetime': datetimes,
+                'asset_code': asset_code, 'runtime': random_generator.integers(0, 3601, len(datetimes)),
+                'status': 1}))
+        return pd.concat(runtime_df_list, axis=0, ignore_index=True)
+
+    @staticmethod
+    def sort_frame(runtime_df):
+        return runtime_df.sort_values(by=['asset_code', 'datetime'], ignore_index=True)
+
+    def test_cumsum_engine(self):
+        runtime_df = self.get_runtime_frame(400)
+        expected_df = calculate_last_7_day_avg(runtime_df.copy())
+
+        assert_frame_equal(calculate_last_7_day_avg_all(runtime_df.copy()), expected_df)
+        # Shuffled rows are sorted by datetime within each asset code first.
+        assert_frame_equal(self.sort_frame(calculate_last_7_day_avg_all(runtime_df.sample(frac=1, random_state=0))),
+                           expected_df)
+
+        # Runtime series store, in batches of whole asset codes.
+        runtime_store = calculate_last_7_day_avg_store(RuntimeSeriesStore.from_frame(runtime_df), batch_rows=400)
+        np.testing.assert_array_equal(runtime_store.datetimes, expected_df['datetime'].to_numpy(dtype='datetime64[s]'))
+        np.testing.assert_array_equal(runtime_store.averages, expected_df['last_7_day_avg'].to_numpy())
+
+    def test_stateful_runs(self):
+        # Two runs in a row: first one saves ring buffers, second one takes new rows' averages from them.
+        states_path = os.path.join(tempfile.mkdtemp(), 'last_7_day_avg_states.npz')
+        runtime_df = self.get_runtime_frame(420, seed=1)
+        rows_from_state_list = []
+        for stop_datetime in [pd.Timestamp('2024-01-17'), pd.Timestamp('2024-01-18 12:00:00')]:
+            run_df = runtime_df[runtime_df['datetime'] < stop_datetime + pd.Timedelta(hours=6)].copy()
+            run_df.loc[run_df['datetime'] >= stop_datetime, 'status'] = 0  # Last 6 hours are unprocessed.
+
+            logger = mock.Mock()
+            stateful_df = calculate_last_7_day_avg_stateful(run_df.copy(), states_path, logger=logger)
+            assert_frame_equal(self.sort_frame(stateful_df), self.sort_frame(calculate_last_7_day_avg_all(run_df)))
+            rows_from_state_list.append(int(logger.write.call_args.args[1].split(': ')[1].split()[0]))
+        # First run has no saved state. Second run takes all unprocessed rows from ring buffers.
+        self.assertEqual(rows_from_state_list[0], 0)
+        self.assertEqual(rows_from_state_list[1], (run_df['status'] == 0).sum())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from sqlalchemy import create_engine, select
+from dao import result_status_dao
+from dao.db_connector import Base
+from dao.result_status_dao import ResultStatusDao
+
+
+class TestResultStatusDao(unittest.TestCase):
+    """Verify if result status upserts fall back to row by row when a chunk fails, and count written rows."""
+
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.engine = create_engine(f'sqlite:///{os.path.join(self.work_path, "load_test.db")}')
+        Base.metadata.create_all(self.engine)
+        self.patches_list = [mock.patch.object(result_status_dao, 'engine', self.engine),
+                             mock.patch.object(result_status_dao, 'RESULT_STATUS_UPSERT_CHUNK_SIZE', 3)]
+        for patch in self.patches_list:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches_list:
+            patch.stop()
+        self.engine.dispose()
+
+    @staticmethod
+    def get_result_status_frame(ids_list, result_status='Anomaly'):
+        return pd.DataFrame({'id': ids_list,
+                             'datetime': pd.date_range('2024-01-01', periods=len(ids_list), freq='h'),
+                             'asset_code': '10100001', 'tag_name': 'AC_1', 'result_status': result_status})
+
+    def read_result_statuses(self):  # Result statuses in database, ids as keys.
+        with self.engine.connect() as connection:
+            return dict(connection.execute(select(ResultStatusDao.id, ResultStatusDao.result_status)).all())
+
+    def test_upsert_chunks(self):
+        written_rows = result_status_dao.insert_and_update(self.get_result_status_frame(list('abcdefg')),
+                                                           '2024-01-02 00:00:00')
+        self.assertEqual(written_rows, 7)
+
+        # Existing rows are updated in place.
+        written_rows = result_status_dao.insert_and_update(self.get_result_status_frame(list('abc'), 'Minority'),
+                                                           '2024-01-02 01:00:00')
+        self.assertEqual(written_rows, 3)
+        self.assertEqual(self.read_result_statuses(), {**dict.fromkeys('abc', 'Minority'),
+                                                       **dict.fromkeys('defg', 'Anomaly')})
+        self.assertEqual(result_status_dao.insert_and_update(self.get_result_status_frame([]), '2024-01-02'), 0)
+
+    def test_row_by_row_fallback(self):
+        # First chunk's multi-row upsert fails once, as on a deadlock, and its rows succeed row by row. A missing
+        # datetime fails both ways, and is left out of written rows.
+        original_build_upsert_statement = result_status_dao.build_upsert_statement
+        failed_chunks_list = []
+
+        def build_upsert_statement(records_list):
+            if (len(records_list) > 1) & (len(failed_chunks_list) <= 0):
+                failed_chunks_list.append(records_list)
+                raise RuntimeError('Deadlock found when trying to get lock.')
+            return original_build_upsert_statement(records_list)
+
+        result_status_df = self.get_result_status_frame(list('abcdef'))
+        result_status_df.loc[4, 'datetime'] = pd.NaT
+        logger = mock.Mock()
+        with mock.patch.object(result_status_dao, 'build_upsert_statement', build_upsert_statement):
+            written_rows = result_status_dao.insert_and_update(result_status_df, '2024-01-02 00:00:00', logger)
+
+        self.assertEqual(written_rows, 5)
+        self.assertEqual(sorted(self.read_result_statuses()), ['a', 'b', 'c', 'd', 'f'])
+        logged_levels_list = [call.args[0] for call in logger.write.call_args_list]
+        self.assertEqual(logged_levels_list.count('warning'), 2)  # Both chunks retried row by row.
+        self.assertEqual(logged_levels_list.count('error'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from pandas.testing import assert_frame_equal
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from bench.load_test import insert_runtime
+from bench.runtime_generator import generate_runtime
+from dao import runtime_dao, runtime_history_cache
+from dao.db_connector import Base
+from dao.runtime_dao import RuntimeDao
+
+
+class TestRuntimeDao(unittest.TestCase):
+    """Verify if bulk runtime reads match ORM reads, and bulk runtime status updates count matched rows."""
+
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.engine = create_engine(f'sqlite:///{os.path.join(self.work_path, "load_test.db")}')
+        Base.metadata.create_all(self.engine)
+        self.patches_list = [mock.patch.object(runtime_dao, 'engine', self.engine),
+                             mock.patch.object(runtime_dao, 'DBSession', sessionmaker(bind=self.engine)),
+                             mock.patch.object(runtime_dao, 'RUNTIME_UPDATE_MODE', 'bulk')]
+        for patch in self.patches_list:
+            patch.start()
+
+        runtime_df = generate_runtime(3, 30 / 365, 4, seed=2)
+        insert_runtime(self.engine, RuntimeDao, runtime_df[runtime_df['status'] == 1], processed=True)
+        insert_runtime(self.engine, RuntimeDao, runtime_df[runtime_df['status'] == 0], processed=False)
+        self.asset_rows = runtime_df['asset_code'].isin(runtime_df.loc[runtime_df['status'] == 0, 'asset_code']).sum()
+        self.unprocessed_df = runtime_df[runtime_df['status'] == 0].reset_index(drop=True)
+
+    def tearDown(self):
+        for patch in self.patches_list:
+            patch.stop()
+        self.engine.dispose()
+
+    def read_statuses(self):  # Status and last 7-day average of each row, ids as keys.
+        with self.engine.connect() as connection:
+            return {row.id: (row.status, row.last_7_day_avg) for row in connection.execute(
+                select(RuntimeDao.id, RuntimeDao.status, RuntimeDao.last_7_day_avg))}
+
+    def test_read_runtime(self):
+        # Same rows in same order as ORM reads, with or without history cache. Only column types differ.
+        for cache_enabled in [False, True]:
+            runtime_dfs_dict = dict()
+            for read_mode in ['orm', 'bulk']:
+                with mock.patch.object(runtime_dao, 'RUNTIME_READ_MODE', read_mode), \
+                        mock.patch.object(runtime_dao, 'RUNTIME_HISTORY_CACHE_ENABLED', cache_enabled), \
+                        mock.patch.object(runtime_history_cache, 'RUNTIME_HISTORY_CACHE_PATH',
+                                          os.path.join(self.work_path, f'runtime_history_{read_mode}')):
+                    runtime_dfs_dict[read_mode] = runtime_dao.read_runtime().reset_index(drop=True)
+
+            orm_df, bulk_df = runtime_dfs_dict['orm'], runtime_dfs_dict['bulk']
+            self.assertEqual(bulk_df.dtypes.astype(str).to_dict(),
+                             {'id': 'object', 'datetime': 'datetime64[s]', 'asset_code': 'category',
+                              'runtime': 'int32', 'status': 'int8'})
+            # All rows of asset codes with unprocessed rows, as 30 days are within runtime window.
+            self.assertEqual(len(bulk_df), self.asset_rows)
+            self.assertTrue(np.all(np.diff(bulk_df['datetime'].to_numpy()) >= np.timedelta64(0)))
+            assert_frame_equal(bulk_df.astype(orm_df.dtypes.to_dict()), orm_df)
+
+    def test_update_execution_status(self):
+        # Bulk mode returns rows matched by id, summed over executemany chunks. Ids missing from database don't count.
+        expected_statuses_dict = self.read_statuses()
+        update_df = self.unprocessed_df.iloc[:5].assign(last_7_day_avg=range(5))
+        update_df.loc[5] = ['missing', update_df['datetime'].iloc[0], update_df['asset_code'].iloc[0], 0, 0, 0]
+        with mock.patch.object(runtime_dao, 'RUNTIME_UPDATE_CHUNK_SIZE', 2):
+            updated_rows = runtime_dao.update_execution_status(update_df, '2024-01-02 00:00:00')
+
+        self.assertEqual(updated_rows, 5)
+        expected_statuses_dict.update({runtime_id: (1, i) for i, runtime_id in enumerate(update_df['id'].iloc[:5])})
+        self.assertEqual(self.read_statuses(), expected_statuses_dict)
+
+        # Updated again with same values: rows are matched, though not changed.
+        with mock.patch.object(runtime_dao, 'RUNTIME_UPDATE_CHUNK_SIZE', 2):
+            self.assertEqual(runtime_dao.update_execution_status(update_df, '2024-01-02 00:00:00'), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
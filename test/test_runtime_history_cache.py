@@ -0,0 +1,82 @@
+import os
+import datetime
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from sqlalchemy import create_engine, update
+from bench.load_test import insert_runtime
+from dao import runtime_dao, runtime_history_cache
+from dao.db_connector import Base
+from dao.runtime_dao import RuntimeDao
+
+
+class TestRuntimeHistoryCache(unittest.TestCase):
+    """Verify if past runtime data served from cache matches database, querying only what cache lacks."""
+
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.engine = create_engine(f'sqlite:///{os.path.join(self.work_path, "load_test.db")}')
+        Base.metadata.create_all(self.engine)
+        self.patches_list = [mock.patch.object(runtime_dao, 'engine', self.engine),
+                             mock.patch.object(runtime_history_cache, 'RUNTIME_HISTORY_CACHE_PATH',
+                                               os.path.join(self.work_path, 'runtime_history'))]
+        for patch in self.patches_list:
+            patch.start()
+
+        self.start_datetime = datetime.datetime(2024, 1, 1)
+        self.insert_hours(['A', 'B'], 0, 48)
+
+    def tearDown(self):
+        for patch in self.patches_list:
+            patch.stop()
+        self.engine.dispose()
+
+    def insert_hours(self, asset_codes_list, start_hour, stop_hour):  # Processed hourly rows of asset codes.
+        datetimes = [self.start_datetime + datetime.timedelta(hours=hour) for hour in range(start_hour, stop_hour)]
+        runtime_df = pd.DataFrame([[f'{asset_code}_{timestamp:%Y%m%d%H}', timestamp, asset_code, 3000]
+                                   for asset_code in asset_codes_list for timestamp in datetimes],
+                                  columns=['id', 'datetime', 'asset_code', 'runtime'])
+        insert_runtime(self.engine, RuntimeDao, runtime_df, processed=True)
+
+    def read_past_runtime(self, asset_codes_list, unprocessed_ids=None):
+        # Past runtime data, and numbers of rows of each database query.
+        queried_rows_list = []
+        original_query_past_runtime = runtime_dao.query_past_runtime
+
+        def query_past_runtime(*args, **kwargs):
+            past_runtime_df = original_query_past_runtime(*args, **kwargs)
+            queried_rows_list.append(len(past_runtime_df))
+            return past_runtime_df
+
+        with mock.patch.object(runtime_dao, 'query_past_runtime', query_past_runtime):
+            past_runtime_df = runtime_dao.read_past_runtime_with_cache(asset_codes_list, self.start_datetime,
+                                                                       unprocessed_ids=unprocessed_ids)
+        return past_runtime_df.sort_values(by=['asset_code', 'datetime'], ignore_index=True), queried_rows_list
+
+    def test_cache_read_and_merge(self):
+        past_runtime_df, queried_rows_list = self.read_past_runtime(['A'])  # Cold cache: whole window.
+        self.assertEqual(queried_rows_list, [48])
+        self.assertEqual(len(past_runtime_df), 48)
+
+        # Warm asset only refetches rows since its high-water mark, while cold asset fetches whole window.
+        self.insert_hours(['A'], 48, 50)
+        past_runtime_df, queried_rows_list = self.read_past_runtime(['A', 'B'])
+        self.assertEqual(queried_rows_list, [3, 48])
+        self.assertEqual(past_runtime_df['asset_code'].value_counts().to_dict(), {'A': 50, 'B': 48})
+        self.assertTrue(past_runtime_df['id'].is_unique)
+
+        # Cached row reset to status 0 is unprocessed in this run, so it isn't past runtime data.
+        connection = self.engine.connect()
+        connection.execute(update(RuntimeDao.__table__).where(RuntimeDao.id == 'A_2024010112').values(status=0))
+        connection.commit()
+        connection.close()
+        # Each warm asset refetches rows since its own high-water mark: last row of A and last row of B.
+        past_runtime_df, queried_rows_list = self.read_past_runtime(['A', 'B'], pd.Series(['A_2024010112']))
+        self.assertEqual(queried_rows_list, [2])
+        self.assertEqual(len(past_runtime_df), 97)
+        self.assertNotIn('A_2024010112', past_runtime_df['id'].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
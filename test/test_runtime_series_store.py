@@ -0,0 +1,37 @@
+import unittest
+import numpy as np
+from bench.runtime_generator import generate_runtime, generate_meta
+from utils.last_7_day_average import calculate_last_7_day_avg_all, calculate_last_7_day_avg_store
+from utils.runtime_series_store import RuntimeSeriesStore
+from algorithm.dbscan_clustering import DBSCANClusterer
+
+
+class TestRuntimeSeriesStore(unittest.TestCase):
+    """Verify if steps on runtime series store give the same results as steps on data frames."""
+
+    def test_store_matches_frames(self):
+        runtime_df = generate_runtime(12, 0.1, 48, gap_rate=0.01, seed=2)
+        meta_df = generate_meta(10)  # Two asset codes without meta data are never clustered.
+
+        expected_df = calculate_last_7_day_avg_all(runtime_df, 168)
+        expected_df.sort_values(by=['datetime', 'asset_code'], ascending=[True, True], inplace=True)
+        clustering = DBSCANClusterer(expected_df)
+        clustering.fit_and_predict(meta_df)
+        expected_df = clustering.runtime_df.sort_values(by=['asset_code', 'datetime'], ignore_index=True)
+
+        # Small batches, so that asset codes are clustered over several batches.
+        runtime_store = calculate_last_7_day_avg_store(RuntimeSeriesStore.from_frame(runtime_df), 168, 2000)
+        runtime_store = DBSCANClusterer.fit_and_predict_store(runtime_store, meta_df)
+        runtime_store = runtime_store.select((runtime_store.statuses == 0) & (runtime_store.clusters >= 0))
+        runtime_df = runtime_store.to_frame()
+
+        np.testing.assert_array_equal(runtime_df['id'].to_numpy(), expected_df['id'].to_numpy())
+        np.testing.assert_array_equal(runtime_df['cluster'].to_numpy(), expected_df['cluster'].to_numpy())
+        np.testing.assert_array_equal(runtime_df['last_7_day_avg'].to_numpy(),
+                                      np.round(expected_df['last_7_day_avg'].to_numpy() * 60))
+        self.assertEqual(len(runtime_store.get_asset(runtime_store.asset_codes[0])),
+                         runtime_store.offsets[1] - runtime_store.offsets[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import datetime
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from sqlalchemy import create_engine, insert
+from dao import result_status_dao
+from dao.db_connector import Base
+from dao.result_status_dao import ResultStatusDao
+
+
+class TestUnsentResultStatus(unittest.TestCase):
+    """Verify if unsent result status pages cover every unsent row once, also across ties and null keys."""
+
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.engine = create_engine(f'sqlite:///{os.path.join(self.work_path, "load_test.db")}')
+        Base.metadata.create_all(self.engine)
+        self.patch = mock.patch.object(result_status_dao, 'engine', self.engine)
+        self.patch.start()
+
+        # Ties of datetime and tag name fall across pages of 2 rows, and null keys sit in middle of id order.
+        timestamp = datetime.datetime(2024, 1, 1)
+        rows_list = [('a', timestamp, 'tag_1', 0), ('b', timestamp, 'tag_1', 0), ('c', None, 'tag_2', 0),
+                     ('d', timestamp, None, 0), ('e', timestamp, 'tag_1', 1), ('f', timestamp, 'tag_0', 0),
+                     ('g', timestamp - datetime.timedelta(hours=1), 'tag_3', 0)]
+        with self.engine.begin() as connection:
+            connection.execute(insert(ResultStatusDao.__table__), [
+                {'id': result_status_id, 'datetime': row_datetime, 'asset_code': '10100001', 'tag_name': tag_name,
+                 'result_status': '1', 'push_status': push_status}
+                for result_status_id, row_datetime, tag_name, push_status in rows_list])
+
+    def tearDown(self):
+        self.patch.stop()
+        self.engine.dispose()
+
+    def test_pages(self):
+        for page_size in range(1, 8):  # Pages ending on every row, including ones with null keys.
+            pages_list = list(result_status_dao.read_unsent_result_status_pages(page_size=page_size))
+            self.assertTrue(all(len(page_df) <= page_size for page_df in pages_list))
+            self.assertEqual(sorted(result_status_id for page_df in pages_list for result_status_id in page_df.index),
+                             ['a', 'b', 'c', 'd', 'f', 'g'])
+
+    def test_read_unsent_result_status(self):
+        unsent_result_status_df = result_status_dao.read_unsent_result_status()
+        # Same shape as a single query: no ids, sorted by time and tag name, null times last.
+        self.assertEqual(list(unsent_result_status_df.columns), ['Time', 'Tag Name', 'Asset Code', 'Severity'])
+        self.assertEqual(sorted(unsent_result_status_df.index), list(range(6)))
+        self.assertEqual(unsent_result_status_df['Tag Name'].tolist(), ['tag_3', 'tag_0', 'tag_1', 'tag_1', None,
+                                                                         'tag_2'])
+        self.assertTrue(pd.isna(unsent_result_status_df['Time'].iloc[-1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from sqlalchemy import create_engine, select, update
+from dao import result_status_dao
+from dao.db_connector import Base
+from dao.result_status_dao import ResultStatusDao
+from workflow.upload_result_status_step import UploadStep
+
+
+class TestUploadResultStatusStep(unittest.TestCase):
+    """Verify if unchanged result status rows are skipped and counted, and keep their load date and push status."""
+
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.engine = create_engine(f'sqlite:///{os.path.join(self.work_path, "load_test.db")}')
+        Base.metadata.create_all(self.engine)
+        self.patches_list = [mock.patch.object(result_status_dao, 'engine', self.engine),
+                             mock.patch.object(result_status_dao, 'RESULT_STATUS_FETCH_CHUNK_SIZE', 2)]
+        for patch in self.patches_list:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches_list:
+            patch.stop()
+        self.engine.dispose()
+
+    @staticmethod
+    def get_result_status_frame(result_statuses_dict):  # Ids as keys, and result statuses as values.
+        return pd.DataFrame({'id': list(result_statuses_dict),
+                             'datetime': pd.date_range('2024-01-01', periods=len(result_statuses_dict), freq='h'),
+                             'asset_code': '10100001', 'tag_name': 'AC_1',
+                             'result_status': list(result_statuses_dict.values())})
+
+    def test_skip_unchanged(self):
+        result_status_df = self.get_result_status_frame({'a': 'Anomaly', 'b': 'Anomaly', 'c': 'Minority'})
+        upserted_df, counts_dict = UploadStep.skip_unchanged(result_status_df)
+        self.assertEqual(counts_dict, {'inserted': 3, 'changed': 0, 'skipped': 0})
+        result_status_dao.insert_and_update(upserted_df, '2024-01-02 00:00:00')
+        with self.engine.begin() as connection:  # Alarm of a was sent.
+            connection.execute(update(ResultStatusDao.__table__).where(ResultStatusDao.id == 'a').values(
+                push_status=1))
+
+        # Same, changed and new rows, with ids queried in chunks of 2.
+        result_status_df = self.get_result_status_frame({'a': 'Anomaly', 'b': 'Minority', 'c': 'Minority',
+                                                         'd': 'Anomaly'})
+        upserted_df, counts_dict = UploadStep.skip_unchanged(result_status_df)
+        self.assertEqual(counts_dict, {'inserted': 1, 'changed': 1, 'skipped': 2})
+        self.assertEqual(upserted_df['id'].tolist(), ['b', 'd'])
+        result_status_dao.insert_and_update(upserted_df, '2024-01-03 00:00:00')
+
+        with self.engine.connect() as connection:
+            rows_list = connection.execute(select(ResultStatusDao.id, ResultStatusDao.result_status,
+                                                  ResultStatusDao.push_status, ResultStatusDao.load_date)
+                                           .order_by(ResultStatusDao.id)).all()
+        self.assertEqual([(row.id, row.result_status, row.push_status, row.load_date.day) for row in rows_list],
+                         [('a', 'Anomaly', 1, 2), ('b', 'Minority', 0, 3), ('c', 'Minority', 0, 2),
+                          ('d', 'Anomaly', 0, 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
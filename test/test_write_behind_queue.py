@@ -0,0 +1,69 @@
+import time
+import unittest
+from unittest import mock
+from dao import write_behind_queue
+from dao.write_behind_queue import WriteBehindQueue
+from utils.run_timer import RunTimer, span, timed
+
+
+class TestWriteBehindQueue(unittest.TestCase):
+    """Verify if queued writes block producer when full, are retried, and fail the flush when they keep failing."""
+
+    def test_flush(self):
+        written_list = []
+        write_queue = WriteBehindQueue(writers=1, queue_size=1)
+        for i in range(4):  # Slow writer fills queue of one chunk, so producer has to wait.
+            write_queue.submit('runtime_status', 10, lambda i=i: time.sleep(0.05) or written_list.append(i) or 10)
+
+        flush_dict = write_queue.flush()
+        self.assertEqual(sorted(written_list), [0, 1, 2, 3])
+        self.assertEqual(flush_dict['written_rows'], {'runtime_status': 40})
+        self.assertGreater(flush_dict['blocked_seconds'], 0.05)
+
+    def test_failure(self):
+        attempts_list = []
+        write_queue = WriteBehindQueue(writers=2, retries=0)
+        write_queue.submit('result_status', 5, lambda: attempts_list.append(1) or 5)
+        write_queue.submit('runtime_status', 10, lambda: attempts_list.append(1) or 1 / 0)
+
+        with self.assertRaises(RuntimeError):  # Failed chunk is never acknowledged.
+            write_queue.flush()
+        self.assertEqual(len(attempts_list), 2)
+        self.assertEqual(write_queue.written_rows_dict, {'result_status': 5})
+
+    def test_written_rows(self):  # Chunk writing fewer rows than submitted is retried, then fails the flush.
+        attempts_list = []
+        write_queue = WriteBehindQueue(writers=1, retries=1)
+        write_queue.submit('result_status', 5, lambda: attempts_list.append(1) or len(attempts_list) + 3)
+        write_queue.submit('runtime_status', 10, lambda: 9)
+
+        with mock.patch.object(write_behind_queue, 'WRITE_BEHIND_RETRY_SECONDS', 0):
+            with self.assertRaises(RuntimeError):
+                write_queue.flush()
+        self.assertEqual(len(attempts_list), 2)  # Second attempt wrote all 5 rows.
+        self.assertEqual(write_queue.written_rows_dict, {'result_status': 5})
+
+    def test_write_spans(self):  # Spans of timed writes in writer threads nest under span queue was created in.
+        write_rows = timed('write_rows')(lambda rows_list: len(rows_list))
+        with RunTimer() as run_timer:
+            with span('upload_step'):
+                write_queue = WriteBehindQueue(writers=2)
+                for rows in [3, 4]:
+                    write_queue.submit('result_status', rows, write_rows, list(range(rows)))
+                write_queue.flush()
+
+        self.assertEqual([stage_span['name'] for stage_span in run_timer.record['spans']], ['upload_step'])
+        write_spans_list = run_timer.record['spans'][0]['children']
+        self.assertEqual([write_span['name'] for write_span in write_spans_list], ['write_rows', 'write_rows'])
+        self.assertEqual(sorted(write_span['rows_in'] for write_span in write_spans_list), [3, 4])
+
+    def test_drain(self):  # Failed chunks are logged, not raised.
+        logger = mock.Mock()
+        write_queue = WriteBehindQueue(writers=1, retries=0, logger=logger)
+        write_queue.submit('runtime_status', 10, lambda: 1 / 0)
+        write_queue.drain()
+        self.assertIn('0 of 10 runtime_status rows written', logger.write.call_args.args[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
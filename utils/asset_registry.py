@@ -0,0 +1,77 @@
+import os
+import pandas as pd
+from config import SOURCE_FOLDER_BASE_PATH, DBSCAN_PARAMETERS_DICT
+from dao import air_compressor_meta_dao
+from utils.id_generator import generate_id
+from utils.tag_names_getter import get_tag_names_dict
+
+
+class AssetRegistry:
+    """Cache asset attributes once per process: meta data, locations, tag names and DBSCAN parameters."""
+
+    __instance = None
+
+    @staticmethod
+    def get_instance():  # Static access method: registry shared by all steps of the process.
+        if AssetRegistry.__instance is None:
+            AssetRegistry.__instance = AssetRegistry()
+        return AssetRegistry.__instance
+
+    def __init__(self, air_compressor_codes_path=None, parameters_dict=None):
+        if air_compressor_codes_path is None:
+            air_compressor_codes_path = os.path.join(SOURCE_FOLDER_BASE_PATH, 'air_compressor_codes.csv')
+        self.air_compressor_codes_path = air_compressor_codes_path
+        # Locations as keys, and their DBSCAN parameters as values.
+        self.parameters_dict = DBSCAN_PARAMETERS_DICT if parameters_dict is None else parameters_dict
+
+        self.meta_df = pd.DataFrame(columns=['name', 'asset_code', 'location'])  # Air compressor meta data.
+        self.meta_checksum = None  # Checksum of meta data ids in database at last load.
+        self.locations_dict = dict()  # Asset codes as keys, and locations as values.
+
+        self.tag_names_dict = dict()  # Asset codes as keys, and tag names as values.
+        self.tag_names_signature = None  # Modified time and size of codes csv file at last load.
+
+    def load_meta(self, meta_df, meta_checksum=None):  # Store meta data and hash its lookups.
+        meta_df = meta_df.assign(asset_code=meta_df['asset_code'].astype(str))
+        first_meta_df = meta_df.drop_duplicates(subset=['asset_code'], keep='first')  # First row of each asset.
+
+        self.meta_df = meta_df
+        self.meta_checksum = meta_checksum
+        self.locations_dict = dict(zip(first_meta_df['asset_code'], first_meta_df['location']))
+
+    def refresh_meta(self, logger=None):
+        # Reload meta data only when checksum of ids in database changes. Ids are hashes of row values.
+        meta_checksum = generate_id(','.join(sorted(air_compressor_meta_dao.read_air_compressor_meta_ids(logger))))
+        if (meta_checksum != self.meta_checksum) | (len(self.meta_df) <= 0):
+            self.load_meta(air_compressor_meta_dao.read_air_compressor_meta(logger), meta_checksum)
+            if logger is not None:
+                logger.write('debug', f'Asset registry: {len(self.locations_dict)} asset codes loaded.')
+        return self.meta_df
+
+    def refresh_tag_names(self):  # Reload tag names only when codes csv file changes.
+        try:
+            stat = os.stat(self.air_compressor_codes_path)
+            tag_names_signature = (stat.st_mtime_ns, stat.st_size)
+
+        except FileNotFoundError:
+            tag_names_signature = None
+
+        if (tag_names_signature is None) | (tag_names_signature != self.tag_names_signature):
+            self.tag_names_dict = get_tag_names_dict(self.air_compressor_codes_path)
+            self.tag_names_signature = tag_names_signature
+        return self.tag_names_dict
+
+    def get_location(self, asset_code):  # Location of asset code, or None if not in meta data.
+        return self.locations_dict.get(str(asset_code))
+
+    def get_parameters(self, asset_code):  # DBSCAN parameters of asset code's location, or None.
+        return self.parameters_dict.get(self.get_location(asset_code))
+
+    def get_dbscan_locations_dict(self, asset_codes):
+        # Asset codes among given ones whose locations have DBSCAN parameters, with their locations.
+        locations_dict = dict()
+        for asset_code in asset_codes:
+            location = self.locations_dict.get(str(asset_code))
+            if location in self.parameters_dict:
+                locations_dict[str(asset_code)] = location
+        return locations_dict
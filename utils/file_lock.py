@@ -0,0 +1,27 @@
+import os
+import fcntl
+
+
+class FileLock:
+    """Lock shared by processes on one host, held as an exclusive lock on a file."""
+
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self.file = None
+
+    def acquire(self):  # Block until lock is free.
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        self.file = open(self.lock_path, 'a')
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+
+    def release(self):
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
@@ -1,5 +1,49 @@
 import hashlib
+import multiprocessing
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from config import ID_POOL_MIN_ROWS, ID_POOL_WORKERS
 
 
 def generate_id(input_string):  # Generate id from input string.
     return hashlib.md5(input_string.encode()).hexdigest()
+
+
+def hash_strings(input_strings):  # Ids of many strings in one loop, same as generate_id of each.
+    md5 = hashlib.md5
+    return [md5(input_string.encode()).hexdigest() for input_string in input_strings]
+
+
+def get_column_strings(column):
+    # String values of column, same as Series.astype(str). Datetimes are formatted once per distinct value:
+    # pandas picks their format (such as date only) from the set of values, which distinct values share with rows.
+    column = pd.Series(column)
+    if column.dtype.kind == 'M':
+        codes, uniques = pd.factorize(column, use_na_sentinel=False)
+        return pd.Series(uniques).astype(str).to_numpy(dtype=object)[codes]
+    return column.astype(str).to_numpy(dtype=object)
+
+
+def generate_ids(columns_list, separator='', workers=ID_POOL_WORKERS):
+    # Ids of rows from string values of columns joined by separator, same as generate_id of each row string.
+    # Row strings are built column by column. Batches of at least ID_POOL_MIN_ROWS are hashed in a process pool.
+    row_strings = get_column_strings(columns_list[0])
+    for column in columns_list[1:]:
+        row_strings = row_strings + separator + get_column_strings(column)
+
+    if (workers is None) or (workers <= 1) or (len(row_strings) < ID_POOL_MIN_ROWS):
+        return hash_strings(row_strings.tolist())
+
+    # Spawned workers: forking a process running logger and writer threads may copy locks held by them.
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        ids_lists = executor.map(hash_strings, [chunk.tolist() for chunk in np.array_split(row_strings, workers)])
+        return [row_id for ids_list in ids_lists for row_id in ids_list]
+
+    finally:
+        executor.shutdown(wait=True)
+
+
+def generate_row_ids(data_frame):  # Ids of data frame rows, from values of each row joined by ', '.
+    return generate_ids([data_frame[column] for column in data_frame.columns], ', ')
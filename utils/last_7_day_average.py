@@ -1,7 +1,14 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.file_lock import FileLock
+
+HOUR_SECONDS = 3600  # Runtime data is hourly.
+
 
 def calculate_last_7_day_avg(runtime_df, logger=None):  # Calculate last 7-day average run time.
     runtime_df.set_index('datetime', inplace=True)
-    runtime_df['last_7_day_avg'] = runtime_df.groupby('asset_code')['runtime'].rolling(168).mean().values
+    runtime_df['last_7_day_avg'] = runtime_df.groupby('asset_code', observed=True)['runtime'].rolling(168).mean().values
     runtime_df.insert(0, 'datetime', runtime_df.index)  # Put datetime back at first column.
 
     runtime_df.dropna(inplace=True)
@@ -11,3 +18,164 @@ def calculate_last_7_day_avg(runtime_df, logger=None):  # Calculate last 7-day a
         logger.write('debug', 'Last 7-day average calculations completed.')
 
     return runtime_df
+
+
+def calculate_last_7_day_avg_all(runtime_df, window=168, logger=None):
+    # Calculate last 7-day average run time of all asset codes in one pass of segmented cumulative sums.
+    # Window as integer: number of rows. Window as string such as '168h': time span, so gaps don't stretch it.
+    asset_ids = pd.factorize(runtime_df['asset_code'])[0]
+    datetimes = runtime_df['datetime'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+    order = np.lexsort((datetimes, asset_ids))  # Sort once by asset code and datetime.
+    averages, valid = get_rolling_averages(asset_ids[order], datetimes[order], runtime_df['runtime'].to_numpy()[order],
+                                           window)
+
+    runtime_df = runtime_df.iloc[order[valid]]
+    runtime_df = runtime_df[['datetime'] + [column for column in runtime_df.columns if column != 'datetime']]
+    runtime_df = runtime_df.assign(last_7_day_avg=np.round(averages[valid]).astype(int))  # Set last 7-day avg as int.
+    runtime_df.reset_index(drop=True, inplace=True)
+    if logger is not None:
+        logger.write('debug', 'Last 7-day average calculations completed.')
+
+    return runtime_df
+
+
+def get_rolling_averages(asset_ids, datetimes, runtimes, window=168):
+    # Averages of rows sorted by asset id and datetime (as integer seconds), and whether each row has full window.
+    # Integer runtimes keep sums exact, matching rolling mean.
+    runtimes = runtimes.astype(np.int64 if np.issubdtype(runtimes.dtype, np.integer) else np.float64)
+    cumulative_sums = np.concatenate(([0], np.cumsum(runtimes)))
+
+    n = len(runtimes)
+    positions = np.arange(n)
+    new_segment = np.ones(n, dtype=bool)
+    new_segment[1:] = asset_ids[1:] != asset_ids[:-1]
+    segment_starts = np.maximum.accumulate(np.where(new_segment, positions, 0))
+
+    if isinstance(window, str):  # Time-aware window: rows within (datetime - window, datetime].
+        window_seconds = int(pd.Timedelta(window).total_seconds())
+        # Shift segments apart so one search over all rows never crosses asset codes.
+        datetimes_span = int(np.ptp(datetimes)) if n > 0 else 0
+        keys = datetimes + np.cumsum(new_segment) * (datetimes_span + 2 * window_seconds)
+        lefts = np.searchsorted(keys, keys - window_seconds, side='right')
+        # Like row windows, skip rows until asset history spans the whole window.
+        valid = datetimes - datetimes[segment_starts] >= window_seconds - HOUR_SECONDS
+
+    else:  # Row window: current row and previous rows of same asset code.
+        lefts = positions - window + 1
+        valid = lefts >= segment_starts
+        lefts = np.maximum(lefts, 0)
+
+    counts = positions + 1 - lefts
+    return (cumulative_sums[positions + 1] - cumulative_sums[lefts]) / counts, valid
+
+
+def calculate_last_7_day_avg_store(runtime_store, window=168, batch_rows=None, logger=None):
+    # Same pass as calculate_last_7_day_avg_all on runtime series store, already sorted by asset code and datetime.
+    # Batches of whole asset codes bound memory of cumulative sums. Returns store of rows with full window.
+    averages = np.empty(len(runtime_store), dtype=np.float32)
+    valid = np.empty(len(runtime_store), dtype=bool)
+    for start_asset, stop_asset in runtime_store.split_assets(batch_rows or max(len(runtime_store), 1)):
+        batch_store = runtime_store.view_assets(start_asset, stop_asset)
+        start_row, stop_row = runtime_store.offsets[start_asset], runtime_store.offsets[stop_asset]
+        batch_averages, valid[start_row:stop_row] = get_rolling_averages(
+            batch_store.get_asset_ids(), batch_store.datetimes.astype(np.int64), batch_store.runtimes, window)
+        averages[start_row:stop_row] = np.round(batch_averages)  # Rounded as int, exact in float32.
+
+    runtime_store = runtime_store.select(valid)
+    runtime_store.averages = averages[valid]
+    if logger is not None:
+        logger.write('debug', 'Last 7-day average calculations completed.')
+
+    return runtime_store
+
+
+def load_last_7_day_avg_states(states_path):
+    # Ring buffers of all asset codes: last 167 runtimes, their sum, next write position and last datetime.
+    try:
+        saved_states = np.load(states_path)
+
+    except FileNotFoundError:  # If states have never been saved.
+        return dict()
+
+    states_dict = dict()
+    for i, asset_code in enumerate(saved_states['asset_codes']):
+        states_dict.update({str(asset_code): {'buffer': saved_states['buffers'][i],
+                                              'sum': int(saved_states['sums'][i]),
+                                              'position': int(saved_states['positions'][i]),
+                                              'datetime': saved_states['datetimes'][i]}})
+    saved_states.close()
+    return states_dict
+
+
+def save_last_7_day_avg_states(states_dict, states_path, window=168):
+    asset_codes_list = sorted(states_dict.keys())
+    os.makedirs(os.path.dirname(states_path), exist_ok=True)
+    temporary_path = states_path + '.tmp.npz'
+    np.savez(temporary_path,
+             asset_codes=np.array(asset_codes_list, dtype=str),
+             buffers=np.array([states_dict[code]['buffer'] for code in asset_codes_list],
+                              dtype=np.int64).reshape(-1, window - 1),
+             sums=np.array([states_dict[code]['sum'] for code in asset_codes_list], dtype=np.int64),
+             positions=np.array([states_dict[code]['position'] for code in asset_codes_list], dtype=np.int64),
+             datetimes=np.array([states_dict[code]['datetime'] for code in asset_codes_list], dtype='datetime64[s]'))
+    os.replace(temporary_path, states_path)  # Swap in atomically.
+
+
+def calculate_last_7_day_avg_stateful(runtime_df, states_path, window=168, logger=None):
+    # Unprocessed rows (status = 0) get last 7-day average from saved ring buffers, each in O(1).
+    # Past rows, and every row of asset codes whose new rows are late or out of order, use the vectorized pass.
+    # States file is shared by shards, so hold its lock from load to save.
+    with FileLock(states_path + '.lock'):
+        return _calculate_last_7_day_avg_stateful(runtime_df, states_path, window, logger)
+
+
+def _calculate_last_7_day_avg_stateful(runtime_df, states_path, window, logger):
+    states_dict = load_last_7_day_avg_states(states_path)
+
+    unprocessed_df = runtime_df[runtime_df['status'] == 0]
+    unprocessed_df = unprocessed_df.sort_values(by=['datetime'], kind='stable')
+    stateful_asset_codes_list = []  # Asset codes whose new rows all come after saved state.
+    for asset_code, first_datetime in unprocessed_df.groupby('asset_code', observed=True)['datetime'].min().items():
+        state = states_dict.get(str(asset_code))
+        if (state is not None) and (np.datetime64(first_datetime, 's') > state['datetime']):
+            stateful_asset_codes_list.append(asset_code)
+
+    stateful_mask = runtime_df['asset_code'].isin(stateful_asset_codes_list)
+    rebuilt_mask = ~stateful_mask | (runtime_df['status'] != 0)
+    # Rebuild from runtime data: past rows and asset codes without usable state.
+    rebuilt_df = calculate_last_7_day_avg_all(runtime_df[rebuilt_mask], window)
+
+    unprocessed_df = unprocessed_df[unprocessed_df['asset_code'].isin(stateful_asset_codes_list)]
+    averages = np.empty(len(unprocessed_df), dtype=np.int64)
+    asset_codes = unprocessed_df['asset_code'].astype(str).to_numpy()
+    runtimes = unprocessed_df['runtime'].to_numpy(dtype=np.int64)
+    datetimes = unprocessed_df['datetime'].to_numpy(dtype='datetime64[s]')
+    for i in range(len(unprocessed_df)):  # Rows are in datetime order.
+        state = states_dict[asset_codes[i]]
+        averages[i] = round((state['sum'] + runtimes[i]) / window)  # Same rounding as vectorized pass.
+        state['sum'] += runtimes[i] - state['buffer'][state['position']]
+        state['buffer'][state['position']] = runtimes[i]
+        state['position'] = (state['position'] + 1) % (window - 1)
+        state['datetime'] = datetimes[i]
+
+    stateful_df = unprocessed_df[['datetime'] + [column for column in runtime_df.columns if column != 'datetime']]
+    stateful_df = stateful_df.assign(last_7_day_avg=averages)
+
+    # Rebuilt asset codes: ring buffer of their last 167 runtimes, up to their latest row.
+    rebuilt_asset_df = runtime_df[~stateful_mask].sort_values(by=['datetime'], kind='stable')
+    for asset_code, asset_df in rebuilt_asset_df.groupby('asset_code', observed=True):
+        if len(asset_df) < window - 1:  # Not enough history yet.
+            states_dict.pop(str(asset_code), None)
+            continue
+
+        buffer = asset_df['runtime'].to_numpy(dtype=np.int64)[-(window - 1):].copy()
+        states_dict.update({str(asset_code): {'buffer': buffer, 'sum': int(buffer.sum()), 'position': 0,
+                                              'datetime': np.datetime64(asset_df['datetime'].max(), 's')}})
+
+    save_last_7_day_avg_states(states_dict, states_path, window)
+    if logger is not None:
+        logger.write('debug', f'Last 7-day average calculations completed: {len(stateful_df)} rows from state.')
+
+    runtime_df = pd.concat([rebuilt_df, stateful_df], axis=0)
+    runtime_df.reset_index(drop=True, inplace=True)
+    return runtime_df
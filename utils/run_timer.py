@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import cProfile
+import datetime
+import functools
+import threading
+import contextlib
+import contextvars
+import pandas as pd
+
+_active_run_timer = contextvars.ContextVar('active_run_timer', default=None)  # Run timer of current run.
+# Spans currently open in current context, innermost last. Threads started with a copied context nest under
+# spans open when they were started, without seeing each other's spans.
+_open_spans = contextvars.ContextVar('open_spans', default=())
+
+
+def _count_rows(value):  # Number of rows of data frames and lists, otherwise None.
+    if isinstance(value, (pd.DataFrame, pd.Series, list)):
+        return len(value)
+    return None
+
+
+class RunTimer:
+    """Record nested timing spans of one run, and save them as one JSON record."""
+
+    def __init__(self, record_path=None, profile_path=None, logger=None):
+        self.record_path = record_path  # JSON lines file of run records. None: no record saved.
+        self.profile_path = profile_path  # Folder of per-stage pstats files. None: no profiling.
+        self.logger = logger
+
+        start_datetime = datetime.datetime.now()
+        self.run_id = f'{start_datetime.strftime("%Y%m%d_%H%M%S")}_{os.getpid()}'
+        self.record = {'run_id': self.run_id,
+                       'start_time': start_datetime.isoformat(sep=' ', timespec='seconds'),
+                       'pid': os.getpid(), 'seconds': None, 'spans': []}
+        self.lock = threading.Lock()  # Spans of threads may be added to same parent at once.
+        self.stage_count = 0
+        self.start_time = None
+        self.context_token = None
+        self.spans_token = None
+        self.thread_id = None  # Thread running the run. Top-level spans of writer threads aren't profiled.
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        self.thread_id = threading.get_ident()
+        self.context_token = _active_run_timer.set(self)
+        self.spans_token = _open_spans.set(())
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _open_spans.reset(self.spans_token)
+        _active_run_timer.reset(self.context_token)
+        self.record['seconds'] = round(time.perf_counter() - self.start_time, 6)
+        if exc_type is not None:
+            self.record['error'] = f'{exc_type.__name__}: {exc_value}'
+        self.save()
+
+    @contextlib.contextmanager
+    def span(self, name, rows_in=None):
+        # Time a block nested in current span. Caller may set span['rows_out'] before block ends.
+        span = {'name': name, 'start_offset': round(time.perf_counter() - self.start_time, 6),
+                'seconds': None, 'rows_in': rows_in, 'rows_out': None, 'rows_per_sec': None, 'children': []}
+        open_spans = _open_spans.get()
+        parent_spans_list = open_spans[-1]['children'] if len(open_spans) > 0 else self.record['spans']
+        with self.lock:
+            parent_spans_list.append(span)
+
+        profiler = None
+        # Profile top-level stages only. cProfile follows calling thread alone, so pool threads aren't profiled.
+        if (self.profile_path is not None) & (len(open_spans) <= 0) & (threading.get_ident() == self.thread_id):
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        spans_token = _open_spans.set(open_spans + (span,))
+        start_time = time.perf_counter()
+        try:
+            yield span
+
+        finally:
+            seconds = time.perf_counter() - start_time
+            _open_spans.reset(spans_token)
+            span['seconds'] = round(seconds, 6)
+            rows = span['rows_out'] if span['rows_out'] is not None else span['rows_in']
+            if rows is not None:
+                span['rows_per_sec'] = round(rows / max(seconds, 1e-9), 1)
+
+            if profiler is not None:
+                profiler.disable()
+                self.stage_count += 1
+                os.makedirs(os.path.join(self.profile_path, self.run_id), exist_ok=True)
+                profiler.dump_stats(os.path.join(self.profile_path, self.run_id,
+                                                 f'{self.stage_count:02d}_{name}.pstats'))
+
+    def save(self):  # Append run record as one line.
+        if self.logger is not None:
+            stages_str = ', '.join(f'{span["name"]}: {span["seconds"]:.3f}s' for span in self.record['spans'])
+            self.logger.write('info', f'Run {self.run_id} took {self.record["seconds"]:.3f}s ({stages_str}).')
+
+        if self.record_path is None:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(self.record_path), exist_ok=True)
+            file = open(self.record_path, 'a')
+            file.write(json.dumps(self.record, default=str) + '\n')
+            file.close()
+
+        except OSError as e:
+            if self.logger is not None:
+                self.logger.write('warning', f'Run timing record not saved: {e}.')
+
+
+def span(name, rows_in=None):  # Span of active run timer, or a detached span outside any run.
+    run_timer = _active_run_timer.get()
+    if run_timer is None:
+        return contextlib.nullcontext({'rows_out': None})
+    return run_timer.span(name, rows_in)
+
+
+def timed(name):  # Decorator timing each call as a span, counting rows of first data frame argument and result.
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _active_run_timer.get() is None:
+                return function(*args, **kwargs)
+
+            rows_in = next((_count_rows(arg) for arg in args if _count_rows(arg) is not None), None)
+            with span(name, rows_in) as function_span:
+                result = function(*args, **kwargs)
+                function_span['rows_out'] = _count_rows(result)
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+# Columns of data frames turned into store columns, with their store dtypes.
+OPTIONAL_COLUMN_DTYPES_DICT = {'last_7_day_avg': np.float32, 'deviation': np.float32, 'cluster': np.int8}
+
+
+class RuntimeSeriesStore:
+    """Runtime data as compact arrays sorted by asset code and datetime, so each asset code is one row range."""
+
+    def __init__(self, asset_codes, offsets, datetimes, runtimes, statuses, ids=None,
+                 averages=None, deviations=None, clusters=None):
+        self.asset_codes = asset_codes  # Index of interned asset codes, sorted. Position = asset id.
+        self.offsets = offsets  # Rows of asset id i: offsets[i] to offsets[i + 1].
+
+        self.datetimes = datetimes  # datetime64[s].
+        self.runtimes = runtimes  # int32. Unit: seconds.
+        self.statuses = statuses  # int8.
+        self.ids = ids  # Only unprocessed rows (status = 0) keep ids, as only they are updated. Others: None.
+
+        self.averages = averages  # float32 last 7-day averages, rounded. Unit: seconds.
+        self.deviations = deviations  # float32 runtime - last 7-day average. Unit: minutes.
+        self.clusters = clusters  # int8. 0 = outlier, 1 = majority, 2 = minority and -1 = not clustered.
+
+    def __len__(self):
+        return len(self.datetimes)
+
+    @classmethod
+    def from_frame(cls, runtime_df):  # DAO boundary: data frame of runtime data into store.
+        if len(runtime_df) <= 0:
+            return cls(pd.Index([], dtype=object), np.zeros(1, dtype=np.int64), np.array([], dtype='datetime64[s]'),
+                       np.array([], dtype=np.int32), np.array([], dtype=np.int8), np.array([], dtype=object))
+
+        # Intern asset codes: categories are turned into strings once, not once per row.
+        asset_codes = pd.Categorical(runtime_df['asset_code']).remove_unused_categories()
+        category_ids, asset_codes_index = pd.factorize(asset_codes.categories.astype(str), sort=True)
+        asset_ids = category_ids[asset_codes.codes]
+
+        datetimes = runtime_df['datetime'].to_numpy(dtype='datetime64[s]')
+        order = np.lexsort((datetimes, asset_ids))  # Stable, so rows of same timestamp keep their order.
+        statuses = runtime_df['status'].to_numpy(dtype=np.int8)[order]
+
+        ids = None
+        if 'id' in runtime_df.columns:
+            ids = np.where(statuses == 0, runtime_df['id'].to_numpy(dtype=object)[order], None)
+
+        optional_arrays_dict = dict()
+        for column, dtype in OPTIONAL_COLUMN_DTYPES_DICT.items():
+            if column in runtime_df.columns:
+                optional_arrays_dict[column] = runtime_df[column].to_numpy(dtype=dtype)[order]
+
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(asset_ids, minlength=len(asset_codes_index)))))
+        return cls(pd.Index(asset_codes_index, dtype=object), offsets, datetimes[order],
+                   runtime_df['runtime'].to_numpy(dtype=np.int32)[order], statuses, ids,
+                   optional_arrays_dict.get('last_7_day_avg'), optional_arrays_dict.get('deviation'),
+                   optional_arrays_dict.get('cluster'))
+
+    def to_frame(self):  # DAO boundary: store into data frame, rows in store order. Averages in seconds.
+        runtime_df = pd.DataFrame({'id': self.ids if self.ids is not None else np.full(len(self), None),
+                                   'datetime': self.datetimes,
+                                   'asset_code': pd.Categorical.from_codes(self.get_asset_ids(), self.asset_codes),
+                                   'runtime': self.runtimes, 'status': self.statuses})
+        if self.averages is not None:
+            runtime_df['last_7_day_avg'] = self.averages.astype(np.int64)
+        if self.deviations is not None:
+            runtime_df['deviation'] = self.deviations
+        if self.clusters is not None:
+            runtime_df['cluster'] = self.clusters
+        return runtime_df
+
+    def get_asset_ids(self):  # Asset id of each row.
+        return np.repeat(np.arange(len(self.asset_codes), dtype=np.int32), np.diff(self.offsets))
+
+    def view_assets(self, start_asset, stop_asset):
+        # Store of asset ids in [start, stop) as views of this store's arrays: nothing is copied.
+        start_row, stop_row = self.offsets[start_asset], self.offsets[stop_asset]
+        return RuntimeSeriesStore(self.asset_codes[start_asset:stop_asset],
+                                  self.offsets[start_asset:stop_asset + 1] - start_row,
+                                  *[None if array is None else array[start_row:stop_row]
+                                    for array in [self.datetimes, self.runtimes, self.statuses, self.ids,
+                                                  self.averages, self.deviations, self.clusters]])
+
+    def get_asset(self, asset_code):  # Views of one asset code's rows.
+        asset_id = self.asset_codes.get_loc(str(asset_code))
+        return self.view_assets(asset_id, asset_id + 1)
+
+    def split_assets(self, batch_rows):
+        # Ranges of asset ids holding about batch rows each. An asset code is never split.
+        bounds = np.searchsorted(self.offsets, np.arange(batch_rows, self.offsets[-1], batch_rows), side='left')
+        bounds = np.unique(np.concatenate(([0], bounds, [len(self.asset_codes)])))
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def select(self, mask):  # New store of rows where mask is true. Asset codes stay interned.
+        kept_counts = np.concatenate(([0], np.cumsum(mask)))
+        return RuntimeSeriesStore(self.asset_codes, kept_counts[self.offsets],
+                                  *[None if array is None else array[mask]
+                                    for array in [self.datetimes, self.runtimes, self.statuses, self.ids,
+                                                  self.averages, self.deviations, self.clusters]])
+
+    def get_positions(self, asset_codes, datetimes):
+        # Row positions of given (asset code, datetime) pairs, -1 if not in store. Rows are sorted by both keys.
+        asset_ids = self.asset_codes.get_indexer(pd.Index(asset_codes).astype(str))
+        datetimes = np.asarray(datetimes, dtype='datetime64[s]').astype(np.int64)
+        if (len(self) <= 0) | (len(datetimes) <= 0):
+            return np.full(len(datetimes), -1, dtype=np.int64)
+
+        base_seconds = min(self.datetimes.astype(np.int64).min(), datetimes.min())  # Keeps offsets positive.
+        keys = (self.get_asset_ids().astype(np.int64) << 34) + (self.datetimes.astype(np.int64) - base_seconds)
+        searched_keys = (asset_ids.astype(np.int64) << 34) + (datetimes - base_seconds)
+        positions = np.minimum(np.searchsorted(keys, searched_keys), len(keys) - 1)
+        return np.where((asset_ids >= 0) & (keys[positions] == searched_keys), positions, -1)
@@ -0,0 +1,9 @@
+def parse_shard(shard_str):  # Turn 'i/N' into (i, N), where shard index i starts from 0.
+    if shard_str is None:
+        return None
+
+    shard_index, shard_count = map(int, shard_str.split('/'))
+    if (shard_count <= 0) | (shard_index < 0) | (shard_index >= shard_count):
+        raise ValueError(f'Invalid shard {shard_str}: expected i/N with 0 <= i < N.')
+    return shard_index, shard_count
+
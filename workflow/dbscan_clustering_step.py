@@ -1,4 +1,3 @@
-import pandas as pd
 from algorithm.dbscan_clustering import DBSCANClusterer
 from logger import Logger
 
@@ -11,17 +10,21 @@ class ClusteringStep:
     ):
         self.logger = Logger.get_instance()  # Set up logger.
 
-        self.runtime_df = pd.DataFrame()  # Data frame for runtime data.
-        self.abnormal_cluster_df = pd.DataFrame()  # Data frame for abnormal clusters.
+        self.runtime_store = None  # Runtime series store of runtime data.
+        self.abnormal_cluster_store = None  # Runtime series store of abnormal clusters.
 
-    def conduct(self, air_compressor_meta_data, runtime_data):
-        clustering = DBSCANClusterer(runtime_data, self.logger)  # DBSCAN clustering.
-        clustering.fit_and_predict(air_compressor_meta_data)
+    def conduct(self, air_compressor_meta_data, runtime_store, asset_registry=None):
+        # DBSCAN clustering, with deviations and clusters set on store.
+        runtime_store = DBSCANClusterer.fit_and_predict_store(
+            runtime_store, air_compressor_meta_data, asset_registry, self.logger
+        )
 
-        self.runtime_df = (
-            clustering.runtime_df
-        )  # Store runtime data that conducted DBSCAN.
-        self.abnormal_cluster_df = (
-            clustering.abnormal_cluster_df
-        )  # Store abnormal cluster data as property.
+        # Only runtime data with status = 0 and conducted DBSCAN will be kept.
+        self.runtime_store = runtime_store.select(
+            (runtime_store.statuses == 0) & (runtime_store.clusters >= 0)
+        )
+        # Store abnormal clusters data (cluster != 1) as property.
+        self.abnormal_cluster_store = self.runtime_store.select(
+            self.runtime_store.clusters != 1
+        )
         self.logger.write("info", "DBSCAN clustering step completed.")
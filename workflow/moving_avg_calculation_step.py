@@ -1,6 +1,17 @@
 import pandas as pd
 from joblib import Parallel, delayed
-from utils.last_7_day_average import calculate_last_7_day_avg
+from config import (
+    MOVING_AVG_ENGINE,
+    MOVING_AVG_WINDOW,
+    MOVING_AVG_STATES_PATH,
+    RUNTIME_STORE_BATCH_ROWS,
+)
+from utils.last_7_day_average import (
+    calculate_last_7_day_avg,
+    calculate_last_7_day_avg_store,
+    calculate_last_7_day_avg_stateful,
+)
+from utils.runtime_series_store import RuntimeSeriesStore
 from logger import Logger
 
 
@@ -10,26 +21,39 @@ class CalculationStep:
     def __init__(self):
         self.logger = Logger.get_instance()  # Set up logger.
 
-        self.runtime_df = (
-            pd.DataFrame()
-        )  # Data frame for runtime data after moving average calculation.
-
-    def conduct(self, runtime_data):
-        asset_codes_list = sorted(
-            set(runtime_data["asset_code"])
-        )  # List of asset codes.
-        runtime_df_list = Parallel(n_jobs=-1, prefer="threads")(
-            delayed(calculate_last_7_day_avg)(
-                runtime_data[runtime_data["asset_code"] == asset_code], self.logger
+        # Runtime series store for runtime data after moving average calculation.
+        self.runtime_store = None
+
+    def conduct(self, runtime_store):
+        if (MOVING_AVG_ENGINE == "stateful") & (type(MOVING_AVG_WINDOW) is int):
+            # Unprocessed rows from saved ring buffers, other rows in one vectorized pass. Runs on data frames.
+            runtime_df = calculate_last_7_day_avg_stateful(
+                runtime_store.to_frame(),
+                MOVING_AVG_STATES_PATH,
+                MOVING_AVG_WINDOW,
+                self.logger,
+            )
+            self.runtime_store = RuntimeSeriesStore.from_frame(runtime_df)
+
+        elif MOVING_AVG_ENGINE in ["cumsum", "stateful"]:
+            # All asset codes in vectorized passes over batches of whole asset codes.
+            self.runtime_store = calculate_last_7_day_avg_store(
+                runtime_store, MOVING_AVG_WINDOW, RUNTIME_STORE_BATCH_ROWS, self.logger
+            )
+
+        else:
+            runtime_data = runtime_store.to_frame()
+            asset_codes_list = sorted(
+                set(runtime_data["asset_code"])
+            )  # List of asset codes.
+            runtime_df_list = Parallel(n_jobs=-1, prefer="threads")(
+                delayed(calculate_last_7_day_avg)(
+                    runtime_data[runtime_data["asset_code"] == asset_code], self.logger
+                )
+                for asset_code in asset_codes_list
+            )
+            self.runtime_store = RuntimeSeriesStore.from_frame(
+                pd.concat(runtime_df_list, axis=0)
             )
-            for asset_code in asset_codes_list
-        )
-
-        # Store calculated runtime data as property.
-        runtime_df = pd.concat(runtime_df_list, axis=0)
-        runtime_df.sort_values(
-            by=["datetime", "asset_code"], ascending=[True, True], inplace=True
-        )
-        self.runtime_df = runtime_df
 
         self.logger.write("info", "Moving average calculation step completed.")
@@ -1,7 +1,11 @@
-from config import CLUSTER_NAMES_DICT
-from dao.result_status_dao import insert_and_update
-from utils.tag_names_getter import get_tag_names_dict
-from utils.id_generator import generate_id
+from config import (
+    CLUSTER_NAMES_DICT,
+    RESULT_STATUS_SKIP_UNCHANGED,
+    WRITE_BEHIND_CHUNK_ROWS,
+)
+from dao.result_status_dao import insert_and_update, read_result_statuses
+from utils.asset_registry import AssetRegistry
+from utils.id_generator import generate_ids
 from logger import Logger
 
 
@@ -11,14 +15,74 @@ class UploadStep:
     def __init__(self):
         self.logger = Logger.get_instance()  # Set up logger.
 
-    def conduct(self, abnormal_cluster_data, load_date_str):
+        # Numbers of inserted, changed and skipped rows of last upload.
+        self.counts_dict = {"inserted": 0, "changed": 0, "skipped": 0}
+
+    def conduct(self, abnormal_cluster_data, load_date_str, write_queue=None):
+        # Rows are upserted in chunks by write-behind queue if given, otherwise before returning.
         if len(abnormal_cluster_data) <= 0:  # If result status data is empty.
             self.logger.write(
                 "error", "Upload result status step stopped: result status data empty."
             )
             return
 
+        # Data frame only at DAO boundary.
+        result_status_df = self.build_result_status_df(abnormal_cluster_data.to_frame())
+        if RESULT_STATUS_SKIP_UNCHANGED:
+            result_status_df, self.counts_dict = self.skip_unchanged(
+                result_status_df, self.logger
+            )
+        else:  # Every row is upserted, so new and changed rows are not told apart.
+            self.counts_dict = {
+                "inserted": None,
+                "changed": None,
+                "skipped": 0,
+            }
+
+        if write_queue is None:
+            insert_and_update(result_status_df, load_date_str, self.logger)
+        else:
+            for i in range(0, len(result_status_df), WRITE_BEHIND_CHUNK_ROWS):
+                chunk_df = result_status_df.iloc[i : i + WRITE_BEHIND_CHUNK_ROWS]
+                write_queue.submit(
+                    "result_status",
+                    len(chunk_df),
+                    insert_and_update,
+                    chunk_df,
+                    load_date_str,
+                    self.logger,
+                )
+        self.logger.write(
+            "info",
+            f"Upload result status step completed: {self.counts_dict['inserted']} inserted, "
+            + f"{self.counts_dict['changed']} changed and {self.counts_dict['skipped']} skipped rows.",
+        )
+
+    @staticmethod
+    def skip_unchanged(result_status_df, logger=None):
+        # Keep new rows and rows whose result status changed, with numbers of inserted, changed and skipped rows.
+        # Unchanged alarms are not written again, so their load date and push status stay as they are.
+        existing_statuses = result_status_df["id"].map(
+            read_result_statuses(result_status_df["id"].tolist(), logger)
+        )
+        inserted_mask = existing_statuses.isna()
+        changed_mask = ~inserted_mask & (
+            existing_statuses != result_status_df["result_status"]
+        )
+
+        counts_dict = {
+            "inserted": int(inserted_mask.sum()),
+            "changed": int(changed_mask.sum()),
+            "skipped": int((~inserted_mask & ~changed_mask).sum()),
+        }
+        return result_status_df[inserted_mask | changed_mask], counts_dict
+
+    @staticmethod
+    def build_result_status_df(abnormal_cluster_data, tag_names_dict=None):
+        # Map tag names, cluster names and ids of abnormal clusters. Tag names are read if not given.
         result_status_df = abnormal_cluster_data[["datetime", "asset_code", "cluster"]]
+        # Asset codes may arrive as categories from bulk runtime reads.
+        result_status_df["asset_code"] = result_status_df["asset_code"].astype(str)
 
         # Insert tag name column at the second last place, right before the cluster column.
         tag_name_index = len(result_status_df.columns) - 1
@@ -26,7 +90,8 @@ class UploadStep:
         result_status_df.insert(
             tag_name_index, "tag_name", result_status_df["asset_code"]
         )
-        tag_names_dict = get_tag_names_dict()
+        if tag_names_dict is None:  # Codes csv file is only read again when it changes.
+            tag_names_dict = AssetRegistry.get_instance().refresh_tag_names()
         result_status_df["tag_name"].replace(tag_names_dict, inplace=True)
 
         # Transform clusters from integer to string.
@@ -39,13 +104,13 @@ class UploadStep:
         )
 
         # ID is hash md5 of datetime and asset_code values.
-        result_status_df.insert(0, "id", "0")
-        result_status_df["id"] = (
-            result_status_df["datetime"].astype(str) + result_status_df["asset_code"]
+        result_status_df.insert(
+            0,
+            "id",
+            generate_ids(
+                [result_status_df["datetime"], result_status_df["asset_code"]]
+            ),
         )
-        result_status_df["id"] = result_status_df["id"].apply(generate_id)
         # Drop duplicates by id.
         result_status_df.drop_duplicates(subset=["id"], keep="last", inplace=True)
-
-        insert_and_update(result_status_df, load_date_str, self.logger)
-        self.logger.write("info", "Upload result status step completed.")
+        return result_status_df